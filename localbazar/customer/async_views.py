@@ -0,0 +1,144 @@
+"""
+Async variants of the read-heavy catalog endpoints.
+
+Under ASGI, DRF's synchronous views each occupy a thread from the
+sync_to_async pool, so concurrency is capped by the pool size. These views
+run on the event loop: they reuse the synchronous views' querysets,
+filtering and query plans (all lazy), fetch rows with Django's async ORM and
+serialize the already-loaded instances, which needs no database access.
+Only the few steps that must touch the database synchronously (category
+lookups, the Python search backend, page-number counts) hop to a thread.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from utils.database import read_from_replica
+from utils.throttling import TokenBucketThrottle, get_store
+
+from .views import (
+    ProductDetailView, ProductListView, ProductSearchView,
+    ShopDetailView, ShopListView, ShopProductsView,
+)
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status, headers=headers)
+
+
+class AsyncCatalogView(View):
+    """
+    Base class wrapping a synchronous DRF generic view.
+
+    ``view_class`` supplies get_queryset, the serializer and pagination.
+    ``blocking_query_params`` lists query parameters that make get_queryset
+    hit the database, in which case it runs in a thread.
+    """
+    view_class = None
+    blocking_query_params = ()
+    http_method_names = ['get', 'head', 'options']
+
+    def get_sync_view(self, request, kwargs):
+        view = self.view_class()
+        view.request = Request(request)
+        view.args = ()
+        view.kwargs = kwargs
+        view.format_kwarg = None
+        return view
+
+    async def get_queryset(self, view):
+        params = view.request.query_params
+        if any(param in params for param in self.blocking_query_params):
+            queryset = await sync_to_async(view.get_queryset)()
+        else:
+            queryset = view.get_queryset()
+        # filter_queryset also applies the serializer's query plan.
+        return view.filter_queryset(queryset)
+
+    async def check_throttles(self, view):
+        # Keyed by IP: resolving request.user here could query synchronously.
+        for throttle in view.get_throttles():
+            if not isinstance(throttle, TokenBucketThrottle):
+                continue
+            scope = getattr(view, 'throttle_scope', None) or 'anon'
+            key = f'ip:{throttle.get_ident(view.request)}'
+            if get_store().blocking:
+                allowed = await sync_to_async(throttle.consume)(scope, key)
+            else:
+                allowed = throttle.consume(scope, key)
+            if not allowed:
+                view.throttled(view.request, throttle.wait())
+
+    def serialize(self, view, data, many=False):
+        serializer = view.get_serializer_class()(data, many=many, context=view.get_serializer_context())
+        return serializer.data
+
+    async def get(self, request, *args, **kwargs):
+        view = self.get_sync_view(request, kwargs)
+        try:
+            await self.check_throttles(view)
+            with read_from_replica():
+                data = await self.get_data(view)
+        except APIException as exc:
+            response = exception_handler(exc, {'view': view, 'request': view.request})
+            headers = {name: response[name] for name in ('Retry-After',) if response.has_header(name)}
+            return json_response(response.data, status=response.status_code, headers=headers)
+        return json_response(data)
+
+
+class AsyncListView(AsyncCatalogView):
+    async def get_data(self, view):
+        queryset = await self.get_queryset(view)
+        paginator = view.paginator
+        if paginator is None:
+            results = [obj async for obj in queryset]
+            return self.serialize(view, results, many=True)
+
+        if hasattr(paginator, 'apaginate_queryset'):
+            page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        else:
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, view.request, view=view)
+        data = self.serialize(view, page, many=True)
+        return paginator.get_paginated_response(data).data
+
+
+class AsyncDetailView(AsyncCatalogView):
+    async def get_data(self, view):
+        queryset = await self.get_queryset(view)
+        try:
+            instance = await queryset.aget(pk=view.kwargs['pk'])
+        except queryset.model.DoesNotExist:
+            raise NotFound()
+        return self.serialize(view, instance)
+
+
+class AsyncProductListView(AsyncListView):
+    view_class = ProductListView
+    # ?category= looks up the category's path before filtering.
+    blocking_query_params = ('category', 'search')
+
+
+class AsyncProductDetailView(AsyncDetailView):
+    view_class = ProductDetailView
+
+
+class AsyncProductSearchView(AsyncListView):
+    view_class = ProductSearchView
+    blocking_query_params = ('q',)
+
+
+class AsyncShopListView(AsyncListView):
+    view_class = ShopListView
+
+
+class AsyncShopDetailView(AsyncDetailView):
+    view_class = ShopDetailView
+
+
+class AsyncShopProductsView(AsyncListView):
+    view_class = ShopProductsView
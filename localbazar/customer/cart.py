@@ -0,0 +1,212 @@
+"""
+Cart storage for LocalBazar.
+
+Carts are kept as a compact ``{product_id: quantity}`` map in a fast cache
+tier (``CARTS['CACHE_ALIAS']``, Redis in production). Writes go to the cache
+immediately and are persisted to the ``Cart`` table write-behind: a
+per-process buffer collects dirty carts and upserts them in one
+``bulk_create`` every ``FLUSH_INTERVAL`` seconds (0 = write-through).
+"""
+
+import atexit
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from .models import Cart, Product
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60 * 24 * 7,
+    'FLUSH_INTERVAL': 5,
+    'MAX_ITEMS': 100,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CARTS', {})}
+
+
+class WriteBehindBuffer:
+    """Collects dirty carts and persists them in batches from a daemon thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, user_id, items):
+        if not self.interval:
+            self._persist({user_id: items})
+            return
+        with self._lock:
+            self._pending[user_id] = dict(items)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cart-write-behind', daemon=True)
+                self._thread.start()
+
+    def get(self, user_id):
+        with self._lock:
+            items = self._pending.get(user_id)
+        return dict(items) if items is not None else None
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            self._persist(batch)
+        except Exception as e:
+            logger.error(f"Failed to persist {len(batch)} carts: {e}")
+            with self._lock:
+                for user_id, items in batch.items():
+                    self._pending.setdefault(user_id, items)
+
+    def _persist(self, batch):
+        Cart.objects.bulk_create(
+            [Cart(customer_id=user_id, items=items) for user_id, items in batch.items()],
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=['items', 'updated_at'],
+        )
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+            close_old_connections()
+
+
+class CartStore:
+    """Per-user carts, cache first with write-behind persistence."""
+
+    def __init__(self):
+        config = get_config()
+        self.cache = caches[config['CACHE_ALIAS']]
+        self.timeout = config['TIMEOUT']
+        self.max_items = config['MAX_ITEMS']
+        self.buffer = WriteBehindBuffer(config['FLUSH_INTERVAL'])
+
+    def _key(self, user_id):
+        return f'cart:{user_id}'
+
+    def get(self, user_id):
+        """Return the cart as ``{product_id: quantity}``."""
+        items = self.cache.get(self._key(user_id))
+        if items is None:
+            items = self.buffer.get(user_id)
+            if items is None:
+                row = Cart.objects.filter(customer_id=user_id).values_list('items', flat=True).first()
+                items = row or {}
+            self.cache.set(self._key(user_id), items, self.timeout)
+        return {int(product_id): quantity for product_id, quantity in items.items()}
+
+    def save(self, user_id, items):
+        stored = {str(product_id): quantity for product_id, quantity in items.items() if quantity > 0}
+        if len(stored) > self.max_items:
+            raise ValueError(f'A cart can hold at most {self.max_items} different products')
+        self.cache.set(self._key(user_id), stored, self.timeout)
+        self.buffer.put(user_id, stored)
+
+    def add(self, user_id, product_id, quantity):
+        """Add ``quantity`` units; raises ValueError if the total exceeds stock or the cart is full."""
+        items = self.get(user_id)
+        items[product_id] = items.get(product_id, 0) + quantity
+        check_stock({product_id: items[product_id]})
+        self.save(user_id, items)
+        return items
+
+    def set_quantity(self, user_id, product_id, quantity):
+        """Change a line's quantity; raises KeyError if it is not in the cart, ValueError like ``add``."""
+        items = self.get(user_id)
+        if product_id not in items:
+            raise KeyError(product_id)
+        items[product_id] = quantity
+        check_stock({product_id: quantity})
+        self.save(user_id, items)
+        return items
+
+    def remove(self, user_id, product_id):
+        items = self.get(user_id)
+        items.pop(product_id, None)
+        self.save(user_id, items)
+        return items
+
+    def clear(self, user_id):
+        self.save(user_id, {})
+        return {}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_cart_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CartStore()
+                atexit.register(_store.buffer.flush)
+    return _store
+
+
+def render_cart(items):
+    """
+    Resolve prices and stock for every line with one query.
+
+    Returns data shaped for ``CartSerializer``; products that are gone or
+    inactive are dropped.
+    """
+    if not items:
+        return {'items': [], 'total_amount': Decimal('0.00')}
+
+    products = {
+        row['id']: row
+        for row in Product.objects.filter(pk__in=list(items), is_active=True).values(
+            'id', 'name', 'price', 'stock_quantity'
+        )
+    }
+    lines = []
+    total = Decimal('0.00')
+    for product_id, quantity in items.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        line_total = product['price'] * quantity
+        total += line_total
+        lines.append({
+            'product_id': product_id,
+            'quantity': quantity,
+            'name': product['name'],
+            'price': product['price'],
+            'line_total': line_total,
+            'in_stock': product['stock_quantity'] >= quantity,
+        })
+    return {'items': lines, 'total_amount': total}
+
+
+def available_stock(product_ids):
+    """``{product_id: stock_quantity}`` for active products, in one query."""
+    return dict(
+        Product.objects.filter(pk__in=list(product_ids), is_active=True).values_list('id', 'stock_quantity')
+    )
+
+
+def check_stock(items):
+    """Raise ValueError if any line's product is unavailable or short of stock."""
+    stock = available_stock(items.keys())
+    for product_id, quantity in items.items():
+        if product_id not in stock:
+            raise ValueError(f'Product {product_id} is not available')
+        if quantity > stock[product_id]:
+            raise ValueError(f'Only {stock[product_id]} of product {product_id} in stock')
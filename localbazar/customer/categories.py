@@ -0,0 +1,244 @@
+"""
+Category tree helpers.
+
+Categories form a tree through ``Category.parent``. Each row also stores a
+materialized ``path``: the ids of its ancestors and its own, zero-padded to
+``STEP`` digits each (``00000003`` + ``00000017``). The subtree under a
+category is then every row whose path starts with its path, which
+``subtree_q`` turns into the index range ``path >= p AND path < p + 1``.
+Paths are digits only, so every database collation orders them alike.
+
+``product_count`` holds a category's own active products and
+``total_product_count`` adds those of its descendants, so the navigation
+menu never COUNTs. Product signals keep both up to date through
+``adjust_counts``; bulk writers (``bulk_create``, ``update()``) must call it
+themselves. ``rebuild`` recomputes paths and counts from the parent links
+and the products table.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Max, Q, Value, When
+from django.db.models.functions import Cast, Concat, Length, LPad, Substr
+from django.utils.text import slugify
+
+from .models import Category, Product
+
+STEP = 8
+MAX_DEPTH = Category._meta.get_field('path').max_length // STEP
+
+
+def path_segment(pk):
+    return f'{pk:0{STEP}d}'
+
+
+def ancestor_ids(path):
+    """Ids on ``path``, root first; the last one is the category itself."""
+    return [int(path[start:start + STEP]) for start in range(0, len(path), STEP)]
+
+
+def _path_upper_bound(path):
+    """Smallest path greater than every path starting with ``path``."""
+    upper = str(int(path) + 1).zfill(len(path))
+    return upper if len(upper) == len(path) else None
+
+
+def subtree_q(path, field='path'):
+    """Q object matching the category at ``path`` and all its descendants."""
+    condition = Q(**{f'{field}__gte': path})
+    upper = _path_upper_bound(path)
+    if upper is not None:
+        condition &= Q(**{f'{field}__lt': upper})
+    return condition
+
+
+def subtree_products(queryset, path):
+    """Products of ``queryset`` in the category at ``path`` or any of its subcategories."""
+    return queryset.filter(subtree_q(path, field='category__path'))
+
+
+def build_tree(rows):
+    """Nest category dicts (with ``id`` and ``parent_id``, in path order) under ``children``."""
+    nodes = {}
+    roots = []
+    for row in rows:
+        parent_id = row.pop('parent_id')
+        node = nodes[row['id']] = {**row, 'children': []}
+        parent = nodes.get(parent_id)
+        (parent['children'] if parent is not None else roots).append(node)
+    return roots
+
+
+def unique_slugs(names, exclude_pk=None):
+    """{name: slug} with slugs unused by other categories and each other."""
+    bases = {name: slugify(name)[:90] or 'category' for name in names}
+    taken = set()
+    if bases:
+        query = Q()
+        for base in set(bases.values()):
+            query |= Q(slug__startswith=base)
+        taken = set(Category.objects.filter(query).exclude(pk=exclude_pk).values_list('slug', flat=True))
+    slugs = {}
+    for name, base in bases.items():
+        slug, suffix = base, 2
+        while slug in taken:
+            slug, suffix = f'{base}-{suffix}', suffix + 1
+        taken.add(slug)
+        slugs[name] = slug
+    return slugs
+
+
+def stored_path(category):
+    """The path in the database, which the instance's copy may lag behind."""
+    if category.pk is None:
+        return ''
+    return Category.objects.filter(pk=category.pk).values_list('path', flat=True).first() or ''
+
+
+def check_parent(category):
+    """Raise ValidationError if ``category``'s parent would make a cycle or too deep a tree."""
+    if category.parent_id is None:
+        return
+    parent_path = Category.objects.values_list('path', flat=True).get(pk=category.parent_id)
+    path = stored_path(category)
+    if path and parent_path.startswith(path):
+        raise ValidationError({'parent': ValidationError(
+            'A category cannot be moved under itself or one of its subcategories.', code='cycle'
+        )})
+    subtree_depth = 1
+    if path:
+        longest = Category.objects.filter(subtree_q(path)).aggregate(length=Max(Length('path')))['length']
+        subtree_depth = (longest - len(path)) // STEP + 1
+    if len(parent_path) // STEP + subtree_depth > MAX_DEPTH:
+        raise ValidationError({'parent': ValidationError(
+            f'Categories can be nested at most {MAX_DEPTH} levels deep.', code='max_depth'
+        )})
+
+
+def _counter(deltas):
+    return Case(*[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()], default=Value(0))
+
+
+def _adjust_totals(deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if deltas:
+        Category.objects.filter(pk__in=deltas).update(
+            total_product_count=F('total_product_count') + _counter(deltas)
+        )
+
+
+def place(category):
+    """
+    Give a saved category its path from its parent's. When the parent
+    changed, moves the path of every descendant along and the subtree's
+    products from the old ancestors' totals to the new ones.
+    """
+    parent_path = ''
+    if category.parent_id is not None:
+        parent_path = Category.objects.values_list('path', flat=True).get(pk=category.parent_id)
+    path = parent_path + path_segment(category.pk)
+    old_path = stored_path(category)
+    if path == old_path:
+        category.path = path
+        return
+
+    with transaction.atomic():
+        if old_path:
+            Category.objects.filter(subtree_q(old_path)).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1), output_field=CharField())
+            )
+            total = Category.objects.values_list('total_product_count', flat=True).get(pk=category.pk)
+            deltas = defaultdict(int)
+            for ancestor in ancestor_ids(old_path)[:-1]:
+                deltas[ancestor] -= total
+            for ancestor in ancestor_ids(parent_path):
+                deltas[ancestor] += total
+            _adjust_totals(deltas)
+        else:
+            Category.objects.filter(pk=category.pk).update(path=path)
+    category.path = path
+
+
+def place_new_roots():
+    """Give top-level categories created by ``bulk_create`` (no signals) their path."""
+    Category.objects.filter(path='', parent__isnull=True).update(
+        path=LPad(Cast('pk', CharField()), STEP, Value('0'))
+    )
+
+
+def adjust_counts(deltas):
+    """
+    Apply ``{category_id: change in active products}`` to the categories'
+    own counts and to the totals of them and their ancestors. ``None``
+    keys (uncategorized products) are ignored.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    if not deltas:
+        return
+    totals = defaultdict(int)
+    for pk, path in Category.objects.filter(pk__in=deltas).values_list('pk', 'path'):
+        for ancestor in ancestor_ids(path):
+            totals[ancestor] += deltas[pk]
+    Category.objects.filter(pk__in=deltas).update(product_count=F('product_count') + _counter(deltas))
+    _adjust_totals(totals)
+
+
+def listing_changes(before, after):
+    """Count deltas for a product going from ``(category_id, is_active)`` ``before`` to ``after``."""
+    deltas = defaultdict(int)
+    if before is not None and before[1]:
+        deltas[before[0]] -= 1
+    if after is not None and after[1]:
+        deltas[after[0]] += 1
+    return deltas
+
+
+def rebuild():
+    """
+    Recompute every path and count. Returns the number of categories that
+    were out of date. Category rows stay locked meanwhile, so count updates
+    from concurrent product saves wait instead of being lost.
+    """
+    with transaction.atomic():
+        rows = {
+            pk: (parent_id, path, own, total)
+            for pk, parent_id, path, own, total in Category.objects.select_for_update().values_list(
+                'pk', 'parent_id', 'path', 'product_count', 'total_product_count'
+            )
+        }
+        counts = dict(
+            Product.objects.filter(is_active=True, category__isnull=False)
+            .values_list('category').annotate(count=Count('pk')).order_by()
+        )
+        children = defaultdict(list)
+        for pk, (parent_id, *_) in rows.items():
+            children[parent_id].append(pk)
+
+        paths = {}
+        order = []
+        stack = [(pk, '') for pk in sorted(children[None], reverse=True)]
+        while stack:
+            pk, parent_path = stack.pop()
+            paths[pk] = parent_path + path_segment(pk)
+            order.append(pk)
+            stack.extend((child, paths[pk]) for child in sorted(children[pk], reverse=True))
+        unreachable = sorted(set(rows) - set(paths))
+        if unreachable:
+            raise ValueError(f'Categories {unreachable} have a parent cycle')
+
+        totals = {pk: counts.get(pk, 0) for pk in rows}
+        for pk in reversed(order):
+            parent_id = rows[pk][0]
+            if parent_id is not None:
+                totals[parent_id] += totals[pk]
+
+        stale = []
+        for pk, (parent_id, path, own, total) in rows.items():
+            if (path, own, total) != (paths[pk], counts.get(pk, 0), totals[pk]):
+                stale.append(Category(
+                    pk=pk, path=paths[pk], product_count=counts.get(pk, 0), total_product_count=totals[pk]
+                ))
+        Category.objects.bulk_update(stale, ['path', 'product_count', 'total_product_count'], batch_size=500)
+    return len(stale)
@@ -0,0 +1,398 @@
+"""
+Checkout pipeline for LocalBazar.
+
+Stock is reserved with conditional updates
+(``UPDATE ... SET stock_quantity = stock_quantity - n WHERE stock_quantity >= n``)
+inside one short transaction: there is no read-modify-write window, so
+concurrent buyers cannot oversell, and hot rows stay locked only until the
+order row is written. Products are always updated in id order to keep lock
+acquisition deadlock-free.
+
+Each order's lines are also written as ``OrderLine`` rows and summarized
+per shop in ``ShopOrder``, the seller order inbox.
+
+Statuses follow ``ORDER_TRANSITIONS`` per shop part: each seller confirms,
+ships and cancels their own ``ShopOrder`` with ``transition_shop_orders``,
+and the order's status follows its parts (``derive_order_status``).
+``transition_orders`` moves whole orders (a customer cancelling). Both take
+any number of orders with one locking SELECT, one conditional UPDATE per
+table and bulk INSERTs into ``OrderStatusHistory``, whatever the batch size.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils import response_cache
+from .models import Order, OrderLine, OrderStatusHistory, Product, ShopOrder
+from .signals import low_stock_reached, order_status_changed, shop_order_status_changed
+
+# status -> statuses it may move to. Cancelling releases the order's stock.
+ORDER_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+}
+
+CANCELLABLE_STATUSES = tuple(status for status, targets in ORDER_TRANSITIONS.items() if 'cancelled' in targets)
+
+# Statuses short of cancelled, least advanced first.
+PROGRESSION = ('pending', 'confirmed', 'shipped', 'delivered')
+
+
+class CheckoutError(Exception):
+    """Raised when an order cannot be placed or cancelled."""
+
+
+class InvalidTransition(CheckoutError):
+    def __init__(self, order_id, status, new_status):
+        self.order_id = order_id
+        self.status = status
+        super().__init__(f'Order {order_id} cannot move from {status} to {new_status}')
+
+
+class OutOfStockError(CheckoutError):
+    def __init__(self, product_id):
+        self.product_id = product_id
+        super().__init__(f'Product {product_id} is out of stock or unavailable')
+
+
+def _merge_lines(items):
+    quantities = {}
+    for item in items:
+        product_id = int(item['product_id'])
+        quantities[product_id] = quantities.get(product_id, 0) + int(item['quantity'])
+    return quantities
+
+
+def index_orders(orders, product_shops=None):
+    """
+    Write the ``OrderLine`` and ``ShopOrder`` rows for ``orders`` from their
+    ``items``. ``product_shops`` ({product_id: shop_id}) is looked up if not given.
+    Returns the ``ShopOrder`` rows.
+    """
+    if product_shops is None:
+        product_ids = {int(item['product_id']) for order in orders for item in order.items}
+        product_shops = dict(Product.objects.filter(pk__in=product_ids).values_list('id', 'shop_id'))
+
+    lines = []
+    shop_orders = []
+    for order in orders:
+        by_shop = {}
+        for item in order.items:
+            product_id, quantity = int(item['product_id']), int(item['quantity'])
+            price = Decimal(str(item['price']))
+            shop_id = product_shops.get(product_id)
+            lines.append(OrderLine(
+                order=order, product_id=product_id if product_id in product_shops else None,
+                shop_id=shop_id, quantity=quantity, price=price,
+            ))
+            if shop_id is None:
+                continue
+            if shop_id not in by_shop:
+                by_shop[shop_id] = ShopOrder(
+                    shop_id=shop_id, order=order, customer_id=order.customer_id,
+                    status=order.status, created_at=order.created_at, subtotal=Decimal('0.00'),
+                )
+            by_shop[shop_id].units += quantity
+            by_shop[shop_id].subtotal += price * quantity
+        shop_orders.extend(by_shop.values())
+
+    OrderLine.objects.bulk_create(lines, batch_size=1000)
+    return ShopOrder.objects.bulk_create(shop_orders, batch_size=1000)
+
+
+def _invalidate_catalog():
+    # Stock moved through update(), which sends no model signals.
+    transaction.on_commit(lambda: response_cache.invalidate('product'))
+
+
+def place_order(customer, items, shipping_address='', payment_method=''):
+    """
+    Reserve stock for every line and create the order, all or nothing.
+
+    ``items`` is an iterable of ``{'product_id': ..., 'quantity': ...}``.
+    Prices are read from the database; client supplied prices are ignored.
+    """
+    quantities = _merge_lines(items)
+    if not quantities:
+        raise CheckoutError('An order needs at least one item')
+
+    with transaction.atomic():
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            reserved = Product.objects.filter(
+                pk=product_id, is_active=True, stock_quantity__gte=quantity
+            ).update(stock_quantity=F('stock_quantity') - quantity)
+            if not reserved:
+                raise OutOfStockError(product_id)
+
+        prices = {}
+        product_shops = {}
+        low_stock = []
+        for product_id, shop_id, price, stock, threshold in Product.objects.filter(pk__in=quantities).values_list(
+            'id', 'shop_id', 'price', 'stock_quantity', 'reorder_threshold'
+        ):
+            prices[product_id] = price
+            product_shops[product_id] = shop_id
+            if stock <= threshold < stock + quantities[product_id]:
+                low_stock.append(product_id)
+
+        lines = []
+        total = Decimal('0.00')
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            total += prices[product_id] * quantity
+            lines.append({
+                'product_id': product_id,
+                'quantity': quantity,
+                'price': str(prices[product_id]),
+            })
+
+        order = Order.objects.create(
+            customer=customer,
+            items=lines,
+            total_amount=total,
+            shipping_address=shipping_address,
+            payment_method=payment_method,
+        )
+        shop_orders = index_orders([order], product_shops)
+        OrderStatusHistory.objects.create(order=order, to_status=order.status, changed_by=customer)
+        order_status_changed.send(sender=Order, order=order, old_status=None, new_status=order.status)
+        for shop_order in shop_orders:
+            shop_order_status_changed.send(
+                sender=ShopOrder, shop_order=shop_order, order=order, old_status=None, new_status=order.status
+            )
+        _invalidate_catalog()
+        if low_stock:
+            transaction.on_commit(
+                lambda: low_stock_reached.send(sender=Product, product_ids=low_stock)
+            )
+    return order
+
+
+def release_stock(lines):
+    """Return the quantities of ``lines`` to stock. Call inside a transaction."""
+    quantities = _merge_lines(lines)
+    for product_id in sorted(quantities):
+        Product.objects.filter(pk=product_id).update(
+            stock_quantity=F('stock_quantity') + quantities[product_id]
+        )
+    _invalidate_catalog()
+
+
+def source_statuses(new_status):
+    """Statuses an order may be in to move to ``new_status``."""
+    return tuple(status for status, targets in ORDER_TRANSITIONS.items() if new_status in targets)
+
+
+def derive_order_status(statuses):
+    """
+    An order's status from its shop parts': the least advanced part that is
+    not cancelled, or cancelled once every part is.
+    """
+    active = [status for status in statuses if status != 'cancelled']
+    if not active:
+        return 'cancelled'
+    return min(active, key=PROGRESSION.index)
+
+
+@dataclass
+class TransitionResult:
+    # Orders with a moved part or moved whole, with ``status`` updated.
+    transitioned: list = field(default_factory=list)
+    # Requested ids that were not moved: {order_id: InvalidTransition or None if not found}.
+    skipped: dict = field(default_factory=dict)
+    # ShopOrder rows now in the new status, with ``status`` updated.
+    shop_orders: list = field(default_factory=list)
+
+
+def _lock_orders(queryset, order_ids):
+    # Every transition locks the orders first, in id order, so changes to
+    # an order and its parts serialize and cannot deadlock.
+    return list(
+        Order.objects.select_for_update().filter(
+            pk__in=queryset.filter(pk__in=order_ids).values('pk')
+        ).order_by('pk')
+    )
+
+
+def _move_parts(parts, new_status, changed_by, note, released):
+    """
+    Move the ``ShopOrder`` rows ``parts`` of locked orders to ``new_status``.
+    When cancelling, returns the stock of lines whose ``(order_id, shop_id)``
+    is in ``released``.
+    """
+    if parts:
+        ShopOrder.objects.filter(
+            pk__in=[part.pk for part in parts], status__in=source_statuses(new_status)
+        ).update(status=new_status)
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(
+                order_id=part.order_id, shop_id=part.shop_id, from_status=part.status,
+                to_status=new_status, changed_by=changed_by, note=note,
+            )
+            for part in parts
+        ])
+    if new_status == 'cancelled' and released:
+        lines = OrderLine.objects.filter(
+            order__in={order_id for order_id, _ in released}, product__isnull=False
+        ).values_list('order_id', 'shop_id', 'product_id', 'quantity')
+        release_stock([
+            {'product_id': product_id, 'quantity': quantity}
+            for order_id, shop_id, product_id, quantity in lines
+            if (order_id, shop_id) in released
+        ])
+
+
+def _sync_orders(orders, changed_by, note, default=None):
+    """
+    Give locked ``orders`` the status their parts now derive, recording and
+    signalling the changes. Orders without parts take ``default`` if given.
+    """
+    statuses = defaultdict(list)
+    for order_id, status in ShopOrder.objects.filter(order__in=orders).values_list('order_id', 'status'):
+        statuses[order_id].append(status)
+    changed = defaultdict(list)
+    for order in orders:
+        if order.pk in statuses:
+            new_status = derive_order_status(statuses[order.pk])
+        else:
+            new_status = default or order.status
+        if new_status != order.status:
+            changed[new_status].append(order)
+    if not changed:
+        return
+
+    now = timezone.now()
+    history = []
+    for new_status, group in changed.items():
+        Order.objects.filter(pk__in=[order.pk for order in group]).update(status=new_status, updated_at=now)
+        history.extend(
+            OrderStatusHistory(
+                order=order, from_status=order.status, to_status=new_status, changed_by=changed_by, note=note,
+            )
+            for order in group
+        )
+    OrderStatusHistory.objects.bulk_create(history)
+    for new_status, group in changed.items():
+        for order in group:
+            old_status, order.status, order.updated_at = order.status, new_status, now
+            order_status_changed.send(sender=Order, order=order, old_status=old_status, new_status=new_status)
+
+
+def _send_part_changes(parts, orders, new_status):
+    orders = {order.pk: order for order in orders}
+    for part in parts:
+        old_status, part.status = part.status, new_status
+        shop_order_status_changed.send(
+            sender=ShopOrder, shop_order=part, order=orders[part.order_id],
+            old_status=old_status, new_status=new_status,
+        )
+
+
+def transition_shop_orders(order_ids, new_status, shop_ids, changed_by=None, note=''):
+    """
+    Move the parts of ``order_ids`` that belong to ``shop_ids`` (a seller's
+    shops) to ``new_status``, and each order to the status its parts derive.
+
+    Orders without a part in ``shop_ids`` count as not found. An order is
+    skipped when any of those parts does not allow the move; cancelling a
+    part returns only that shop's stock.
+    """
+    if new_status not in ORDER_TRANSITIONS:
+        raise CheckoutError(f'Unknown order status {new_status}')
+    order_ids = set(order_ids)
+    sources = source_statuses(new_status)
+    result = TransitionResult()
+
+    with transaction.atomic():
+        owned = ShopOrder.objects.filter(shop_id__in=shop_ids).values('order_id')
+        orders = _lock_orders(Order.objects.filter(pk__in=owned), order_ids)
+        parts = defaultdict(list)
+        for part in ShopOrder.objects.filter(order__in=orders, shop_id__in=shop_ids).order_by('pk'):
+            parts[part.order_id].append(part)
+        for order in orders:
+            blocking = [part for part in parts[order.pk] if part.status not in sources]
+            if blocking:
+                result.skipped[order.pk] = InvalidTransition(order.pk, blocking[0].status, new_status)
+            else:
+                result.transitioned.append(order)
+                result.shop_orders.extend(parts[order.pk])
+        result.skipped.update({order_id: None for order_id in order_ids - {order.pk for order in orders}})
+        if not result.transitioned:
+            return result
+
+        _move_parts(
+            result.shop_orders, new_status, changed_by, note,
+            released={(part.order_id, part.shop_id) for part in result.shop_orders},
+        )
+        _send_part_changes(result.shop_orders, result.transitioned, new_status)
+        _sync_orders(result.transitioned, changed_by, note)
+    return result
+
+
+def transition_orders(order_ids, new_status, changed_by=None, note='', queryset=None):
+    """
+    Move every order in ``order_ids`` that allows it to ``new_status``,
+    with all of its parts that are not cancelled already.
+
+    Orders outside ``queryset`` (e.g. another customer's) count as not
+    found. The rows are locked in id order, so the conditional UPDATEs
+    match exactly the rows that were read and concurrent transitions of
+    the same orders serialize instead of applying twice. Orders whose
+    status or parts do not allow the move are reported in ``skipped``;
+    the rest commit.
+    """
+    if new_status not in ORDER_TRANSITIONS:
+        raise CheckoutError(f'Unknown order status {new_status}')
+    order_ids = set(order_ids)
+    sources = source_statuses(new_status)
+    queryset = Order.objects.all() if queryset is None else queryset
+    result = TransitionResult()
+
+    with transaction.atomic():
+        orders = _lock_orders(queryset, order_ids)
+        parts = defaultdict(list)
+        for part in ShopOrder.objects.filter(order__in=orders).exclude(status='cancelled').order_by('pk'):
+            parts[part.order_id].append(part)
+        for order in orders:
+            blocking = [part.status for part in parts[order.pk] if part.status not in sources]
+            if order.status not in sources or blocking:
+                result.skipped[order.pk] = InvalidTransition(order.pk, (blocking or [order.status])[0], new_status)
+            else:
+                result.transitioned.append(order)
+                result.shop_orders.extend(parts[order.pk])
+        result.skipped.update({order_id: None for order_id in order_ids - {order.pk for order in orders}})
+        if not result.transitioned:
+            return result
+
+        # Lines without a shop (deleted since) go with the whole order.
+        released = {(part.order_id, part.shop_id) for part in result.shop_orders}
+        released.update((order.pk, None) for order in result.transitioned)
+        _move_parts(result.shop_orders, new_status, changed_by, note, released)
+        _send_part_changes(result.shop_orders, result.transitioned, new_status)
+        _sync_orders(result.transitioned, changed_by, note, default=new_status)
+    return result
+
+
+def cancel_order(order, cancelled_by=None):
+    """
+    Cancel ``order`` and release its reserved stock.
+
+    The status change is a conditional update, so when two requests race to
+    cancel the same order only one of them releases the stock.
+    """
+    result = transition_orders([order.pk], 'cancelled', changed_by=cancelled_by)
+    if not result.transitioned:
+        raise CheckoutError('Order cannot be cancelled')
+    order.status = 'cancelled'
+    order.updated_at = result.transitioned[0].updated_at
+    return order
@@ -0,0 +1,188 @@
+"""
+Filtered product listings with facet counts.
+
+``filter_products`` applies the ``SearchSerializer`` filters. ``facet_counts``
+counts the filtered products by category, shop, price bucket and stock in
+one grouped query: GROUPING SETS on Postgres (a single scan of the filtered
+rows), a UNION ALL of grouped selects over a CTE elsewhere. Category counts
+are rolled up the tree, so a parent's count is what filtering on it returns.
+
+Counts are cached per filter set under the product, shop and category
+generations of ``utils.response_cache``; sorting and paging are not part of
+the key, so walking through the pages of one query never recounts.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+
+from utils import response_cache
+
+from . import categories
+from .models import Category, Shop
+from .search import search_products, tokenize
+
+DEFAULTS = {
+    # Upper bounds of the price buckets; the last bucket is open ended.
+    'PRICE_BUCKETS': (100, 500, 1000, 5000),
+    'MAX_SHOPS': 20,
+    'TIMEOUT': 300,
+}
+
+# Validated SearchSerializer fields that change which products match.
+FILTER_FIELDS = ('query', 'category', 'shop', 'location', 'min_price', 'max_price', 'in_stock')
+FACET_COLUMNS = ('category_id', 'shop_id', 'price_bucket', 'in_stock')
+NAMESPACES = ('product', 'shop', 'category')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PRODUCT_FACETS', {})}
+
+
+def filter_products(queryset, filters):
+    """Narrow a Product queryset by validated ``SearchSerializer`` data."""
+    if filters.get('category'):
+        path = Category.objects.filter(slug=filters['category']).values_list('path', flat=True).first()
+        queryset = categories.subtree_products(queryset, path) if path else queryset.none()
+    if filters.get('shop') is not None:
+        queryset = queryset.filter(shop_id=filters['shop'])
+    if filters.get('location'):
+        queryset = queryset.filter(shop__location__iexact=filters['location'])
+    if filters.get('min_price') is not None:
+        queryset = queryset.filter(price__gte=filters['min_price'])
+    if filters.get('max_price') is not None:
+        queryset = queryset.filter(price__lte=filters['max_price'])
+    if filters.get('in_stock') is True:
+        queryset = queryset.filter(stock_quantity__gt=0)
+    elif filters.get('in_stock') is False:
+        queryset = queryset.filter(stock_quantity=0)
+    # Last, so the Python search backend only ranks products that pass the filters.
+    if filters.get('query'):
+        queryset = search_products(queryset, filters['query'])
+    return queryset
+
+
+def _grouped_counts(queryset, bounds, grouping_sets=None):
+    """
+    ``{facet column: {value: count}}`` for ``queryset``, in one query.
+    ``grouping_sets`` defaults to whether the database is Postgres.
+    """
+    rows = queryset.order_by().annotate(
+        price_bucket=Case(
+            *[When(price__lt=bound, then=Value(i)) for i, bound in enumerate(bounds)],
+            default=Value(len(bounds)),
+            output_field=IntegerField(),
+        ),
+        in_stock=Case(When(stock_quantity__gt=0, then=Value(1)), default=Value(0), output_field=IntegerField()),
+    ).values(*FACET_COLUMNS)
+    counts = {column: {} for column in FACET_COLUMNS}
+    try:
+        sql, params = rows.query.sql_with_params()
+    except EmptyResultSet:
+        # queryset.none(), e.g. an unknown category or a search without matches.
+        return counts
+
+    connection = connections[queryset.db]
+    if grouping_sets is None:
+        grouping_sets = connection.vendor == 'postgresql'
+    if grouping_sets:
+        flags = ', '.join(f'GROUPING({column})' for column in FACET_COLUMNS)
+        sets = ', '.join(f'({column})' for column in FACET_COLUMNS)
+        query = (
+            f'SELECT {flags}, {", ".join(FACET_COLUMNS)}, COUNT(*) '
+            f'FROM ({sql}) AS filtered GROUP BY GROUPING SETS ({sets})'
+        )
+    else:
+        query = f'WITH filtered AS ({sql}) ' + ' UNION ALL '.join(
+            f'SELECT {i}, {column}, COUNT(*) FROM filtered GROUP BY {column}'
+            for i, column in enumerate(FACET_COLUMNS)
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        for row in cursor.fetchall():
+            if grouping_sets:
+                # GROUPING() is 0 for the column the row is grouped by.
+                facet = row[:len(FACET_COLUMNS)].index(0)
+                value = row[len(FACET_COLUMNS) + facet]
+            else:
+                facet, value = row[0], row[1]
+            counts[FACET_COLUMNS[facet]][value] = row[-1]
+    return counts
+
+
+def _category_facet(counts):
+    if not any(pk is not None for pk in counts):
+        return []
+    rows = list(Category.objects.order_by('path').values('id', 'parent_id', 'name', 'slug', 'path'))
+    paths = {row['id']: row['path'] for row in rows}
+    totals = defaultdict(int)
+    for pk, count in counts.items():
+        if pk in paths:
+            for ancestor in categories.ancestor_ids(paths[pk]):
+                totals[ancestor] += count
+    nodes = []
+    for row in rows:
+        if totals[row['id']]:
+            del row['path']
+            nodes.append({**row, 'count': totals[row['id']]})
+    return categories.build_tree(nodes)
+
+
+def _shop_facet(counts, limit):
+    top = sorted(
+        ((count, pk) for pk, count in counts.items() if pk is not None),
+        key=lambda item: (-item[0], item[1]),
+    )[:limit]
+    names = dict(Shop.objects.filter(pk__in=[pk for _, pk in top]).values_list('pk', 'name'))
+    return [{'id': pk, 'name': names.get(pk), 'count': count} for count, pk in top]
+
+
+def _price_facet(counts, bounds):
+    lower = [0, *bounds]
+    upper = [*bounds, None]
+    # Buckets hold min <= price < max.
+    return [
+        {'min': lower[i], 'max': upper[i], 'count': counts.get(i, 0)}
+        for i in range(len(bounds) + 1)
+    ]
+
+
+def compute_facets(queryset):
+    config = get_config()
+    bounds = config['PRICE_BUCKETS']
+    counts = _grouped_counts(queryset, bounds)
+    stock = counts['in_stock']
+    return {
+        'total': sum(stock.values()),
+        'categories': _category_facet(counts['category_id']),
+        'shops': _shop_facet(counts['shop_id'], config['MAX_SHOPS']),
+        'price': _price_facet(counts['price_bucket'], bounds),
+        'stock': {'in_stock': stock.get(1, 0), 'out_of_stock': stock.get(0, 0)},
+    }
+
+
+def facet_key(filters):
+    """The filters that decide the counts, normalized; sorting is left out."""
+    parts = []
+    for field in FILTER_FIELDS:
+        value = filters.get(field)
+        if field == 'query' and value:
+            value = ' '.join(tokenize(value))
+        elif field == 'location' and value:
+            value = value.lower()
+        if value is not None and value != '':
+            parts.append(f'{field}={value}')
+    return parts
+
+
+def facet_counts(queryset, filters):
+    """Cached facets of ``queryset``, the products matching ``filters``."""
+    config = get_config()
+    parts = [*facet_key(filters), repr(tuple(config['PRICE_BUCKETS'])), config['MAX_SHOPS']]
+    return response_cache.get_or_build(
+        'facets', parts, NAMESPACES, lambda: compute_facets(queryset), config['TIMEOUT']
+    )
@@ -0,0 +1,148 @@
+"""
+Geohash helpers for nearby-shop lookups.
+
+Shops store a precision-9 geohash (~5 m cells). A radius query picks the
+coarsest precision whose cells are at least as large as the radius, takes
+the centre cell plus its eight neighbours and turns each into an indexed
+``geohash`` range. Only shops in those nine cells are loaded; exact
+great-circle distances are then computed for that small candidate set.
+"""
+
+import math
+
+from django.db.models import Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+STORED_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+# Approximate (width, height) of a geohash cell in km at the equator.
+CELL_SIZES_KM = {
+    1: (5009.4, 4992.6),
+    2: (1252.3, 624.1),
+    3: (156.5, 156.0),
+    4: (39.1, 19.5),
+    5: (4.89, 4.89),
+    6: (1.22, 0.61),
+    7: (0.153, 0.153),
+    8: (0.038, 0.019),
+    9: (0.0048, 0.0048),
+}
+
+
+def encode(latitude, longitude, precision=STORED_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def cell_dimensions_deg(precision):
+    """(lat_degrees, lng_degrees) spanned by one cell at ``precision``."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def precision_for_radius(latitude, radius_km):
+    """Finest precision whose cells still cover ``radius_km`` in every direction."""
+    shrink = max(math.cos(math.radians(latitude)), 0.01)
+    for precision in range(STORED_PRECISION, 0, -1):
+        width, height = CELL_SIZES_KM[precision]
+        if min(width * shrink, height) >= radius_km:
+            return precision
+    return 1
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """The centre cell and its neighbours at a precision suited to ``radius_km``."""
+    precision = precision_for_radius(latitude, radius_km)
+    lat_step, lng_step = cell_dimensions_deg(precision)
+    cells = set()
+    for d_lat in (-lat_step, 0, lat_step):
+        for d_lng in (-lng_step, 0, lng_step):
+            lat = min(max(latitude + d_lat, -90.0), 90.0)
+            lng = (longitude + d_lng + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lng, precision))
+    return sorted(cells)
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every geohash starting with ``prefix``."""
+    chars = list(prefix)
+    while chars:
+        index = BASE32.index(chars[-1])
+        if index + 1 < len(BASE32):
+            chars[-1] = BASE32[index + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def geohash_prefix_q(cells, field='geohash'):
+    """Q object matching rows whose geohash falls in any of ``cells``."""
+    query = Q()
+    for cell in cells:
+        upper = _prefix_upper_bound(cell)
+        condition = Q(**{f'{field}__gte': cell})
+        if upper is not None:
+            condition &= Q(**{f'{field}__lt': upper})
+        query |= condition
+    return query
+
+
+def distance_km(latitude, longitude, lat_field='latitude', lng_field='longitude'):
+    """SQL expression for each row's great-circle distance in km from a point (haversine)."""
+    lat = Radians(lat_field)
+    half_d_lat = (lat - math.radians(latitude)) / 2
+    half_d_lng = (Radians(lng_field) - math.radians(longitude)) / 2
+    a = Power(Sin(half_d_lat), 2) + math.cos(math.radians(latitude)) * Cos(lat) * Power(Sin(half_d_lng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def nearby(queryset, latitude, longitude, radius_km):
+    """
+    Rows of ``queryset`` within ``radius_km``, nearest first, annotated with
+    ``distance_km``. The database computes distances for the rows in the
+    covering cells only, so paging and counting need no candidate list.
+    """
+    cells = covering_cells(latitude, longitude, radius_km)
+    return queryset.filter(geohash_prefix_q(cells)).annotate(
+        distance_km=distance_km(latitude, longitude)
+    ).filter(distance_km__lte=radius_km).order_by('distance_km', 'pk')
@@ -0,0 +1,183 @@
+"""
+Image renditions for catalog images.
+
+Uploaded originals (often multi-megabyte phone photos) are resized into a
+fixed set of sizes in WebP and JPEG on a background thread pool once the
+upload's transaction commits. Renditions are stored content-addressed under
+``renditions/<sha256>/`` next to a manifest written last, so an image that
+has been processed once, by any product, shop or category, is never
+processed again. When they are ready the model's ``image_hash`` is set and
+serializers emit rendition URLs from it without touching storage.
+"""
+
+import hashlib
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from utils import response_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Longest edge in pixels; images are never upscaled.
+    'SIZES': {'thumb': 200, 'medium': 600, 'large': 1200},
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    'PREFIX': 'renditions',
+    'WORKERS': 2,
+}
+
+CONTENT_TYPES = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+# Models with renditions and the response cache namespace they belong to.
+IMAGE_MODELS = {
+    'customer.Product': 'product',
+    'customer.Shop': 'shop',
+    'customer.Category': 'category',
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_RENDITIONS', {})}
+
+
+def rendition_path(digest, size, fmt, config=None):
+    config = config or get_config()
+    return f"{config['PREFIX']}/{digest[:2]}/{digest}/{size}.{fmt}"
+
+
+def manifest_path(digest, config=None):
+    config = config or get_config()
+    return f"{config['PREFIX']}/{digest[:2]}/{digest}/manifest.json"
+
+
+def rendition_urls(digest, storage):
+    """``{size: {format: url}}`` for a processed image."""
+    config = get_config()
+    return {
+        size: {fmt: storage.url(rendition_path(digest, size, fmt, config)) for fmt in config['FORMATS']}
+        for size in config['SIZES']
+    }
+
+
+PLACEHOLDER_DIGEST = '0' * 64
+
+
+def fill_digest(template, digest):
+    """Put ``digest`` into a URL built for ``PLACEHOLDER_DIGEST``."""
+    return template.replace(f'/00/{PLACEHOLDER_DIGEST}/', f'/{digest[:2]}/{digest}/')
+
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: composite transparent images onto white."""
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save(storage, path, data):
+    if storage.exists(path):
+        return
+    saved = storage.save(path, ContentFile(data))
+    if saved != path:
+        # Another worker wrote the same rendition first; keep theirs.
+        storage.delete(saved)
+
+
+def render(storage, name, digest):
+    """Write every rendition of the image at ``name``. Returns the manifest."""
+    # Imported here to keep Pillow off the startup path.
+    from PIL import Image, ImageOps
+
+    config = get_config()
+    largest = max(config['SIZES'].values())
+    with storage.open(name, 'rb') as file:
+        image = Image.open(file)
+        # Let the JPEG decoder downscale while decoding; much faster for
+        # large photos and never below the biggest rendition.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    manifest = {'source': {'width': image.width, 'height': image.height}, 'renditions': {}}
+    for size_name, size in sorted(config['SIZES'].items(), key=lambda item: -item[1]):
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt in config['FORMATS']:
+            buffer = io.BytesIO()
+            output = resized if fmt == 'webp' else _flatten(resized)
+            if fmt == 'webp' and output.mode not in ('RGB', 'RGBA'):
+                output = output.convert('RGBA' if 'A' in output.getbands() else 'RGB')
+            output.save(buffer, CONTENT_TYPES[fmt], quality=config['QUALITY'], optimize=fmt == 'jpeg')
+            _save(storage, rendition_path(digest, size_name, fmt, config), buffer.getvalue())
+        manifest['renditions'][size_name] = {'width': resized.width, 'height': resized.height}
+
+    # Written last: its presence means every rendition exists.
+    _save(storage, manifest_path(digest, config), json.dumps(manifest).encode())
+    return manifest
+
+
+def process_image(model_label, pk, name):
+    """Make sure renditions exist for ``name`` and record its hash on the row."""
+    model = apps.get_model(model_label)
+    storage = model._meta.get_field('image').storage
+    with storage.open(name, 'rb') as file:
+        digest = hash_file(file)
+    if not storage.exists(manifest_path(digest)):
+        render(storage, name, digest)
+    # Only if the row still points at the same upload.
+    updated = model.objects.filter(pk=pk, image=name).exclude(image_hash=digest).update(image_hash=digest)
+    if updated:
+        response_cache.invalidate(IMAGE_MODELS[model_label])
+    return digest
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=get_config()['WORKERS'], thread_name_prefix='image-renditions')
+    return _executor
+
+
+def _run(model_label, pk, name):
+    try:
+        process_image(model_label, pk, name)
+    except Exception:
+        logger.exception(f"Failed to create renditions for {model_label} {pk} ({name})")
+    finally:
+        close_old_connections()
+
+
+def enqueue(instance):
+    """Process ``instance.image`` in the background once the transaction commits."""
+    model_label = instance._meta.label
+    pk, name = instance.pk, instance.image.name
+    transaction.on_commit(lambda: _get_executor().submit(_run, model_label, pk, name))
+
+
+def loaded_image_name(instance):
+    """The image name as loaded from the database, without triggering a deferred load."""
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value) or ''
@@ -0,0 +1,105 @@
+"""
+Django management command to benchmark authenticated request throughput.
+
+Seeds a throwaway customer with orders (rolled back afterwards), logs in
+once through CustomerLoginView and then measures requests/sec and queries
+per request for authenticated endpoints with the previous authenticator
+stack (JWT, Session, Token) and with CachedJWTAuthentication.
+"""
+
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from customer import views
+from customer.models import Customer, Order
+from utils import authentication
+from utils.authentication import CachedJWTAuthentication
+
+STACKS = {
+    'jwt+session+token': [JWTAuthentication, SessionAuthentication, TokenAuthentication],
+    'cached-jwt+session': [CachedJWTAuthentication, SessionAuthentication],
+}
+
+ENDPOINTS = {
+    'orders': views.OrderListCreateView,
+    'profile': views.CustomerProfileView,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure requests/sec of authenticated endpoints per authentication stack'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and stack')
+        parser.add_argument('--orders', type=int, default=20, help='Orders to seed for the customer')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['requests'], options['orders'])
+                raise Rollback
+        except Rollback:
+            pass
+        authentication.clear()
+
+    def run(self, count, order_count):
+        factory = RequestFactory()
+        run_id = uuid.uuid4().hex[:8]
+        password = uuid.uuid4().hex
+        customer = Customer.objects.create_user(
+            username=f'bench-{run_id}', email=f'bench-{run_id}@example.com', password=password
+        )
+        Order.objects.bulk_create([
+            Order(customer=customer, total_amount=Decimal('10.00'), items=[]) for _ in range(order_count)
+        ])
+
+        login = views.CustomerLoginView.as_view()
+        started = time.perf_counter()
+        response = login(factory.post(
+            '/api/customers/login/', {'email': customer.email, 'password': password}, content_type='application/json'
+        ))
+        login_time = time.perf_counter() - started
+        if response.status_code != 200 or 'access' not in response.data:
+            raise CommandError(f'Login failed: {response.status_code} {response.data}')
+        header = f"Bearer {response.data['access']}"
+        self.stdout.write(f'🔑 Login issued tokens in {login_time * 1000:.0f} ms (one password hash)')
+
+        for endpoint, view_class in ENDPOINTS.items():
+            self.stdout.write(f'📊 {endpoint}: {count} requests')
+            baseline = None
+            for name, classes in STACKS.items():
+                authentication.clear()
+                view = view_class.as_view(authentication_classes=classes)
+
+                def call():
+                    response = view(factory.get('/', HTTP_AUTHORIZATION=header))
+                    if response.status_code != 200:
+                        raise CommandError(f'{endpoint} returned {response.status_code} with {name}')
+                    response.render()
+
+                call()  # warm up (and fill the cache)
+                with CaptureQueriesContext(connection) as queries:
+                    call()
+                started = time.perf_counter()
+                for _ in range(count):
+                    call()
+                rate = count / (time.perf_counter() - started)
+                baseline = baseline or rate
+                self.stdout.write(
+                    f'   {name:<20} {rate:8.0f} req/s  {len(queries):2d} queries/request  '
+                    f'({rate / baseline:.2f}x)'
+                )
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
@@ -0,0 +1,115 @@
+"""
+Django management command to microbenchmark product list serialization.
+
+Seeds throwaway products (rolled back afterwards) and compares the per-object
+cost of DRF's ProductSerializer with the compiled values() path, and of
+DRF's JSONRenderer with FastJSONRenderer. Also checks that both paths
+produce byte-identical JSON.
+"""
+
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from customer.models import Category, Product, Shop
+from customer.serializers import ProductSerializer
+from utils.fast_serializers import compile_serializer
+from utils.query_planner import plan_queryset
+from utils.renderers import FastJSONRenderer
+
+
+class Rollback(Exception):
+    pass
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Compare per-object cost of DRF and compiled serialization for product lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=1000, help='Products to serialize')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['objects'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        run_id = uuid.uuid4().hex[:8]
+        shops = Shop.objects.bulk_create([
+            Shop(name=f'bench-{run_id}-{n}', location='Somewhere', latitude=12.97, longitude=77.59,
+                 image='shops/bench.jpg', image_hash='ab' * 32)
+            for n in range(10)
+        ])
+        categories = Category.objects.bulk_create([
+            Category(name=f'bench-{run_id}-{n}', slug=f'bench-{run_id}-{n}', description='Benchmark category')
+            for n in range(5)
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Benchmark product {n} – ünïcode', description='A reasonably long description ' * 3,
+                price=Decimal('19.99') + n, shop=shops[n % len(shops)],
+                category=categories[n % len(categories)] if n % 7 else None,
+                stock_quantity=n, image='products/bench.jpg' if n % 2 else '', image_hash='cd' * 32 if n % 2 else '',
+            )
+            for n in range(count)
+        ])
+        return Product.objects.filter(pk__in=[product.pk for product in products]).order_by('-created_at', '-id')
+
+    def run(self, count, repeat):
+        queryset = self.seed(count)
+        request = RequestFactory().get('/api/products/', HTTP_HOST='localhost')
+        context = {'request': request}
+
+        objects = list(plan_queryset(queryset, ProductSerializer))
+        compiled = compile_serializer(ProductSerializer(context=context))
+        rows = list(queryset.values(*compiled.keys))
+
+        drf_time, drf_data = best_of(repeat, lambda: ProductSerializer(objects, many=True, context=context).data)
+        fast_time, fast_data = best_of(repeat, lambda: [compiled(row) for row in rows])
+        compile_time, _ = best_of(repeat, lambda: compile_serializer(ProductSerializer(context=context)))
+
+        drf_query_time, _ = best_of(repeat, lambda: ProductSerializer(
+            list(plan_queryset(queryset, ProductSerializer)), many=True, context=context
+        ).data)
+        fast_query_time, _ = best_of(repeat, lambda: [
+            compiled(row) for row in queryset.values(*compiled.keys)
+        ])
+
+        json_time, drf_json = best_of(repeat, lambda: JSONRenderer().render(drf_data))
+        orjson_time, fast_json = best_of(repeat, lambda: FastJSONRenderer().render(fast_data))
+
+        if drf_json != JSONRenderer().render(fast_data) or drf_json != fast_json:
+            raise CommandError('Compiled serializer or fast renderer output differs from DRF')
+
+        def per_object(seconds):
+            return f'{seconds / count * 1e6:8.1f} µs/object'
+
+        self.stdout.write(f'📊 {count} products, best of {repeat} runs')
+        self.stdout.write(f'   Serialize (DRF ProductSerializer): {per_object(drf_time)}')
+        self.stdout.write(f'   Serialize (compiled values()):     {per_object(fast_time)}  '
+                          f'({drf_time / fast_time:.1f}x faster, compile {compile_time * 1000:.2f} ms/request)')
+        self.stdout.write(f'   Query + serialize (DRF):           {per_object(drf_query_time)}')
+        self.stdout.write(f'   Query + serialize (compiled):      {per_object(fast_query_time)}  '
+                          f'({drf_query_time / fast_query_time:.1f}x faster)')
+        self.stdout.write(f'   Render (JSONRenderer):             {per_object(json_time)}')
+        self.stdout.write(f'   Render (FastJSONRenderer):         {per_object(orjson_time)}  '
+                          f'({json_time / orjson_time:.1f}x faster)')
+        self.stdout.write(self.style.SUCCESS('✓ Compiled and DRF output are byte-identical'))
@@ -0,0 +1,98 @@
+"""
+Django management command comparing a sync catalog endpoint under WSGI-style
+threads with its async variant under ASGI.
+
+The sync path is driven by ``django.test.Client`` from a thread pool, the
+async path by ``django.test.AsyncClient`` with ``asyncio.gather`` on one
+event loop. Both run in-process, so the numbers compare request handling
+overhead rather than a real server. Each request carries a unique ``_``
+query parameter so the sync path does not just measure response cache hits
+(pass ``--allow-cache`` to keep them).
+"""
+
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+
+
+def summarize(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    return (
+        f'{label}: {len(latencies) / elapsed:.1f} req/s, '
+        f'p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and latency of sync (WSGI) and async (ASGI) catalog endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-path', default='/api/products/', help='Sync endpoint to request')
+        parser.add_argument('--async-path', default='/api/async/products/', help='Async endpoint to request')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per run')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients')
+        parser.add_argument('--allow-cache', action='store_true', help='Do not add a cache-busting parameter')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = options['concurrency']
+        self.bust_cache = not options['allow_cache']
+        self.stdout.write(f'🚀 {total} requests, concurrency {concurrency}')
+
+        self.stdout.write(self.style.SUCCESS(
+            summarize('WSGI ' + options['sync_path'], *self.run_sync(options['sync_path'], total, concurrency))
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            summarize('ASGI ' + options['async_path'], *asyncio.run(
+                self.run_async(options['async_path'], total, concurrency)
+            ))
+        ))
+
+    def url(self, path, n):
+        if not self.bust_cache:
+            return path
+        return f'{path}{"&" if "?" in path else "?"}_={n}'
+
+    def run_sync(self, path, total, concurrency):
+        def worker(offset, count):
+            client = Client()
+            latencies = []
+            try:
+                for n in range(offset, offset + count):
+                    started = time.perf_counter()
+                    response = client.get(self.url(path, n))
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f'{path} returned {response.status_code}')
+            finally:
+                close_old_connections()
+            return latencies
+
+        counts = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        offsets = [sum(counts[:i]) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(worker, offsets, counts))
+        return [latency for latencies in results for latency in latencies], time.perf_counter() - started
+
+    async def run_async(self, path, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(n):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(self.url(path, n))
+                if response.status_code != 200:
+                    raise CommandError(f'{path} returned {response.status_code}')
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request(n) for n in range(total)))
+        return latencies, time.perf_counter() - started
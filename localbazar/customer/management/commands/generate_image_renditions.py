@@ -0,0 +1,46 @@
+"""
+Django management command to generate image renditions.
+
+Processes catalog images that have no renditions yet (or all of them with
+``--all``), synchronously. Images whose content was processed before are
+only hashed, never resized again.
+"""
+
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from customer.images import IMAGE_MODELS, process_image
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG renditions for product, shop and category images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', choices=sorted(IMAGE_MODELS),
+            help='Only process this model (repeatable, default: all)',
+        )
+        parser.add_argument('--all', action='store_true', help='Also re-check images that already have renditions')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = failed = 0
+        for label in options['model'] or IMAGE_MODELS:
+            queryset = apps.get_model(label).objects.exclude(image='').exclude(image__isnull=True)
+            if not options['all']:
+                queryset = queryset.filter(image_hash='')
+            rows = list(queryset.order_by('pk').values_list('pk', 'image'))
+            self.stdout.write(f'🖼️  {label}: {len(rows)} images')
+            for pk, name in rows:
+                try:
+                    process_image(label, pk, name)
+                    total += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'   ✗ {label} {pk} ({name}): {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Processed {total} images in {time.monotonic() - started:.1f}s ({failed} failed)'
+        ))
@@ -0,0 +1,55 @@
+"""
+Django management command to backfill or rebuild order lines and the
+per-shop order inbox (``OrderLine`` and ``ShopOrder``) from ``Order.items``.
+
+Each shop's own status for its part is kept; new parts start at the
+order's status.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from customer.checkout import index_orders
+from customer.models import Order, OrderLine, ShopOrder
+
+
+class Command(BaseCommand):
+    help = 'Rebuild order lines and the seller order inbox from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of orders to index per transaction',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.order_by('pk').only('id', 'customer_id', 'items', 'status', 'created_at')
+
+        indexed = 0
+        last_pk = 0
+        while True:
+            batch = list(orders.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                statuses = {
+                    (order_id, shop_id): status
+                    for order_id, shop_id, status in ShopOrder.objects.filter(order__in=batch)
+                    .values_list('order_id', 'shop_id', 'status')
+                }
+                OrderLine.objects.filter(order__in=batch).delete()
+                ShopOrder.objects.filter(order__in=batch).delete()
+                shop_orders = index_orders(batch)
+                restored = []
+                for shop_order in shop_orders:
+                    status = statuses.get((shop_order.order_id, shop_order.shop_id), shop_order.status)
+                    if status != shop_order.status:
+                        shop_order.status = status
+                        restored.append(shop_order)
+                ShopOrder.objects.bulk_update(restored, ['status'], batch_size=1000)
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'   Indexed {indexed} orders...')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Order index rebuilt for {indexed} orders'))
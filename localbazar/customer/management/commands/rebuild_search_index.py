@@ -0,0 +1,37 @@
+"""
+Django management command to rebuild the product search index.
+"""
+
+from django.core.management.base import BaseCommand
+
+from customer.models import Product
+from customer.search import INDEX_BATCH_SIZE, index_products
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed product search documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=INDEX_BATCH_SIZE,
+            help='Number of products to index per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+
+        batch = []
+        indexed = 0
+        for product_id in product_ids.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) >= batch_size:
+                index_products(batch)
+                indexed += len(batch)
+                batch = []
+                self.stdout.write(f'   Indexed {indexed} products...')
+        if batch:
+            index_products(batch)
+            indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Search index rebuilt for {indexed} products'))
@@ -0,0 +1,85 @@
+"""
+Django management command to stress test concurrent checkout.
+
+Creates a throwaway shop and product, lets many threads buy it at once and
+checks that the number of units sold never exceeds the stock.
+"""
+
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from customer.checkout import OutOfStockError, place_order
+from customer.models import Customer, Order, Product, Shop
+
+
+class Command(BaseCommand):
+    help = 'Stress test checkout with concurrent buyers and verify there is no oversell'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent buyers')
+        parser.add_argument('--attempts', type=int, default=20, help='Orders attempted per buyer')
+        parser.add_argument('--stock', type=int, default=100, help='Initial stock of the product')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per order')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        shop = Shop.objects.create(name=f'stress-{run_id}')
+        product = Product.objects.create(
+            name=f'stress-{run_id}', price=1, shop=shop, stock_quantity=options['stock']
+        )
+        buyer = Customer.objects.create_user(
+            email=f'stress-{run_id}@example.com', username=f'stress-{run_id}'
+        )
+
+        counts = {'placed': 0, 'sold_out': 0, 'errors': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def buy():
+            start.wait()
+            try:
+                for _ in range(options['attempts']):
+                    try:
+                        place_order(buyer, [{'product_id': product.pk, 'quantity': options['quantity']}])
+                        outcome = 'placed'
+                    except OutOfStockError:
+                        outcome = 'sold_out'
+                    except OperationalError:
+                        # e.g. SQLite "database is locked"; not an oversell
+                        outcome = 'errors'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(options['threads'])]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        product.refresh_from_db()
+        orders = Order.objects.filter(customer=buyer).count()
+        sold = orders * options['quantity']
+
+        self.stdout.write(f'   Attempts:  {options["threads"] * options["attempts"]} in {elapsed:.2f}s')
+        self.stdout.write(f'   Placed:    {counts["placed"]}')
+        self.stdout.write(f'   Sold out:  {counts["sold_out"]}')
+        self.stdout.write(f'   DB errors: {counts["errors"]}')
+        self.stdout.write(f'   Stock:     {options["stock"]} -> {product.stock_quantity} ({sold} sold)')
+
+        consistent = sold + product.stock_quantity == options['stock'] and orders == counts['placed']
+
+        Order.objects.filter(customer=buyer).delete()
+        buyer.delete()
+        shop.delete()
+
+        if not consistent or sold > options['stock']:
+            raise CommandError('Oversell or lost stock detected')
+        self.stdout.write(self.style.SUCCESS('✓ No oversell'))
@@ -0,0 +1,35 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN indexes only exist on Postgres; the Python fallback needs none.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS customer_search_vector_gin '
+        'ON customer_productsearchdocument USING gin (vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS customer_search_document_trgm '
+        'ON customer_productsearchdocument USING gin (document gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS customer_search_vector_gin')
+    schema_editor.execute('DROP INDEX IF EXISTS customer_search_document_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0006_shop_owner_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(default=5),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('stock_quantity__lte', models.F('reorder_threshold'))), fields=['shop', 'stock_quantity'], name='product_low_stock_idx'),
+        ),
+    ]
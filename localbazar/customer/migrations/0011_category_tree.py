@@ -0,0 +1,78 @@
+# Generated by Django 5.2.3 on 2026-10-17 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils.text import slugify
+
+
+def backfill_categories(apps, schema_editor):
+    # Existing categories are all top level: slug from the name, path from the id.
+    Category = apps.get_model('customer', 'Category')
+    Product = apps.get_model('customer', 'Product')
+    counts = dict(
+        Product.objects.filter(is_active=True, category__isnull=False)
+        .values_list('category').annotate(count=Count('pk')).order_by()
+    )
+    taken = set()
+    categories = list(Category.objects.order_by('pk'))
+    for category in categories:
+        base = slugify(category.name)[:90] or 'category'
+        slug, suffix = base, 2
+        while slug in taken:
+            slug, suffix = f'{base}-{suffix}', suffix + 1
+        taken.add(slug)
+        category.slug = slug
+        category.path = f'{category.pk:08d}'
+        category.product_count = category.total_product_count = counts.get(category.pk, 0)
+    Category.objects.bulk_update(categories, ['slug', 'path', 'product_count', 'total_product_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0010_order_lines_shop_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='customer.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(default='', max_length=110),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=110, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_active', '-created_at', '-id'], name='product_category_created_idx'),
+        ),
+    ]
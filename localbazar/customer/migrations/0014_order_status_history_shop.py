@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-17 15:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0013_product_reviews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderstatushistory',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='customer.shop'),
+        ),
+    ]
@@ -1,3 +1,356 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
+
+from . import geo
 
 # Create your models here.
+
+
+class Customer(AbstractUser):
+    email = models.EmailField(unique=True)
+    phone = models.CharField(max_length=20, blank=True)
+    address = models.TextField(blank=True)
+
+    USERNAME_FIELD = 'email'
+    REQUIRED_FIELDS = ['username']
+
+    def __str__(self):
+        return self.email
+
+
+class DerivedFieldsModel(models.Model):
+    """
+    Model whose ``derived_fields`` are kept up to date with UPDATEs elsewhere;
+    saving an existing instance leaves them out so its possibly stale copies
+    are never written back.
+    """
+    derived_fields = frozenset()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                # Like Model.save(), leave deferred fields alone rather than load them.
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            kwargs['update_fields'] = set(update_fields) - self.derived_fields
+        super().save(*args, **kwargs)
+
+
+class Category(DerivedFieldsModel):
+    name = models.CharField(max_length=100, unique=True)
+    # Filled from the name on first save; see customer.categories.
+    slug = models.SlugField(max_length=110, unique=True)
+    parent = models.ForeignKey(
+        'self', on_delete=models.PROTECT, null=True, blank=True, related_name='children'
+    )
+    # Materialized path of zero-padded ids, root first; maintained on save.
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    # Active products in this category, and in it plus its subcategories.
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    total_product_count = models.PositiveIntegerField(default=0, editable=False)
+    description = models.TextField(blank=True)
+    image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # SHA-256 of the image once its renditions exist; see customer.images.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        verbose_name_plural = 'categories'
+        ordering = ['name']
+        indexes = [
+            # Subtree lookups are path range scans.
+            models.Index(fields=['path'], name='category_path_idx'),
+        ]
+
+    # Maintained by customer.categories.
+    derived_fields = frozenset({'path', 'product_count', 'total_product_count'})
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        super().clean()
+        # Imported here: customer.categories imports this module.
+        from .categories import check_parent
+        check_parent(self)
+
+
+class Shop(models.Model):
+    owner = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='shops'
+    )
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude in save(); see customer.geo.
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+    phone = models.CharField(max_length=20, blank=True)
+    email = models.EmailField(blank=True)
+    image = models.ImageField(upload_to='shops/', blank=True, null=True)
+    # SHA-256 of the image once its renditions exist; see customer.images.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination for the active shop listing.
+            models.Index(fields=['is_active', '-created_at', '-id'], name='shop_active_created_idx'),
+            # Nearby-shop lookups scan geohash prefix ranges.
+            models.Index(fields=['is_active', 'geohash'], name='shop_active_geohash_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+
+class Product(DerivedFieldsModel):
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    # Seller supplied stock keeping unit; unique per shop, used to upsert imports.
+    sku = models.CharField(max_length=64, null=True, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # SHA-256 of the image once its renditions exist; see customer.images.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products'
+    )
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='products')
+    stock_quantity = models.PositiveIntegerField(default=0)
+    # Stock at or below this level shows up in the seller's low-stock alerts.
+    reorder_threshold = models.PositiveIntegerField(default=5)
+    is_active = models.BooleanField(default=True)
+    # Review aggregates: the average to two places, kept by customer.reviews.
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination for the catalog and per-shop listings.
+            models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+            models.Index(fields=['shop', 'is_active', '-created_at', '-id'], name='product_shop_created_idx'),
+            models.Index(fields=['category', 'is_active', '-created_at', '-id'], name='product_category_created_idx'),
+            # Price range filters and the price/name sorts of products/facets/.
+            models.Index(fields=['is_active', 'price', 'id'], name='product_active_price_idx'),
+            models.Index(fields=['is_active', 'name', 'id'], name='product_active_name_idx'),
+            models.Index(fields=['is_active', 'rating', 'id'], name='product_active_rating_idx'),
+            # Partial index holding only low-stock rows, so the low-stock
+            # alert query never touches healthy inventory.
+            models.Index(
+                fields=['shop', 'stock_quantity'],
+                condition=models.Q(is_active=True, stock_quantity__lte=models.F('reorder_threshold')),
+                name='product_low_stock_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'sku'], name='product_shop_sku_unique'),
+        ]
+
+    # Maintained by customer.reviews.
+    derived_fields = frozenset({'rating', 'rating_count', 'rating_sum'})
+
+    def __str__(self):
+        return self.name
+
+
+class Review(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='reviews')
+    rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination of a product's reviews.
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'customer'], name='review_product_customer_unique'),
+            models.CheckConstraint(condition=models.Q(rating__gte=1, rating__lte=5), name='review_rating_range'),
+        ]
+
+    def __str__(self):
+        return f"{self.rating}/5 for {self.product} by {self.customer}"
+
+
+class Order(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('shipped', 'Shipped'),
+        ('delivered', 'Delivered'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
+    # Line items as [{'product_id': ..., 'quantity': ..., 'price': ...}],
+    # matching OrderItemSerializer.
+    items = models.JSONField(default=list, blank=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    shipping_address = models.TextField(blank=True)
+    payment_method = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.pk} - {self.customer}"
+
+
+class OrderLine(models.Model):
+    """Relational copy of an order's ``items``, written at checkout."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='order_lines')
+    # The product's shop when the order was placed.
+    shop = models.ForeignKey(Shop, on_delete=models.SET_NULL, null=True, related_name='order_lines')
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x product #{self.product_id} in order #{self.order_id}"
+
+
+class ShopOrder(models.Model):
+    """
+    One row per (shop, order): the seller order inbox, and the shop's own
+    status for its part of the order (see ``customer.checkout``).
+
+    Denormalized from the order and its lines so a shop's orders, newest
+    first and optionally by status, are read with a single index range
+    scan without touching orders or lines. Maintained by
+    ``customer.checkout`` at checkout and on every status change.
+    """
+    # shop and order are covered by the composite indexes below.
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='shop_orders', db_index=False)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='shop_orders', db_index=False)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', db_index=False)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    # The order's created_at.
+    created_at = models.DateTimeField()
+    # This shop's part of the order.
+    units = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'shop'], name='shop_order_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', '-created_at', '-id'], name='shop_order_inbox_idx'),
+            models.Index(fields=['shop', 'status', '-created_at', '-id'], name='shop_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} for shop #{self.shop_id}"
+
+
+class OrderStatusHistory(models.Model):
+    """
+    One row per order status change, written in the same transaction as the
+    change by ``customer.checkout``. Rows are never updated or deleted.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_history')
+    # The shop whose part of the order changed; None for the order's own status.
+    shop = models.ForeignKey(Shop, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # None for the row written when the order is placed.
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, null=True, blank=True)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_status_changes'
+    )
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'order status history'
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='order_status_history_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Order status history is append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Order status history is append-only')
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
+
+class Cart(models.Model):
+    """
+    Persisted copy of a customer's cart.
+
+    The live cart lives in the cache (see ``customer.cart``); this row is
+    written behind it so carts survive cache restarts.
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='cart'
+    )
+    # {product_id: quantity}; JSON keys are strings.
+    items = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart for {self.customer_id}"
+
+
+class ProductSearchDocument(models.Model):
+    """
+    Precomputed, weighted search document for a product.
+
+    Kept in sync by the signals in ``customer.signals`` so searches never
+    have to join Shop/Category or scan the product descriptions.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='search_document'
+    )
+    # Normalized plain text, used for trigram (typo tolerant) matching on Postgres.
+    document = models.TextField(blank=True)
+    # token -> weight map, used by the pure-Python fallback backend.
+    terms = models.JSONField(default=dict, blank=True)
+    vector = SearchVectorField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for product #{self.product_id}"
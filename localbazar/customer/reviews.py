@@ -0,0 +1,104 @@
+"""
+Rating aggregates for product reviews.
+
+Every product stores ``rating_count`` and ``rating_sum`` over its reviews and
+``rating``, their average rounded to two places. ``adjust_ratings`` moves all
+three in one UPDATE per product, so concurrent review writes never lose an
+increment and sorting by rating is a scan of ``product_active_rating_idx``
+instead of an AVG over the reviews. Review signals call it; bulk writers
+(``bulk_create``, ``update()``) must call it themselves. ``rebuild``
+recomputes the aggregates from the reviews table.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+
+from .models import Product, Review
+
+REBUILD_BATCH_SIZE = 1000
+# Largest gap between a stored average and the exact one, from rounding.
+ROUNDING_TOLERANCE = Decimal('0.0051')
+
+
+def average(total, count):
+    """SQL expression for the stored average of ``total`` stars over ``count`` reviews."""
+    return Case(
+        When(GreaterThan(count, 0), then=Round(Cast(total, FloatField()) / count, 2)),
+        default=Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def adjust_ratings(deltas):
+    """
+    Apply ``{product_id: (change in review count, change in star sum)}``
+    to the products' aggregates.
+    """
+    for pk, (count, total) in deltas.items():
+        if not (count or total):
+            continue
+        new_count = F('rating_count') + count
+        new_sum = F('rating_sum') + total
+        Product.objects.filter(pk=pk).update(
+            rating_count=new_count, rating_sum=new_sum, rating=average(new_sum, new_count)
+        )
+
+
+def rating_changes(before, after):
+    """Aggregate deltas for a review going from ``(product_id, rating)`` ``before`` to ``after``."""
+    deltas = defaultdict(lambda: (0, 0))
+    if before is not None:
+        count, total = deltas[before[0]]
+        deltas[before[0]] = (count - 1, total - before[1])
+    if after is not None:
+        count, total = deltas[after[0]]
+        deltas[after[0]] = (count + 1, total + after[1])
+    return deltas
+
+
+def _rebuild_batch(product_ids):
+    with transaction.atomic():
+        # Locked so review writes to these products wait instead of being lost.
+        stored = Product.objects.filter(pk__in=product_ids).select_for_update().values_list(
+            'pk', 'rating_count', 'rating_sum', 'rating'
+        )
+        actual = {
+            pk: (count, total)
+            for pk, count, total in Review.objects.filter(product__in=product_ids)
+            .values_list('product').annotate(count=Count('pk'), total=Sum('rating')).order_by()
+        }
+        stale = {}
+        for pk, count, total, rating in stored:
+            expected = actual.get(pk, (0, 0))
+            exact = Decimal(expected[1]) / expected[0] if expected[0] else Decimal(0)
+            if (count, total) != expected or abs(rating - exact) > ROUNDING_TOLERANCE:
+                stale[pk] = expected
+        if stale:
+            new_count = Case(*[When(pk=pk, then=Value(count)) for pk, (count, _) in stale.items()])
+            new_sum = Case(*[When(pk=pk, then=Value(total)) for pk, (_, total) in stale.items()])
+            Product.objects.filter(pk__in=stale).update(
+                rating_count=new_count, rating_sum=new_sum, rating=average(new_sum, new_count)
+            )
+    return len(stale)
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute the aggregates of every product from its reviews, a batch of
+    products per transaction. Returns the number that were out of date.
+    """
+    stale = 0
+    last_pk = 0
+    while True:
+        product_ids = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not product_ids:
+            return stale
+        stale += _rebuild_batch(product_ids)
+        last_pk = product_ids[-1]
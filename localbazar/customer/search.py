@@ -0,0 +1,219 @@
+"""
+Product search for LocalBazar.
+
+Every product has a precomputed ``ProductSearchDocument`` holding its
+weighted text (name > shop name > category > description). Two backends
+query it:
+
+* ``PostgresSearchBackend`` - ranked full-text search over a GIN indexed
+  tsvector with prefix matching, plus pg_trgm word similarity for typos.
+* ``PythonSearchBackend`` - pure-Python ranking over the stored token
+  weights, used on SQLite (tests, local development).
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+
+from .models import Product, ProductSearchDocument
+
+# Same weights Postgres uses for ts_rank's {D, C, B, A} defaults.
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+SEARCH_CONFIG = 'english'
+MAX_RESULTS = 1000
+INDEX_BATCH_SIZE = 500
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens of two or more characters."""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+def _within_distance(a, b, max_distance):
+    """Return True if the Levenshtein distance between a and b is <= max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+
+def _typo_budget(term):
+    if len(term) >= 8:
+        return 2
+    if len(term) >= 4:
+        return 1
+    return 0
+
+
+def match_score(term, token):
+    """Score how well a single query term matches a document token."""
+    if token == term:
+        return 1.0
+    if token.startswith(term):
+        return 0.75
+    budget = _typo_budget(term)
+    if budget and _within_distance(term, token, budget):
+        return 0.5
+    return 0.0
+
+
+def build_document(name, shop_name, category_name, description):
+    """
+    Build the stored search fields for one product.
+
+    Returns ``(document, terms, vector)`` where ``vector`` is an expression
+    only evaluated by Postgres.
+    """
+    sections = [
+        ('A', name),
+        ('B', shop_name),
+        ('C', category_name),
+        ('D', description),
+    ]
+    terms = {}
+    for weight, text in sections:
+        for token in tokenize(text):
+            terms[token] = max(terms.get(token, 0.0), WEIGHTS[weight])
+
+    document = ' '.join(text.lower() for _, text in sections if text)
+
+    vector = None
+    if connection.vendor == 'postgresql':
+        vector = SearchVector(Value(name or ''), weight='A', config=SEARCH_CONFIG)
+        for weight, text in sections[1:]:
+            vector = vector + SearchVector(Value(text or ''), weight=weight, config=SEARCH_CONFIG)
+
+    return document, terms, vector
+
+
+def index_products(product_ids):
+    """(Re)build the search documents for the given products in batches."""
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+        batch = product_ids[start:start + INDEX_BATCH_SIZE]
+        rows = Product.objects.filter(pk__in=batch).values_list(
+            'id', 'name', 'shop__name', 'category__name', 'description'
+        )
+        documents = []
+        for product_id, name, shop_name, category_name, description in rows:
+            document, terms, vector = build_document(name, shop_name, category_name, description)
+            documents.append(ProductSearchDocument(
+                product_id=product_id, document=document, terms=terms, vector=vector,
+            ))
+        ProductSearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['document', 'terms', 'vector', 'updated_at'],
+        )
+
+
+def index_shop(shop_id):
+    index_products(Product.objects.filter(shop_id=shop_id).values_list('id', flat=True))
+
+
+def index_category(category_id):
+    index_products(Product.objects.filter(category_id=category_id).values_list('id', flat=True))
+
+
+class PostgresSearchBackend:
+    """Ranked full-text + trigram search. Requires the GIN indexes from migration 0002."""
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+
+        # Prefix match on every term: "tom gro" -> 'tom':* & 'gro':*
+        raw = ' & '.join(f'{term}:*' for term in terms)
+        search_query = SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+        plain = ' '.join(terms)
+
+        return queryset.filter(
+            Q(search_document__vector=search_query) |
+            Q(search_document__document__trigram_word_similar=plain)
+        ).annotate(
+            search_rank=(
+                SearchRank('search_document__vector', search_query) +
+                TrigramWordSimilarity(plain, 'search_document__document')
+            )
+        ).order_by('-search_rank', '-id')
+
+
+class PythonSearchBackend:
+    """Pure-Python ranking over the precomputed token weights."""
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+
+        documents = ProductSearchDocument.objects.filter(
+            product__in=queryset.values('pk')
+        ).values_list('product_id', 'terms')
+
+        scored = []
+        for product_id, doc_terms in documents.iterator():
+            score = self.score(terms, doc_terms)
+            if score:
+                scored.append((score, product_id))
+
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        ranked_ids = [product_id for _, product_id in scored[:MAX_RESULTS]]
+        if not ranked_ids:
+            return queryset.none()
+
+        ordering = Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ranked_ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(pk__in=ranked_ids).annotate(search_position=ordering).order_by('search_position')
+
+    @staticmethod
+    def score(terms, doc_terms):
+        """Every query term must match some token; returns 0 otherwise."""
+        total = 0.0
+        for term in terms:
+            best = 0.0
+            for token, weight in doc_terms.items():
+                score = match_score(term, token) * weight
+                if score > best:
+                    best = score
+            if not best:
+                return 0.0
+            total += best
+        return total
+
+
+def get_search_backend():
+    backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = 'postgres' if connection.vendor == 'postgresql' else 'python'
+    if backend == 'postgres':
+        return PostgresSearchBackend()
+    return PythonSearchBackend()
+
+
+def search_products(queryset, query):
+    """Filter and rank a Product queryset by a free-text query."""
+    return get_search_backend().search(queryset, query)
@@ -1,34 +1,114 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Customer, Order, Product, Shop, Category
+from .models import Customer, Order, Product, Review, Shop, Category
+from . import categories, images
 
 User = get_user_model()
 
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """
+    Rendition URLs (``{size: {format: url}}``) for the model's image, or
+    None while they are still being generated. Reads only ``image_hash``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_hash')
+        super().__init__(**kwargs)
+
+    def get_templates(self):
+        # Built once per serializer instance: URLs for a placeholder digest,
+        # which is plain hex like the real one, so substitution is safe.
+        templates = getattr(self, '_templates', None)
+        if templates is None:
+            storage = self.parent.Meta.model._meta.get_field('image').storage
+            templates = images.rendition_urls(images.PLACEHOLDER_DIGEST, storage)
+            request = self.context.get('request')
+            if request is not None:
+                templates = {
+                    size: {fmt: request.build_absolute_uri(url) for fmt, url in formats.items()}
+                    for size, formats in templates.items()
+                }
+            self._templates = templates
+        return templates
+
+    def to_representation(self, digest):
+        if not digest:
+            return None
+        return {
+            size: {fmt: images.fill_digest(url, digest) for fmt, url in formats.items()}
+            for size, formats in self.get_templates().items()
+        }
+
 class CategorySerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'parent', 'description', 'image', 'image_renditions']
+
+class CategorySummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image']
+        fields = ['id', 'name', 'slug', 'product_count', 'total_product_count']
+
+class CategoryDetailSerializer(CategorySerializer):
+    ancestors = serializers.SerializerMethodField()
+    children = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['product_count', 'total_product_count', 'ancestors', 'children']
+
+    def get_ancestors(self, obj):
+        ancestor_ids = categories.ancestor_ids(obj.path)[:-1]
+        ancestors = Category.objects.filter(pk__in=ancestor_ids).order_by('path')
+        return CategorySummarySerializer(ancestors, many=True).data
+
+    def get_children(self, obj):
+        return CategorySummarySerializer(obj.children.order_by('name'), many=True).data
 
 class ShopSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
+
     class Meta:
         model = Shop
         fields = [
-            'id', 'name', 'description', 'location', 'phone', 
-            'email', 'image', 'is_active', 'created_at', 'updated_at'
+            'id', 'name', 'description', 'location', 'latitude', 'longitude',
+            'phone', 'email', 'image', 'image_renditions', 'is_active', 'created_at', 'updated_at'
         ]
 
+class DistanceField(serializers.FloatField):
+    """Kilometres, rounded to the metre."""
+
+    def to_representation(self, value):
+        return round(float(value), 3)
+
+class NearbyShopSerializer(ShopSerializer):
+    distance_km = DistanceField(read_only=True)
+
+    class Meta(ShopSerializer.Meta):
+        fields = ShopSerializer.Meta.fields + ['distance_km']
+
 class ProductSerializer(serializers.ModelSerializer):
     shop = ShopSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
+    image_renditions = ImageRenditionsField()
     
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'image', 
+            'id', 'name', 'description', 'price', 'image', 'image_renditions',
             'category', 'shop', 'stock_quantity', 'is_active', 
-            'created_at', 'updated_at'
+            'rating', 'rating_count', 'created_at', 'updated_at'
         ]
 
+class ReviewSerializer(serializers.ModelSerializer):
+    customer_name = serializers.CharField(source='customer.username', read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'product', 'customer', 'customer_name', 'rating', 'comment', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'product', 'customer', 'created_at', 'updated_at']
+
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
@@ -79,9 +159,25 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'customer', 'total_amount', 'created_at', 'updated_at']
 
+class OrderLineInputSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+class OrderCreateSerializer(serializers.Serializer):
+    items = OrderLineInputSerializer(many=True, allow_empty=False)
+    shipping_address = serializers.CharField(required=False, allow_blank=True, default='')
+    payment_method = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+
 class CartItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    line_total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    in_stock = serializers.BooleanField(read_only=True)
+
+class CartItemQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1)
 
 class CartSerializer(serializers.Serializer):
     items = CartItemSerializer(many=True)
@@ -89,10 +185,13 @@ class CartSerializer(serializers.Serializer):
 
 class SearchSerializer(serializers.Serializer):
     query = serializers.CharField(max_length=255, required=False)
-    category = serializers.CharField(max_length=100, required=False)
+    # Category slug; matches its subcategories too.
+    category = serializers.SlugField(max_length=110, required=False)
+    shop = serializers.IntegerField(min_value=1, required=False)
     location = serializers.CharField(max_length=255, required=False)
-    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
-    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    in_stock = serializers.BooleanField(required=False, allow_null=True, default=None)
     sort_by = serializers.ChoiceField(
         choices=['name', 'price', 'created_at', 'rating'],
         required=False
@@ -100,4 +199,15 @@ class SearchSerializer(serializers.Serializer):
     sort_order = serializers.ChoiceField(
         choices=['asc', 'desc'],
         required=False
-    ) 
\ No newline at end of file
+    )
+
+    def validate(self, data):
+        min_price, max_price = data.get('min_price'), data.get('max_price')
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise serializers.ValidationError({'max_price': 'Must not be less than min_price.'})
+        return data
+
+class NearbyShopQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=0.1, max_value=100, default=5)
@@ -0,0 +1,183 @@
+"""
+Signal handlers for the customer app.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from utils import authentication, response_cache
+from .models import Category, Customer, Product, Review, Shop
+from . import categories, images, reviews, search
+
+# Sent inside the transaction that changes an order's status, with
+# ``order``, ``old_status`` (None for a new order) and ``new_status``.
+# Status changes are conditional UPDATEs, so post_save does not fire.
+order_status_changed = Signal()
+
+# Sent the same way when a shop's part of an order changes status, with
+# ``shop_order``, ``order``, ``old_status`` and ``new_status``.
+shop_order_status_changed = Signal()
+
+# Sent after commit when a checkout takes a product's stock from above its
+# reorder threshold to at or below it, with ``product_ids`` (a list).
+# Lets sellers be notified instead of polling the low-stock endpoint.
+low_stock_reached = Signal()
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_document(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_products([instance.pk])
+
+
+@receiver(post_save, sender=Shop)
+def update_shop_search_documents(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    search.index_shop(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_documents(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    search.index_category(instance.pk)
+
+
+@receiver(pre_save, sender=Category)
+def prepare_category(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not instance.slug:
+        instance.slug = categories.unique_slugs([instance.name], exclude_pk=instance.pk)[instance.name]
+    categories.check_parent(instance)
+
+
+@receiver(post_save, sender=Category)
+def place_category(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    categories.place(instance)
+
+
+@receiver(pre_delete, sender=Category)
+def remove_category_counts(sender, instance, **kwargs):
+    # Subcategories are protected, so this is a leaf; its products become uncategorized.
+    count = Category.objects.values_list('product_count', flat=True).get(pk=instance.pk)
+    categories.adjust_counts({instance.pk: -count})
+
+
+def _loaded(instance, *names):
+    """The values of fields ``names``, or None when any is deferred: the change cannot be told then."""
+    fields = instance.__dict__
+    if all(name in fields for name in names):
+        return tuple(fields[name] for name in names)
+    return None
+
+
+def _listing(product):
+    return _loaded(product, 'category_id', 'is_active')
+
+
+@receiver(post_init, sender=Product)
+def remember_loaded_listing(sender, instance, **kwargs):
+    instance._loaded_listing = _listing(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    listing = _listing(instance)
+    before = None if created else instance._loaded_listing
+    if created or before is not None:
+        categories.adjust_counts(categories.listing_changes(before, listing))
+    instance._loaded_listing = listing
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_counts(sender, instance, **kwargs):
+    categories.adjust_counts(categories.listing_changes(_listing(instance), None))
+
+
+def _review(review):
+    return _loaded(review, 'product_id', 'rating')
+
+
+@receiver(post_init, sender=Review)
+def remember_loaded_review(sender, instance, **kwargs):
+    instance._loaded_review = _review(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_product_ratings(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    review = _review(instance)
+    before = None if created else instance._loaded_review
+    if created or before is not None:
+        reviews.adjust_ratings(reviews.rating_changes(before, review))
+    instance._loaded_review = review
+
+
+@receiver(post_delete, sender=Review)
+def remove_product_ratings(sender, instance, **kwargs):
+    reviews.adjust_ratings(reviews.rating_changes(_review(instance), None))
+
+
+def _invalidate_on_commit(namespace):
+    # A response built between an earlier bump and the commit would read the
+    # old rows and be cached under the new generation.
+    transaction.on_commit(lambda: response_cache.invalidate(namespace))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_product_responses(sender, **kwargs):
+    _invalidate_on_commit('product')
+
+
+@receiver([post_save, post_delete], sender=Shop)
+def invalidate_shop_responses(sender, **kwargs):
+    _invalidate_on_commit('shop')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_responses(sender, **kwargs):
+    _invalidate_on_commit('category')
+
+
+@receiver(post_init, sender=Product)
+@receiver(post_init, sender=Shop)
+@receiver(post_init, sender=Category)
+def remember_loaded_image(sender, instance, **kwargs):
+    instance._loaded_image = images.loaded_image_name(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Shop)
+@receiver(post_save, sender=Category)
+def queue_image_renditions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    name = images.loaded_image_name(instance)
+    # A deferred image was not touched by this save.
+    image_loaded = 'image' in instance.__dict__
+    changed = image_loaded and name != instance._loaded_image
+    # A replaced or removed image must not keep serving the old renditions;
+    # a deferred hash (missing from __dict__) may be stale too.
+    if image_loaded and (changed or not name) and instance.__dict__.get('image_hash', True):
+        sender.objects.filter(pk=instance.pk).exclude(image_hash='').update(image_hash='')
+        instance.image_hash = ''
+    # Only a loaded, empty hash means "not processed yet".
+    unprocessed = 'image_hash' in instance.__dict__ and not instance.image_hash
+    if name and (changed or unprocessed):
+        images.enqueue(instance)
+    instance._loaded_image = name
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_cached_authentication(sender, instance, **kwargs):
+    authentication.invalidate_user(instance.pk)
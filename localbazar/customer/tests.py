@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import asyncio
+import bisect
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import warnings
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import ProtectedError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import httpx
+from PIL import Image
+from rest_framework import generics, serializers
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from customer import cart, categories, facets, geo, images, reviews
+from customer.checkout import CheckoutError, OutOfStockError, cancel_order, place_order
+from customer.models import Cart, Category, Customer, Order, Product, Review, Shop, ShopOrder
+from customer.search import match_score, search_products
+from customer.serializers import NearbyShopSerializer, ProductSerializer
+from localbazar import settings as project_settings
+from utils import (
+    authentication, database, fast_serializers, load_shedding, metrics, response_cache, supabase_client,
+)
+from utils.fast_serializers import FastListMixin, Uncompilable, compile_serializer
+from utils.load_shedding import LoadSheddingMiddleware
+from utils.pagination import KeysetPagination
+from utils.renderers import FastJSONRenderer
+from utils.supabase_client import get_async_client
+from utils.supabase_fake import FakeTransport
+from utils.throttling import MemoryBucketStore, get_store
+from utils.testing import assert_endpoint_queries
+
+
+class CatalogTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = Customer.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        cls.shop = Shop.objects.create(name='Green Grocer', owner=cls.owner, location='Pune')
+        cls.produce = Category.objects.create(name='Produce')
+        cls.fruit = Category.objects.create(name='Fruit', parent=cls.produce)
+        cls.dairy = Category.objects.create(name='Dairy')
+        cls.apple = Product.objects.create(name='Apple', price='2.50', shop=cls.shop, category=cls.fruit, stock_quantity=10)
+        cls.milk = Product.objects.create(name='Milk', price='1.20', shop=cls.shop, category=cls.dairy, stock_quantity=10)
+
+    def setUp(self):
+        # Cached responses would otherwise leak between tests.
+        caches[response_cache.get_config()['ALIAS']].clear()
+        response_cache._local_cache.clear()
+
+
+class AsyncCatalogTests(CatalogTestCase):
+    async def test_product_list_filters_by_category(self):
+        response = await self.async_client.get('/api/async/products/', {'category': self.produce.slug})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.apple.pk])
+
+    async def test_unknown_category_is_empty(self):
+        response = await self.async_client.get('/api/async/products/', {'category': 'nothing'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+class PaginationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(13):
+            Product.objects.create(name=f'Pear {i}', price='1.00', shop=cls.shop, stock_quantity=1)
+        # Ties on created_at are broken by id.
+        tied = Product.objects.order_by('pk').values_list('created_at', flat=True).first()
+        Product.objects.filter(name__in=['Pear 3', 'Pear 4', 'Pear 5', 'Pear 6', 'Pear 7']).update(created_at=tied)
+        cls.expected = list(Product.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def walk(self, path, client=None, **params):
+        client = client or self.client
+        ids = []
+        url, data = path, {'page_size': 4, **params}
+        while url:
+            body = client.get(url, data).json()
+            ids += [row['id'] for row in body['results']]
+            self.assertNotIn('previous', body)
+            url, data = body['next'], None
+        return ids
+
+    def test_walks_every_row_once(self):
+        self.assertEqual(self.walk('/api/products/'), self.expected)
+
+    async def test_async_walk(self):
+        ids = []
+        url, data = '/api/async/products/', {'page_size': 4}
+        while url:
+            body = (await self.async_client.get(url, data)).json()
+            ids += [row['id'] for row in body['results']]
+            url, data = body['next'], None
+        self.assertEqual(ids, self.expected)
+
+    def test_seller_inbox_walks_every_row_once(self):
+        buyer = Customer.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        orders = [place_order(buyer, [{'product_id': self.apple.pk, 'quantity': 1}]) for _ in range(5)]
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        expected = ShopOrder.objects.filter(order__in=orders).order_by('-created_at', '-id').values_list('pk', flat=True)
+        self.assertEqual(self.walk('/api/seller/orders/', client=client, page_size=2), list(expected))
+
+    def test_count_is_opt_in(self):
+        self.assertNotIn('count', self.client.get('/api/products/').json())
+        for mode in ('exact', 'estimate'):
+            with self.subTest(mode=mode):
+                self.assertEqual(self.client.get('/api/products/', {'count': mode}).json()['count'], 15)
+
+    def test_bad_cursor_is_rejected(self):
+        encode = KeysetPagination().encode_cursor
+        for cursor in ('%%%', 'bm90IGEgY3Vyc29y', encode(('yesterday', 1)), encode((self.apple.created_at, 10 ** 30))):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/products/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'cursor': ['Invalid cursor']})
+
+    def test_page_parameter_uses_page_numbers(self):
+        body = self.client.get('/api/products/', {'page': 2}).json()
+        self.assertEqual(body['count'], 15)
+        self.assertIn('previous', body)
+        self.assertEqual([row['id'] for row in body['results']], self.expected[10:])
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_explicit_ordering_uses_page_numbers(self):
+        body = self.client.get('/api/products/', {'search': 'pear'}).json()
+        self.assertEqual(body['count'], 13)
+        self.assertIsNone(body['previous'])
+        self.assertEqual(len(body['results']), 10)
+
+
+class CategoryTreeTests(CatalogTestCase):
+    def counts(self, *nodes):
+        rows = {pk: (own, total) for pk, own, total in Category.objects.values_list(
+            'pk', 'product_count', 'total_product_count'
+        )}
+        return [rows[node.pk] for node in nodes]
+
+    def path(self, category):
+        return Category.objects.values_list('path', flat=True).get(pk=category.pk)
+
+    def test_paths_and_counts(self):
+        self.assertEqual(self.path(self.fruit), categories.path_segment(self.produce.pk) + categories.path_segment(self.fruit.pk))
+        self.assertEqual(self.counts(self.produce, self.fruit, self.dairy), [(0, 1), (1, 1), (1, 1)])
+        self.apple.category = self.dairy
+        self.apple.save()
+        self.milk.is_active = False
+        self.milk.save()
+        self.assertEqual(self.counts(self.produce, self.fruit, self.dairy), [(0, 0), (0, 0), (1, 1)])
+
+    def test_moving_a_subtree_moves_paths_and_totals(self):
+        berries = Category.objects.create(name='Berries', parent=self.fruit)
+        Product.objects.create(name='Blueberry', price='3.00', shop=self.shop, category=berries)
+        self.assertEqual(self.counts(self.produce, self.fruit, berries), [(0, 2), (1, 2), (1, 1)])
+
+        self.fruit.parent = self.dairy
+        self.fruit.save()
+        self.assertEqual(self.path(berries), self.path(self.dairy) + categories.path_segment(self.fruit.pk)
+                         + categories.path_segment(berries.pk))
+        self.assertEqual(self.counts(self.produce, self.dairy, self.fruit, berries), [(0, 0), (1, 3), (1, 2), (1, 1)])
+        response = self.client.get(f'/api/products/category/{self.dairy.slug}/')
+        self.assertEqual(len(response.json()['results']), 3)
+
+        self.fruit.parent = None
+        self.fruit.save()
+        self.assertEqual(self.path(self.fruit), categories.path_segment(self.fruit.pk))
+        self.assertEqual(self.counts(self.dairy, self.fruit), [(1, 1), (1, 2)])
+
+    def test_cycles_are_rejected(self):
+        berries = Category.objects.create(name='Berries', parent=self.fruit)
+        for parent in (berries, self.produce):
+            with self.subTest(parent=parent):
+                self.produce.parent = parent
+                with self.assertRaises(ValidationError) as raised:
+                    self.produce.full_clean()
+                self.assertEqual(raised.exception.error_dict['parent'][0].code, 'cycle')
+                with self.assertRaises(ValidationError):
+                    self.produce.save()
+        self.assertEqual(self.path(self.produce), categories.path_segment(self.produce.pk))
+
+    def test_depth_is_limited(self):
+        chain = [None]
+        for level in range(categories.MAX_DEPTH):
+            chain.append(Category.objects.create(name=f'Level {level}', parent=chain[-1]))
+        with self.assertRaises(ValidationError):
+            Category.objects.create(name='Too deep', parent=chain[-1])
+        # Produce brings Fruit along, so it needs two free levels.
+        self.produce.parent = chain[-2]
+        with self.assertRaises(ValidationError) as raised:
+            self.produce.full_clean()
+        self.assertEqual(raised.exception.error_dict['parent'][0].code, 'max_depth')
+        self.produce.parent = chain[-3]
+        self.produce.save()
+        self.assertEqual(len(self.path(self.fruit)), categories.MAX_DEPTH * categories.STEP)
+
+    def test_deleting_a_leaf(self):
+        berries = Category.objects.create(name='Berries', parent=self.fruit)
+        blueberry = Product.objects.create(name='Blueberry', price='3.00', shop=self.shop, category=berries)
+        berries.delete()
+        blueberry.refresh_from_db()
+        self.assertIsNone(blueberry.category_id)
+        self.assertEqual(self.counts(self.produce, self.fruit), [(0, 1), (1, 1)])
+        with self.assertRaises(ProtectedError):
+            self.produce.delete()
+
+    def test_rebuild_repairs_drift(self):
+        berries = Category.objects.create(name='Berries', parent=self.fruit)
+        Category.objects.filter(pk=self.produce.pk).update(total_product_count=9)
+        Category.objects.filter(pk=berries.pk).update(path='', product_count=4)
+        # Bulk writes send no signals.
+        Product.objects.filter(pk=self.milk.pk).update(category=berries)
+        self.assertEqual(categories.rebuild(), 4)
+        self.assertEqual(self.path(berries), self.path(self.fruit) + categories.path_segment(berries.pk))
+        self.assertEqual(
+            self.counts(self.produce, self.fruit, berries, self.dairy), [(0, 2), (1, 2), (1, 1), (0, 0)]
+        )
+        self.assertEqual(categories.rebuild(), 0)
+
+
+class FacetTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.market = Shop.objects.create(name='Night Market', owner=cls.owner)
+        for name, price, stock in (('Fig', '99.99', 0), ('Date', '100.00', 3), ('Kiwi', '499.99', 0), ('Lime', '500.00', 1)):
+            Product.objects.create(name=name, price=price, shop=cls.market, category=cls.fruit, stock_quantity=stock)
+        Product.objects.create(name='Cheese', price='5000.00', shop=cls.market, category=cls.dairy, stock_quantity=2)
+        Product.objects.create(name='Hidden', price='1.00', shop=cls.market, category=cls.fruit, is_active=False)
+
+    def facets(self, **params):
+        response = self.client.get('/api/products/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['facets']
+
+    def test_counts(self):
+        data = self.facets()
+        self.assertEqual(data['total'], 7)
+        # Parents count their subcategories' products.
+        self.assertEqual(
+            [(node['slug'], node['count'], [child['count'] for child in node['children']]) for node in data['categories']],
+            [('produce', 5, [5]), ('dairy', 2, [])],
+        )
+        self.assertEqual(
+            [(shop['name'], shop['count']) for shop in data['shops']], [('Night Market', 5), ('Green Grocer', 2)]
+        )
+        # Buckets hold min <= price < max.
+        self.assertEqual([bucket['count'] for bucket in data['price']], [3, 2, 1, 0, 1])
+        self.assertEqual((data['price'][0]['max'], data['price'][-1]['max']), (100, None))
+        self.assertEqual(data['stock'], {'in_stock': 5, 'out_of_stock': 2})
+
+    def test_filters_narrow_the_counts(self):
+        data = self.facets(category=self.dairy.slug, in_stock='true')
+        self.assertEqual((data['total'], data['stock']), (2, {'in_stock': 2, 'out_of_stock': 0}))
+        self.assertEqual([node['slug'] for node in data['categories']], ['dairy'])
+
+    def test_unknown_category_is_empty(self):
+        data = self.facets(category='nothing')
+        self.assertEqual((data['total'], data['categories'], data['shops']), (0, [], []))
+        self.assertEqual([bucket['count'] for bucket in data['price']], [0] * 5)
+        self.assertEqual(data['stock'], {'in_stock': 0, 'out_of_stock': 0})
+
+    def test_grouping_strategies_agree(self):
+        queryset = Product.objects.filter(is_active=True)
+        bounds = facets.get_config()['PRICE_BUCKETS']
+        expected = {
+            'category_id': {self.fruit.pk: 5, self.dairy.pk: 2},
+            'shop_id': {self.shop.pk: 2, self.market.pk: 5},
+            'price_bucket': {0: 3, 1: 2, 2: 1, 4: 1},
+            'in_stock': {0: 2, 1: 5},
+        }
+        self.assertEqual(facets._grouped_counts(queryset, bounds, grouping_sets=False), expected)
+        if connection.vendor == 'postgresql':
+            self.assertEqual(facets._grouped_counts(queryset, bounds, grouping_sets=True), expected)
+
+    def test_sorting_and_paging_reuse_the_counts(self):
+        with mock.patch.object(facets, 'compute_facets', wraps=facets.compute_facets) as compute:
+            self.facets(sort_by='price')
+            self.facets(sort_by='name', sort_order='desc', page_size=2)
+            self.facets(in_stock='true')
+        self.assertEqual(compute.call_count, 2)
+
+    def test_product_save_refreshes_the_counts(self):
+        self.assertEqual(self.facets()['stock']['in_stock'], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milk.stock_quantity = 0
+            self.milk.save()
+        self.assertEqual(self.facets()['stock']['in_stock'], 4)
+
+
+class ResponseCacheTests(CatalogTestCase):
+    def test_hit_is_throttled(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'anon': '2/min'}
+        get_store().clear()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.assertEqual(self.client.get('/api/products/')['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/api/products/')['X-Cache'], 'HIT')
+            response = self.client.get('/api/products/')
+        get_store().clear()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_hit_matches_miss(self):
+        miss = self.client.get('/api/products/')
+        hit = self.client.get('/api/products/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit.content, miss.content)
+        self.assertEqual(hit['ETag'], miss['ETag'])
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=miss['ETag']).status_code, 304)
+
+    def test_invalidation_waits_for_commit(self):
+        before = response_cache.get_generations(['product'])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.apple.name = 'Green Apple'
+                self.apple.save()
+                # A read here still sees the old row, so it must not be cached as current.
+                self.assertEqual(response_cache.get_generations(['product']), before)
+        self.assertNotEqual(response_cache.get_generations(['product']), before)
+
+    def test_save_refreshes_cached_list(self):
+        self.client.get('/api/products/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apple.name = 'Green Apple'
+            self.apple.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Green Apple', [product['name'] for product in response.json()['results']])
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottleTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+
+    def login(self, **headers):
+        return self.client.post(
+            '/api/customers/login/', {'email': 'owner@example.com', 'password': 'wrong'}, headers=headers
+        )
+
+    def test_bucket_bursts_then_refills(self):
+        store = MemoryBucketStore(max_keys=10)
+        with mock.patch('utils.throttling.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual([store.consume('k', 3, 0.5)[0] for _ in range(4)], [True, True, True, False])
+            self.assertEqual(store.consume('k', 3, 0.5), (False, 2.0))
+            clock.return_value = 102.0
+            self.assertEqual(store.consume('k', 3, 0.5), (True, 0.0))
+            self.assertFalse(store.consume('k', 3, 0.5)[0])
+            # Idle time never fills a bucket past its capacity.
+            clock.return_value = 1000.0
+            self.assertEqual([store.consume('k', 3, 0.5)[0] for _ in range(4)], [True, True, True, False])
+
+    @throttle_rates(auth='3/min')
+    def test_forged_forwarded_for_shares_the_bucket(self):
+        statuses = [self.login(x_forwarded_for=f'10.0.0.{i}').status_code for i in range(5)]
+        self.assertEqual(statuses, [401, 401, 401, 429, 429])
+
+    @throttle_rates(auth='3/min')
+    def test_forwarded_for_is_trusted_behind_proxies(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            statuses = [self.login(x_forwarded_for=f'10.0.0.{i}').status_code for i in range(5)]
+        self.assertEqual(statuses, [401] * 5)
+
+    @throttle_rates(user='2/min')
+    def test_users_have_their_own_buckets(self):
+        other = Customer.objects.create_user(username='other', email='other@example.com', password='pw')
+        client = APIClient()
+        for user in (self.owner, other):
+            client.force_authenticate(user)
+            statuses = [client.get('/api/products/').status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+
+    @throttle_rates(auth='2/min')
+    def test_ip_scopes_ignore_the_user(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.post('/api/customers/login/', {}).status_code, 400)
+        client.force_authenticate(Customer.objects.create_user(username='x', email='x@example.com', password='pw'))
+        self.assertEqual(client.post('/api/customers/login/', {}).status_code, 400)
+        self.assertEqual(self.login().status_code, 429)
+
+
+@override_settings(LOAD_SHEDDING={**settings.LOAD_SHEDDING, 'ENABLED': True, 'MAX_IN_FLIGHT': 1})
+class LoadSheddingTests(TestCase):
+    def setUp(self):
+        self.middleware = LoadSheddingMiddleware(lambda request: HttpResponse('ok'))
+        self.factory = RequestFactory()
+
+    def test_admits_below_the_limit(self):
+        response = self.middleware(self.factory.get('/api/products/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.middleware.in_flight, 0)
+
+    def test_sheds_when_saturated(self):
+        self.middleware.in_flight = 1
+        response = self.middleware(self.factory.get('/api/products/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(load_shedding.get_config()['RETRY_AFTER']))
+        self.assertEqual((self.middleware.shed, self.middleware.last_reason), (1, '1 requests in flight'))
+        self.assertEqual(self.middleware(self.factory.get('/api/health/')).status_code, 200)
+
+    def test_sheds_when_the_pool_is_backed_up(self):
+        with mock.patch.object(self.middleware.pools, 'check', return_value='default pool has 9 requests waiting'):
+            response = self.middleware(self.factory.get('/api/products/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.middleware.in_flight, 0)
+
+
+@override_settings(CARTS={**settings.CARTS, 'FLUSH_INTERVAL': 0, 'MAX_ITEMS': 2})
+class CartTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.buyer = Customer.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        cls.pear = Product.objects.create(name='Pear', price='3.00', shop=cls.shop, stock_quantity=1)
+
+    def setUp(self):
+        super().setUp()
+        caches[settings.CARTS['CACHE_ALIAS']].clear()
+        # A write-through store built from the overridden settings.
+        cart._store = None
+        self.addCleanup(setattr, cart, '_store', None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def add(self, product, quantity):
+        return self.client.post('/api/cart/add/', {'product_id': product.pk, 'quantity': quantity}, format='json')
+
+    def lines(self, response):
+        return {line['product_id']: line['quantity'] for line in response.json()['items']}
+
+    def test_add_accumulates(self):
+        self.assertEqual(self.add(self.apple, 2).status_code, 201)
+        response = self.add(self.apple, 3)
+        self.assertEqual(self.lines(response), {self.apple.pk: 5})
+        self.assertEqual(response.json()['total_amount'], '12.50')
+        self.assertEqual(Cart.objects.get(customer=self.buyer).items, {str(self.apple.pk): 5})
+
+    def test_add_beyond_stock_is_rejected(self):
+        self.add(self.apple, 8)
+        response = self.add(self.apple, 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], f'Only 10 of product {self.apple.pk} in stock')
+        self.assertEqual(self.lines(self.client.get('/api/cart/')), {self.apple.pk: 8})
+
+    def test_add_unavailable_product_is_rejected(self):
+        Product.objects.filter(pk=self.milk.pk).update(is_active=False)
+        self.assertEqual(self.add(self.milk, 1).status_code, 400)
+
+    def test_full_cart_is_rejected(self):
+        self.add(self.apple, 1)
+        self.add(self.milk, 1)
+        response = self.add(self.pear, 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 2', response.json()['error'])
+
+    def test_update_quantity(self):
+        self.add(self.apple, 1)
+        response = self.client.put(f'/api/cart/update/{self.apple.pk}/', {'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lines(response), {self.apple.pk: 4})
+
+    def test_update_beyond_stock_is_rejected(self):
+        self.add(self.pear, 1)
+        response = self.client.put(f'/api/cart/update/{self.pear.pk}/', {'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.lines(self.client.get('/api/cart/')), {self.pear.pk: 1})
+
+    def test_update_missing_line_is_not_found(self):
+        response = self.client.put(f'/api/cart/update/{self.apple.pk}/', {'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_replace_remove_and_clear(self):
+        response = self.client.post('/api/cart/', {'items': [
+            {'product_id': self.apple.pk, 'quantity': 1},
+            {'product_id': self.apple.pk, 'quantity': 2},
+            {'product_id': self.milk.pk, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(self.lines(response), {self.apple.pk: 3, self.milk.pk: 1})
+        response = self.client.delete(f'/api/cart/remove/{self.apple.pk}/')
+        self.assertEqual(self.lines(response), {self.milk.pk: 1})
+        response = self.client.delete('/api/cart/clear/')
+        self.assertEqual(response.json()['items'], [])
+        self.assertEqual(Cart.objects.get(customer=self.buyer).items, {})
+
+
+class FastSerializerTests(CatalogTestCase):
+    """The compiled list path renders exactly what the DRF serializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.loose = Product.objects.create(name='Loose Tea', price='0.05', shop=cls.shop, stock_quantity=0)
+        Product.objects.filter(pk=cls.apple.pk).update(
+            image='products/apple.jpg', image_hash='ab' * 32, rating='4.33', rating_count=3, rating_sum=13
+        )
+        cls.shop.image, cls.shop.latitude, cls.shop.longitude = 'shops/front.png', 18.5204, 73.8567
+        cls.shop.save()
+
+    def setUp(self):
+        super().setUp()
+        self.request = APIRequestFactory().get('/api/products/')
+
+    def assert_same_output(self, serializer_class, queryset, context):
+        drf = serializer_class(queryset, many=True, context=context).data
+        compiled = compile_serializer(serializer_class(context=context))
+        fast = [compiled(row) for row in queryset.values(*compiled.keys)]
+        renderer = FastJSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(drf))
+        return fast
+
+    def test_products(self):
+        queryset = Product.objects.select_related('shop', 'category').order_by('pk')
+        for context in ({'request': self.request}, {}):
+            with self.subTest(context=context):
+                rows = self.assert_same_output(ProductSerializer, queryset, context)
+        by_name = {row['name']: row for row in rows}
+        # Null foreign key, image with renditions, decimals.
+        self.assertIsNone(by_name['Loose Tea']['category'])
+        self.assertIsNone(by_name['Loose Tea']['image_renditions'])
+        self.assertEqual(by_name['Apple']['rating'], '4.33')
+        self.assertEqual(by_name['Loose Tea']['price'], '0.05')
+        self.assertIn('ab' * 32, str(by_name['Apple']['image_renditions']))
+
+    def test_datetimes_in_the_active_timezone(self):
+        queryset = Product.objects.select_related('shop', 'category').order_by('pk')
+        with timezone.override('Asia/Kolkata'):
+            rows = self.assert_same_output(ProductSerializer, queryset, {'request': self.request})
+        self.assertTrue(rows[0]['created_at'].endswith('+05:30'))
+
+    def test_shops_with_annotations(self):
+        queryset = geo.nearby(Shop.objects.all(), 18.52, 73.85, 5)
+        rows = self.assert_same_output(NearbyShopSerializer, queryset, {'request': self.request})
+        self.assertEqual(len(rows), 1)
+        self.assertIsInstance(rows[0]['distance_km'], float)
+
+    def test_endpoint_matches_drf(self):
+        response = self.client.get('/api/products/')
+        queryset = Product.objects.filter(is_active=True).select_related('shop', 'category')
+        drf = ProductSerializer(queryset, many=True, context={'request': self.request}).data
+        self.assertEqual(response.json()['results'], json.loads(FastJSONRenderer().render(drf)))
+
+    def test_uncompilable_falls_back_to_drf(self):
+        class NamedSerializer(ProductSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(ProductSerializer.Meta):
+                fields = ['id', 'label']
+
+            def get_label(self, product):
+                return product.name.upper()
+
+        class NamedListView(FastListMixin, generics.ListAPIView):
+            queryset = Product.objects.order_by('pk')
+            serializer_class = NamedSerializer
+            permission_classes = []
+
+        with self.assertRaises(Uncompilable):
+            compile_serializer(NamedSerializer())
+        response = NamedListView.as_view()(self.request)
+        self.assertEqual([row['label'] for row in response.data['results']], ['APPLE', 'MILK', 'LOOSE TEA'])
+        self.assertIn(NamedSerializer, fast_serializers._uncompilable)
+
+
+@override_settings(IMAGE_RENDITIONS={**settings.IMAGE_RENDITIONS, 'SIZES': {'thumb': 20, 'large': 60}})
+class ImageRenditionTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, product, name, size=(80, 40), mode='RGB', color=(200, 30, 30)):
+        content = io.BytesIO()
+        Image.new(mode, size, color).save(content, 'PNG')
+        with mock.patch.object(images, 'enqueue') as enqueue:
+            product.image = SimpleUploadedFile(name, content.getvalue())
+            product.save()
+        return enqueue
+
+    def process(self, product):
+        product.refresh_from_db()
+        return images.process_image('customer.Product', product.pk, product.image.name)
+
+    def renditions(self, product):
+        return self.client.get(f'/api/products/{product.pk}/').json()['image_renditions']
+
+    def test_renders_every_size_and_format(self):
+        enqueue = self.upload(self.apple, 'apple.png', mode='RGBA', color=(0, 0, 0, 0))
+        enqueue.assert_called_once_with(self.apple)
+        self.assertIsNone(self.renditions(self.apple))
+
+        digest = self.process(self.apple)
+        storage = default_storage
+        manifest = json.loads(storage.open(images.manifest_path(digest)).read())
+        # Never upscaled past the source, aspect ratio kept.
+        self.assertEqual(manifest, {
+            'source': {'width': 80, 'height': 40},
+            'renditions': {'large': {'width': 60, 'height': 30}, 'thumb': {'width': 20, 'height': 10}},
+        })
+        with storage.open(images.rendition_path(digest, 'thumb', 'jpeg')) as file:
+            thumb = Image.open(file)
+            # Transparent pixels are flattened onto white for JPEG.
+            self.assertEqual((thumb.format, thumb.size, thumb.getpixel((0, 0))), ('JPEG', (20, 10), (255, 255, 255)))
+
+        renditions = self.renditions(self.apple)
+        self.assertEqual(set(renditions), {'thumb', 'large'})
+        self.assertEqual(renditions['large']['webp'], f'http://testserver/media/renditions/{digest[:2]}/{digest}/large.webp')
+        self.assertEqual(self.client.get('/api/products/').json()['results'][-1]['image_renditions'], renditions)
+
+    def test_identical_uploads_render_once(self):
+        self.upload(self.apple, 'apple.png')
+        self.upload(self.milk, 'copy.png')
+        with mock.patch.object(images, 'render', wraps=images.render) as render:
+            self.assertEqual(self.process(self.apple), self.process(self.milk))
+        self.assertEqual(render.call_count, 1)
+
+    def test_replacing_the_image_drops_the_old_renditions(self):
+        self.upload(self.apple, 'apple.png')
+        old = self.process(self.apple)
+
+        enqueue = self.upload(self.apple, 'apple-new.png', color=(10, 200, 10))
+        enqueue.assert_called_once()
+        # Until the new renditions exist, none are served.
+        self.assertEqual(Product.objects.get(pk=self.apple.pk).image_hash, '')
+        self.assertIsNone(self.renditions(self.apple))
+        # The old upload's job finishing late must not bring its hash back.
+        images.process_image('customer.Product', self.apple.pk, 'products/apple.png')
+        self.assertEqual(Product.objects.get(pk=self.apple.pk).image_hash, '')
+
+        self.assertNotEqual(self.process(self.apple), old)
+        self.assertIn(Product.objects.get(pk=self.apple.pk).image_hash, str(self.renditions(self.apple)))
+
+    def test_removing_the_image_drops_the_renditions(self):
+        self.upload(self.apple, 'apple.png')
+        self.process(self.apple)
+        self.apple.image = None
+        self.apple.save()
+        self.assertEqual(Product.objects.get(pk=self.apple.pk).image_hash, '')
+
+    def test_unrelated_saves_keep_the_renditions(self):
+        self.upload(self.apple, 'apple.png')
+        digest = self.process(self.apple)
+        with mock.patch.object(images, 'enqueue') as enqueue:
+            self.apple.refresh_from_db()
+            self.apple.price = '3.00'
+            self.apple.save()
+            Product.objects.defer('image', 'image_hash').get(pk=self.apple.pk).save()
+        enqueue.assert_not_called()
+        self.assertEqual(Product.objects.get(pk=self.apple.pk).image_hash, digest)
+
+
+class NearbyShopTests(CatalogTestCase):
+    origin = (18.5204, 73.8567)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Due north of the origin, 0.5 km, 1.5 km, ... 11.5 km away.
+        cls.stalls = [
+            Shop.objects.create(
+                name=f'Stall {i}', owner=cls.owner, latitude=cls.origin[0] + (0.5 + i) / 111.195, longitude=cls.origin[1]
+            )
+            for i in range(12)
+        ]
+
+    def nearby(self, path='/api/shops/', **params):
+        return self.client.get(path, {'lat': self.origin[0], 'lng': self.origin[1], **params})
+
+    def test_nearest_first_within_radius(self):
+        response = assert_endpoint_queries(
+            self.client, '/api/shops/', 2, data={'lat': self.origin[0], 'lng': self.origin[1], 'radius': 5}
+        )
+        data = response.json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual([shop['id'] for shop in data['results']], [shop.pk for shop in self.stalls[:5]])
+        self.assertEqual([shop['distance_km'] for shop in data['results']], [0.5, 1.5, 2.5, 3.5, 4.5])
+
+    def test_distance_matches_haversine(self):
+        far = self.stalls[-1]
+        expected = geo.haversine_km(*self.origin, far.latitude, far.longitude)
+        distance = geo.nearby(Shop.objects.all(), *self.origin, 20).get(pk=far.pk).distance_km
+        self.assertAlmostEqual(distance, expected, places=6)
+
+    def test_pages(self):
+        data = self.nearby(radius=20, page=2).json()
+        self.assertEqual(data['count'], 12)
+        self.assertEqual([shop['id'] for shop in data['results']], [shop.pk for shop in self.stalls[10:]])
+
+    def test_nothing_in_range(self):
+        data = self.nearby(lat=-33.9, lng=18.4).json()
+        self.assertEqual((data['count'], data['results']), (0, []))
+
+    async def test_async_nearby(self):
+        response = await self.async_client.get(
+            '/api/async/shops/', {'lat': self.origin[0], 'lng': self.origin[1], 'radius': 2}
+        )
+        self.assertEqual([shop['distance_km'] for shop in response.json()['results']], [0.5, 1.5])
+
+
+class ReviewRatingTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.alice = Customer.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = Customer.objects.create_user(username='bob', email='bob@example.com', password='pw')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def review(self, user, product, rating):
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/api/products/{product.pk}/reviews/', {'rating': rating, 'comment': 'ok'})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def ratings(self, product):
+        product.refresh_from_db()
+        return product.rating, product.rating_count, product.rating_sum
+
+    def test_create_edit_and_delete_move_the_aggregates(self):
+        self.review(self.alice, self.apple, 5)
+        pk = self.review(self.bob, self.apple, 2)
+        self.assertEqual(self.ratings(self.apple), (Decimal('3.50'), 2, 7))
+
+        response = self.client.patch(f'/api/reviews/{pk}/', {'rating': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ratings(self.apple), (Decimal('4.50'), 2, 9))
+
+        response = self.client.delete(f'/api/reviews/{pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.ratings(self.apple), (Decimal('5.00'), 1, 5))
+        self.assertEqual(self.ratings(self.milk), (Decimal('0.00'), 0, 0))
+
+    def test_average_is_rounded(self):
+        self.review(self.alice, self.apple, 5)
+        self.review(self.bob, self.apple, 4)
+        self.review(self.owner, self.apple, 4)
+        self.assertEqual(self.ratings(self.apple), (Decimal('4.33'), 3, 13))
+
+    def test_saving_a_stale_product_keeps_the_aggregates(self):
+        stale = Product.objects.get(pk=self.apple.pk)
+        self.review(self.alice, self.apple, 3)
+        stale.name = 'Green Apple'
+        stale.save()
+        self.assertEqual(self.ratings(self.apple), (Decimal('3.00'), 1, 3))
+
+    def test_deferred_rating_is_not_counted_twice(self):
+        pk = self.review(self.alice, self.apple, 3)
+        review = Review.objects.defer('rating').get(pk=pk)
+        review.comment = 'changed'
+        review.save()
+        self.assertEqual(self.ratings(self.apple), (Decimal('3.00'), 1, 3))
+
+    def test_saving_a_deferred_product_does_not_load_fields(self):
+        product = Product.objects.only('name').get(pk=self.apple.pk)
+        product.name = 'Green Apple'
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        product_queries = [query['sql'] for query in queries if '"customer_product"' in query['sql']]
+        self.assertEqual(len([sql for sql in product_queries if sql.startswith('UPDATE')]), 1)
+        self.assertIn('SET "name" = ', product_queries[0])
+        self.assertNotIn('"rating"', product_queries[0])
+        # No field of the product was loaded one by one.
+        self.assertFalse([sql for sql in product_queries if 'LIMIT 21' in sql])
+        self.review(self.alice, self.apple, 5)
+        self.assertEqual(self.ratings(self.apple), (Decimal('5.00'), 1, 5))
+        self.assertEqual(self.apple.name, 'Green Apple')
+
+    def test_rebuild_repairs_drift(self):
+        self.review(self.alice, self.apple, 4)
+        Product.objects.filter(pk=self.apple.pk).update(rating=1, rating_count=7, rating_sum=7)
+        self.assertEqual(reviews.rebuild(batch_size=1), 1)
+        self.assertEqual(self.ratings(self.apple), (Decimal('4.00'), 1, 4))
+        self.assertEqual(reviews.rebuild(), 0)
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PythonSearchTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tomato = Product.objects.create(
+            name='Tomato', price='1.00', shop=cls.shop, category=cls.produce, description='Vine ripened'
+        )
+        tomato_shop = Shop.objects.create(name='Tomato Town', owner=cls.owner)
+        cls.relish = Product.objects.create(name='Relish', price='3.00', shop=tomato_shop)
+        cls.sauce = Product.objects.create(name='Pasta Sauce', price='4.00', shop=cls.shop, description='Made from tomato')
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).values_list('pk', flat=True))
+
+    def test_match_score(self):
+        self.assertEqual(match_score('tomato', 'tomato'), 1.0)
+        self.assertEqual(match_score('tom', 'tomato'), 0.75)
+        self.assertEqual(match_score('tomatoe', 'tomato'), 0.5)
+        self.assertEqual(match_score('tom', 'tim'), 0.0)
+
+    def test_ranks_name_over_shop_over_description(self):
+        self.assertEqual(self.search('tomato'), [self.tomato.pk, self.relish.pk, self.sauce.pk])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search('tom'), [self.tomato.pk, self.relish.pk, self.sauce.pk])
+
+    def test_typo_match(self):
+        self.assertEqual(self.search('tomatoe'), [self.tomato.pk, self.relish.pk, self.sauce.pk])
+        self.assertEqual(self.search('aple'), [self.apple.pk])
+
+    def test_exact_match_outranks_typo(self):
+        salsa = Product.objects.create(name='Tomatos Salsa', price='2.00', shop=self.shop)
+        self.assertEqual(self.search('tomatos')[:2], [salsa.pk, self.tomato.pk])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('tomato ripened'), [self.tomato.pk])
+        self.assertEqual(self.search('tomato cheese'), [])
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/products/search/', {'q': 'tom'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.json()['results']], [self.tomato.pk, self.relish.pk, self.sauce.pk])
+
+    def test_product_save_reindexes(self):
+        self.milk.name = 'Buttermilk'
+        self.milk.save()
+        self.assertEqual(self.search('buttermilk'), [self.milk.pk])
+
+    def test_shop_save_reindexes(self):
+        self.shop.name = 'Orchard Stall'
+        self.shop.save()
+        # Equal scores rank the newest product first.
+        expected = sorted([self.apple.pk, self.milk.pk, self.tomato.pk, self.sauce.pk], reverse=True)
+        self.assertEqual(self.search('orchard'), expected)
+
+    def test_category_save_reindexes(self):
+        self.dairy.name = 'Creamery'
+        self.dairy.save()
+        self.assertEqual(self.search('creamery'), [self.milk.pk])
+
+
+class QueryCountTests(CatalogTestCase):
+    """Listing a page costs the same number of queries however many rows it holds."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.buyer = Customer.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        for i in range(6):
+            shop = Shop.objects.create(name=f'Stall {i}', owner=cls.owner)
+            for j in range(3):
+                product = Product.objects.create(
+                    name=f'Mango {i}-{j}', price='3.00', shop=shop, category=cls.fruit, stock_quantity=10
+                )
+            place_order(cls.buyer, [{'product_id': cls.apple.pk, 'quantity': 1}, {'product_id': product.pk, 'quantity': 1}])
+
+    def test_product_list(self):
+        response = assert_endpoint_queries(self.client, '/api/products/', 1)
+        self.assertEqual(len(response.json()['results']), 10)
+        # Page numbers add the COUNT.
+        assert_endpoint_queries(self.client, '/api/products/?page=2', 2)
+
+    def test_product_list_cache_hit(self):
+        self.client.get('/api/products/')
+        response = assert_endpoint_queries(self.client, '/api/products/', 0)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_shop_products(self):
+        shop = Shop.objects.get(name='Stall 0')
+        response = assert_endpoint_queries(self.client, f'/api/shops/{shop.pk}/products/', 1)
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_category_products(self):
+        # The category lookup, then the page.
+        response = assert_endpoint_queries(self.client, f'/api/products/category/{self.produce.slug}/', 2)
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_order_list(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = assert_endpoint_queries(client, '/api/orders/', 2)
+        self.assertEqual(len(response.json()['results']), 6)
+
+
+class MetricsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_histogram_buckets(self):
+        route = metrics.RouteStats()
+        for elapsed_ms in (0.05, 0.1, 0.11, 1.0, 10 ** 9):
+            route.add(elapsed_ms, 200, metrics.RequestStats())
+        route.add(1.0, 503, metrics.RequestStats())
+        # Each sample lands in the first bucket whose upper bound holds it; the last bucket is open-ended.
+        filled = {index: count for index, count in enumerate(route.buckets) if count}
+        one_ms = bisect.bisect_left(metrics.BUCKETS, 1.0)
+        self.assertLess(metrics.BUCKETS[one_ms - 1], 1.0)
+        self.assertEqual(filled, {0: 2, 1: 1, one_ms: 2, len(metrics.BUCKETS): 1})
+        self.assertEqual((route.count, route.errors), (6, 1))
+        self.assertEqual(route.percentile(0.5), metrics.BUCKETS[1])
+        self.assertEqual(route.percentile(0.75), metrics.BUCKETS[one_ms])
+        self.assertEqual(route.percentile(1.0), 10 ** 9)
+
+    def test_route_figures(self):
+        with CaptureQueriesContext(connection) as queries, override_settings(INSTRUMENTATION={'SERVER_TIMING': False}):
+            response = self.client.get('/api/shops/')
+        self.assertNotIn('Server-Timing', response)
+        routes = metrics.snapshot()['routes']
+        self.assertEqual(routes['GET api/shops/']['requests'], 1)
+        self.assertEqual(routes['GET api/shops/']['sql']['queries_per_request'], len(queries))
+        self.client.get('/api/shops/no-such-route/')
+        routes = metrics.snapshot()['routes']
+        self.assertIn('serialize', routes['GET api/shops/']['phases_ms_per_request'])
+        self.assertEqual(routes['GET <unmatched>']['requests'], 1)
+
+    @override_settings(INSTRUMENTATION={'SERVER_TIMING': True})
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/shops/')
+        timings = [timing.split(';')[0] for timing in response['Server-Timing'].split(', ')]
+        self.assertEqual(timings[:2], ['app', 'db'])
+        self.assertIn('serialize', timings)
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+
+    @override_settings(INSTRUMENTATION={'ENABLED': False})
+    def test_disabled(self):
+        self.client.get('/api/shops/')
+        self.assertEqual(metrics.snapshot()['routes'], {})
+
+    def test_endpoint_is_admin_only(self):
+        self.client.get('/api/shops/')
+        self.assertIn(self.client.get('/api/metrics/').status_code, (401, 403))
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        admin = Customer.objects.create_user(username='admin', email='admin@example.com', password='pw', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/metrics/', {'reset': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['routes']['GET api/shops/']['requests'], 1)
+        # The window restarts, holding only the reset request itself.
+        self.assertEqual(list(metrics.snapshot()['routes']), ['GET api/metrics/'])
+
+
+class CachedAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Customer.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+
+    def setUp(self):
+        authentication.clear()
+        authentication._invalidated_at.clear()
+        token = AccessToken.for_user(self.user)
+        self.request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def authenticate(self):
+        user, _ = authentication.CachedJWTAuthentication().authenticate(self.request)
+        return user
+
+    def test_repeat_requests_skip_the_user_query(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+
+    def test_saving_the_user_drops_cached_entries(self):
+        self.authenticate()
+        Customer.objects.get(pk=self.user.pk).save(update_fields=['email'])
+        Customer.objects.filter(pk=self.user.pk).update(email='new@example.com')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().email, 'new@example.com')
+
+    @override_settings(AUTH_CACHE={'TIMEOUT': 0})
+    def test_invalidations_past_the_timeout_are_forgotten(self):
+        for user_id in range(100):
+            authentication.invalidate_user(user_id)
+        self.assertLessEqual(len(authentication._invalidated_at), 1)
+
+
+@contextmanager
+def extra_database(alias, entry):
+    """DATABASES with ``alias`` added, for code that only reads the settings."""
+    with warnings.catch_warnings():
+        # Overriding DATABASES warns since connections are not reconfigured.
+        warnings.simplefilter('ignore')
+        with override_settings(DATABASES={**settings.DATABASES, alias: entry}):
+            yield
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Routing decisions only; the replica alias is never connected to."""
+
+    def with_replica(self):
+        return extra_database('replica', {**settings.DATABASES['default'], 'TEST': {'MIRROR': 'default'}})
+
+    def test_reads_use_the_replica_inside_the_block(self):
+        with self.with_replica():
+            self.assertEqual(Product.objects.all().db, 'default')
+            with database.read_from_replica():
+                self.assertEqual(Product.objects.all().db, 'replica')
+        with database.read_from_replica():
+            # Without a replica configured everything stays on default.
+            self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_writes_go_to_default(self):
+        with self.with_replica(), database.read_from_replica():
+            self.assertEqual(database.ReplicaRouter().db_for_write(Product), 'default')
+
+    def test_reads_after_a_write_stick_to_default(self):
+        owner = Customer.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        with self.with_replica():
+            with database.read_from_replica():
+                Shop.objects.create(name='Green Grocer', owner=owner)
+                self.assertEqual(Product.objects.all().db, 'default')
+            # A new block starts on the replica again.
+            with database.read_from_replica():
+                self.assertEqual(Product.objects.all().db, 'replica')
+
+    def test_reads_in_a_transaction_stick_to_default(self):
+        with self.with_replica(), database.read_from_replica():
+            with transaction.atomic():
+                self.assertEqual(Product.objects.all().db, 'default')
+            self.assertEqual(Product.objects.all().db, 'replica')
+
+    def test_replica_is_never_migrated(self):
+        router = database.ReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'customer'))
+        self.assertIsNone(router.allow_migrate('default', 'customer'))
+
+    def test_database_stats(self):
+        opened = database.database_stats()['default']['connections_opened']
+        # What a new connection sends; in-memory SQLite never reconnects.
+        connection_created.send(sender=type(connection), connection=connection)
+        stats = database.database_stats(check=True)['default']
+        self.assertEqual(stats['connections_opened'], opened + 1)
+        self.assertEqual((stats['status'], stats['vendor'], stats['pool']), ('healthy', connection.vendor, None))
+        self.assertGreaterEqual(stats['ping_ms'], 0)
+
+
+class DatabaseSettingsTests(TestCase):
+    def database_settings(self, mode):
+        with mock.patch.object(project_settings, 'DB_POOL_MODE', mode):
+            return project_settings.database_settings('DB')
+
+    def pool_mode(self, entry):
+        with extra_database('other', entry):
+            return database.get_pool_mode('other')
+
+    def test_pool_mode(self):
+        entry = self.database_settings('pool')
+        self.assertEqual(entry['CONN_MAX_AGE'], 0)
+        self.assertEqual(entry['OPTIONS']['sslmode'], 'require')
+        self.assertEqual(entry['OPTIONS']['pool'], {'min_size': 2, 'max_size': 10, 'timeout': 10.0, 'max_idle': 300.0})
+        self.assertEqual(self.pool_mode(entry), 'pool')
+
+    def test_persistent_mode(self):
+        entry = self.database_settings('persistent')
+        self.assertEqual((entry['CONN_MAX_AGE'], entry['OPTIONS']), (60, {'sslmode': 'require'}))
+        self.assertTrue(entry['CONN_HEALTH_CHECKS'])
+        self.assertEqual(self.pool_mode(entry), 'persistent')
+
+    def test_no_pooling(self):
+        entry = self.database_settings('none')
+        self.assertEqual((entry['CONN_MAX_AGE'], entry['OPTIONS']), (0, {'sslmode': 'require'}))
+        self.assertEqual(self.pool_mode(entry), 'none')
+
+
+class ScriptedTransport(FakeTransport):
+    """FakeTransport that first plays ``script``: status codes or httpx exception classes."""
+    script = []
+    in_flight = peak = 0
+
+    async def handle_async_request(self, request):
+        cls = ScriptedTransport
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            if cls.script:
+                outcome = cls.script.pop(0)
+                if isinstance(outcome, type):
+                    raise outcome('scripted failure', request=request)
+                return httpx.Response(outcome, json={'message': 'scripted'})
+            return await super().handle_async_request(request)
+        finally:
+            cls.in_flight -= 1
+
+
+class SupabaseRestClientTests(SimpleTestCase):
+    transport = 'customer.tests.ScriptedTransport'
+
+    def setUp(self):
+        ScriptedTransport.reset()
+        ScriptedTransport.script = []
+        ScriptedTransport.peak = 0
+
+    def rest_client(self, **config):
+        config = {**supabase_client.get_config(), 'TRANSPORT': self.transport, 'BACKOFF_BASE': 0, **config}
+        return supabase_client.AsyncRestClient('http://supabase.local', 'key', config)
+
+    async def test_retries_server_errors_and_timeouts(self):
+        client = self.rest_client(MAX_RETRIES=3)
+        ScriptedTransport.script = [502, httpx.ReadTimeout, httpx.ConnectError]
+        self.assertEqual(await client.select('products'), [])
+        self.assertEqual(client.stats, {'requests': 4, 'retries': 3, 'failures': 0})
+        await client.aclose()
+
+    async def test_gives_up_after_max_retries(self):
+        client = self.rest_client(MAX_RETRIES=2)
+        ScriptedTransport.script = [500, 500, 500, 500]
+        with self.assertRaises(supabase_client.SupabaseError) as raised:
+            await client.select('products')
+        self.assertEqual(raised.exception.status_code, 500)
+        self.assertEqual(client.stats, {'requests': 3, 'retries': 2, 'failures': 1})
+        # Client errors are not retried.
+        ScriptedTransport.script = [404]
+        with self.assertRaises(supabase_client.SupabaseError):
+            await client.select('products')
+        self.assertEqual(client.stats['requests'], 4)
+        await client.aclose()
+
+    async def test_inserts_retry_only_when_not_processed(self):
+        client = self.rest_client()
+        ScriptedTransport.script = [503, httpx.ConnectTimeout]
+        self.assertEqual(await client.insert('products', [{'name': 'Pear'}]), [{'name': 'Pear', 'id': 1}])
+        for outcome in (500, httpx.ReadTimeout):
+            with self.subTest(outcome=outcome):
+                ScriptedTransport.script = [outcome]
+                with self.assertRaises(supabase_client.SupabaseError):
+                    await client.insert('products', [{'name': 'Plum'}])
+        # Upserts are idempotent, so they retry like reads.
+        ScriptedTransport.script = [500]
+        await client.insert('products', [{'id': 1, 'name': 'Quince'}], upsert=True)
+        self.assertEqual(ScriptedTransport.tables['products'], [{'id': 1, 'name': 'Quince'}])
+        await client.aclose()
+
+    async def test_backoff(self):
+        client = self.rest_client(BACKOFF_BASE=0.2, BACKOFF_MAX=1.0)
+        with mock.patch('utils.supabase_client.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([client._backoff(attempt) for attempt in range(4)], [0.2, 0.4, 0.8, 1.0])
+        self.assertEqual(client._backoff(0, httpx.Response(429, headers={'Retry-After': '30'})), 1.0)
+        await client.aclose()
+
+    async def test_batches(self):
+        client = self.rest_client(BATCH_SIZE=3, MAX_CONCURRENCY=2)
+        ScriptedTransport.latency = 0.01
+        rows = [{'sku': f'P{i}', 'name': f'pear, {i}'} for i in range(7)]
+        inserted = await client.insert('products', rows)
+        self.assertEqual([row['sku'] for row in inserted], [row['sku'] for row in rows])
+        self.assertEqual(ScriptedTransport.requests, 3)
+
+        names = [row['name'] for row in rows]
+        found = await client.select_in('products', 'name', names + names[:2], columns='sku')
+        self.assertEqual(sorted(row['sku'] for row in found), sorted(row['sku'] for row in rows))
+        self.assertEqual(ScriptedTransport.requests, 6)
+        self.assertEqual(ScriptedTransport.peak, 2)
+        await client.aclose()
+
+    def test_one_client_per_event_loop(self):
+        async def clients():
+            first, second = get_async_client(), get_async_client()
+            await first.aclose()
+            return first, second
+
+        with override_settings(SUPABASE_CLIENT={**settings.SUPABASE_CLIENT, 'TRANSPORT': self.transport}):
+            first, second = asyncio.run(clients())
+            third, _ = asyncio.run(clients())
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+        self.assertIsInstance(first.transport, ScriptedTransport)
+
+    def test_import_does_not_load_sdks(self):
+        # Checked in a fresh interpreter: this process already imported httpx.
+        code = (
+            'import sys, django; django.setup(); import utils.supabase_client; '
+            'print(sorted({"httpx", "supabase"} & set(sys.modules)))'
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=os.environ.copy(),
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    @override_settings(SUPABASE_URL='', SUPABASE_KEY='')
+    def test_unconfigured(self):
+        async def client():
+            return get_async_client()
+
+        with override_settings(SUPABASE_CLIENT={**settings.SUPABASE_CLIENT, 'TRANSPORT': None}):
+            self.assertIsNone(asyncio.run(client()))
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Checkouts racing for the last units, each on its own connection."""
+    buyers = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('in-memory SQLite fails concurrent writers instead of making them wait')
+        owner = Customer.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        shop = Shop.objects.create(name='Green Grocer', owner=owner)
+        self.product = Product.objects.create(name='Apple', price='2.50', shop=shop, stock_quantity=5)
+        self.customers = [
+            Customer.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com', password='pw')
+            for i in range(self.buyers)
+        ]
+
+    def race(self, target, args_list):
+        """Run ``target(*args)`` for every entry of ``args_list`` at once; returns results or exceptions."""
+        start = threading.Barrier(len(args_list))
+        outcomes = [None] * len(args_list)
+
+        def run(i, args):
+            try:
+                start.wait()
+                outcomes[i] = target(*args)
+            except Exception as exc:
+                outcomes[i] = exc
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_stock_never_oversells(self):
+        outcomes = self.race(place_order, [
+            (customer, [{'product_id': self.product.pk, 'quantity': 2}]) for customer in self.customers
+        ])
+        placed = [outcome for outcome in outcomes if isinstance(outcome, Order)]
+        failed = [outcome for outcome in outcomes if not isinstance(outcome, Order)]
+
+        self.assertEqual(len(placed), 2)
+        self.assertTrue(all(isinstance(outcome, OutOfStockError) for outcome in failed), failed)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 1)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_cancel_releases_stock(self):
+        order = place_order(self.customers[0], [{'product_id': self.product.pk, 'quantity': 5}])
+        with self.assertRaises(OutOfStockError):
+            place_order(self.customers[1], [{'product_id': self.product.pk, 'quantity': 1}])
+
+        outcomes = self.race(cancel_order, [(Order.objects.get(pk=order.pk), self.customers[0]) for _ in range(4)])
+        # Only one of the racing cancels goes through, so the stock is released once.
+        self.assertEqual(sum(isinstance(outcome, Order) for outcome in outcomes), 1)
+        self.assertTrue(all(isinstance(outcome, (Order, CheckoutError)) for outcome in outcomes), outcomes)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+        place_order(self.customers[1], [{'product_id': self.product.pk, 'quantity': 5}])
@@ -0,0 +1,60 @@
+from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
+from . import views, async_views
+
+app_name = 'customer'
+
+urlpatterns = [
+    # Customer API endpoints
+    path('customers/', views.CustomerListCreateView.as_view(), name='customer-list-create'),
+    path('customers/<int:pk>/', views.CustomerDetailView.as_view(), name='customer-detail'),
+    path('customers/register/', views.CustomerRegistrationView.as_view(), name='customer-register'),
+    path('customers/login/', views.CustomerLoginView.as_view(), name='customer-login'),
+    path('customers/profile/', views.CustomerProfileView.as_view(), name='customer-profile'),
+    path('customers/token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    
+    # Order endpoints
+    path('orders/', views.OrderListCreateView.as_view(), name='order-list-create'),
+    path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('orders/<int:pk>/cancel/', views.OrderCancelView.as_view(), name='order-cancel'),
+    
+    # Product endpoints
+    path('products/', views.ProductListView.as_view(), name='product-list'),
+    path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('products/search/', views.ProductSearchView.as_view(), name='product-search'),
+    path('products/facets/', views.ProductFacetedSearchView.as_view(), name='product-facets'),
+    path('products/category/<slug:slug>/', views.ProductCategoryView.as_view(), name='product-category'),
+    
+    # Review endpoints
+    path('products/<int:pk>/reviews/', views.ProductReviewListCreateView.as_view(), name='product-review-list-create'),
+    path('reviews/<int:pk>/', views.ReviewDetailView.as_view(), name='review-detail'),
+    
+    # Category endpoints
+    path('categories/', views.CategoryTreeView.as_view(), name='category-tree'),
+    path('categories/<slug:slug>/', views.CategoryDetailView.as_view(), name='category-detail'),
+    
+    # Shop endpoints
+    path('shops/', views.ShopListView.as_view(), name='shop-list'),
+    path('shops/<int:pk>/', views.ShopDetailView.as_view(), name='shop-detail'),
+    path('shops/<int:pk>/products/', views.ShopProductsView.as_view(), name='shop-products'),
+    
+    # Cart endpoints
+    path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/add/', views.CartAddItemView.as_view(), name='cart-add-item'),
+    path('cart/remove/<int:pk>/', views.CartRemoveItemView.as_view(), name='cart-remove-item'),
+    path('cart/update/<int:pk>/', views.CartUpdateItemView.as_view(), name='cart-update-item'),
+    path('cart/clear/', views.CartClearView.as_view(), name='cart-clear'),
+    
+    # Async catalog endpoints (native async under ASGI)
+    path('async/products/', async_views.AsyncProductListView.as_view(), name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.AsyncProductDetailView.as_view(), name='async-product-detail'),
+    path('async/products/search/', async_views.AsyncProductSearchView.as_view(), name='async-product-search'),
+    path('async/shops/', async_views.AsyncShopListView.as_view(), name='async-shop-list'),
+    path('async/shops/<int:pk>/', async_views.AsyncShopDetailView.as_view(), name='async-shop-detail'),
+    path('async/shops/<int:pk>/products/', async_views.AsyncShopProductsView.as_view(), name='async-shop-products'),
+    
+    # Health check
+    path('health/', views.api_health_check, name='api-health-check'),
+    path('metrics/', views.api_metrics, name='api-metrics'),
+    path('health/database/', views.database_health_check, name='database-health-check'),
+]
@@ -2,14 +2,30 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate
-from django.db.models import Q
-from .models import Customer, Order, Product, Shop
+from django.db import IntegrityError, transaction
+from .models import Category, Customer, Order, Product, Review, Shop
 from .serializers import (
     CustomerSerializer, OrderSerializer, ProductSerializer, 
-    ShopSerializer, CustomerRegistrationSerializer
+    ShopSerializer, CustomerRegistrationSerializer,
+    NearbyShopSerializer, NearbyShopQuerySerializer,
+    CartSerializer, CartItemSerializer, CartItemQuantitySerializer,
+    OrderCreateSerializer, CategoryDetailSerializer, SearchSerializer,
+    ReviewSerializer
 )
+from .cart import check_stock, get_cart_store, render_cart
+from .checkout import CheckoutError, cancel_order, place_order
+from .search import search_products
+from . import categories, facets, geo
+from utils import metrics
+from utils.database import ReplicaReadMixin, database_stats
+from utils.fast_serializers import FastListMixin
+from utils.pagination import CatalogPagination
+from utils.query_planner import QueryPlanMixin
+from utils.response_cache import CachedResponseMixin
 
 # Customer Views
 class CustomerListCreateView(generics.ListCreateAPIView):
@@ -26,20 +42,25 @@ class CustomerRegistrationView(generics.CreateAPIView):
     queryset = Customer.objects.all()
     serializer_class = CustomerRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'auth'
 
 class CustomerLoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'auth'
     
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
         
         if email and password:
-            user = authenticate(email=email, password=password)
+            user = authenticate(request, email=email, password=password)
             if user:
                 serializer = CustomerSerializer(user)
+                refresh = RefreshToken.for_user(user)
                 return Response({
                     'user': serializer.data,
+                    'access': str(refresh.access_token),
+                    'refresh': str(refresh),
                     'message': 'Login successful'
                 })
             else:
@@ -59,17 +80,24 @@ class CustomerProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 # Order Views
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(QueryPlanMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CatalogPagination
     
     def get_queryset(self):
         return Order.objects.filter(customer=self.request.user)
     
-    def perform_create(self, serializer):
-        serializer.save(customer=self.request.user)
+    def create(self, request, *args, **kwargs):
+        serializer = OrderCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order = place_order(request.user, **serializer.validated_data)
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(QueryPlanMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -85,17 +113,19 @@ class OrderCancelView(generics.UpdateAPIView):
     
     def update(self, request, *args, **kwargs):
         order = self.get_object()
-        if order.status in ['pending', 'confirmed']:
-            order.status = 'cancelled'
-            order.save()
-            return Response({'message': 'Order cancelled successfully'})
-        return Response({'error': 'Order cannot be cancelled'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cancel_order(order, cancelled_by=request.user)
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': 'Order cancelled successfully'})
 
 # Product Views
-class ProductListView(generics.ListAPIView):
+class ProductListView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, FastListMixin, generics.ListAPIView):
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('product', 'shop', 'category')
+    pagination_class = CatalogPagination
     
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True)
@@ -103,56 +133,167 @@ class ProductListView(generics.ListAPIView):
         search = self.request.query_params.get('search', None)
         
         if category:
-            queryset = queryset.filter(category__name__icontains=category)
+            path = Category.objects.filter(slug=category).values_list('path', flat=True).first()
+            queryset = categories.subtree_products(queryset, path) if path else queryset.none()
         
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search) |
-                Q(shop__name__icontains=search)
-            )
+            queryset = search_products(queryset, search)
         
         return queryset
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, generics.RetrieveAPIView):
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('product', 'shop', 'category')
 
-class ProductSearchView(generics.ListAPIView):
+class ProductSearchView(ReplicaReadMixin, QueryPlanMixin, FastListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'search'
     
     def get_queryset(self):
         query = self.request.query_params.get('q', '')
         if query:
-            return Product.objects.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query) |
-                Q(shop__name__icontains=query),
-                is_active=True
-            )
+            return search_products(Product.objects.filter(is_active=True), query)
         return Product.objects.none()
 
-class ProductCategoryView(generics.ListAPIView):
+class ProductCategoryView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, FastListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('product', 'shop', 'category')
+    pagination_class = CatalogPagination
     
     def get_queryset(self):
-        category = self.kwargs.get('category')
-        return Product.objects.filter(
-            category__name__icontains=category,
-            is_active=True
+        category = get_object_or_404(Category.objects.only('path'), slug=self.kwargs['slug'])
+        return categories.subtree_products(Product.objects.filter(is_active=True), category.path)
+
+class ProductFacetedSearchView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, FastListMixin, generics.ListAPIView):
+    """
+    Products filtered by ``SearchSerializer`` parameters, plus facet counts
+    (category tree, shops, price buckets, stock) over every match. Facets are
+    cached per filter set, so paging and re-sorting reuse them.
+    """
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('product', 'shop', 'category')
+    pagination_class = CatalogPagination
+    # sort_by -> default sort_order; each ordering is backed by a product index.
+    sort_fields = {'created_at': 'desc', 'price': 'asc', 'name': 'asc', 'rating': 'desc'}
+
+    def initial(self, request, *args, **kwargs):
+        if request.query_params.get('query'):
+            self.throttle_scope = 'search'
+        super().initial(request, *args, **kwargs)
+        serializer = SearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        self.filters = serializer.validated_data
+
+        sort_by = self.filters.get('sort_by')
+        if sort_by is not None:
+            direction = self.filters.get('sort_order', self.sort_fields[sort_by])
+            prefix = '-' if direction == 'desc' else ''
+            self.paginator.ordering = (f'{prefix}{sort_by}', f'{prefix}id')
+
+    def get_queryset(self):
+        queryset = facets.filter_products(Product.objects.filter(is_active=True), self.filters)
+        if self.filters.get('sort_by'):
+            # An explicit sort replaces search relevance, so pages stay keyset.
+            queryset = queryset.order_by()
+        self.filtered_queryset = queryset
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = facets.facet_counts(self.filtered_queryset, self.filters)
+        return response
+
+# Review Views
+class ProductReviewListCreateView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, FastListMixin, generics.ListCreateAPIView):
+    """A product's reviews, newest first; customers post one review per product."""
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CatalogPagination
+    # Review writes bump the product namespace, since they change product ratings.
+    cache_namespaces = ('product',)
+
+    def get_queryset(self):
+        return Review.objects.filter(product_id=self.kwargs['pk'])
+
+    def perform_create(self, serializer):
+        product = get_object_or_404(Product.objects.only('pk'), pk=self.kwargs['pk'], is_active=True)
+        try:
+            # The review and its product's rating aggregates commit together.
+            with transaction.atomic():
+                serializer.save(product=product, customer=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'detail': 'You have already reviewed this product.'})
+
+class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Review.objects.filter(customer=self.request.user)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+# Category Views
+class CategoryTreeView(ReplicaReadMixin, CachedResponseMixin, APIView):
+    """The whole category tree with active product counts, for navigation menus."""
+    permission_classes = [permissions.AllowAny]
+    # Counts change with products.
+    cache_namespaces = ('category', 'product')
+
+    def get(self, request):
+        rows = Category.objects.order_by('path').values(
+            'id', 'parent_id', 'name', 'slug', 'product_count', 'total_product_count'
         )
+        return Response(categories.build_tree(rows))
+
+class CategoryDetailView(ReplicaReadMixin, CachedResponseMixin, generics.RetrieveAPIView):
+    queryset = Category.objects.all()
+    serializer_class = CategoryDetailSerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_field = 'slug'
+    cache_namespaces = ('category', 'product')
 
 # Shop Views
-class ShopListView(generics.ListAPIView):
+class ShopListView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, FastListMixin, generics.ListAPIView):
     queryset = Shop.objects.filter(is_active=True)
     serializer_class = ShopSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('shop',)
+    pagination_class = CatalogPagination
     
+    def is_nearby_query(self):
+        return 'lat' in self.request.query_params and 'lng' in self.request.query_params
+
+    def get_serializer_class(self):
+        if self.is_nearby_query():
+            return NearbyShopSerializer
+        return ShopSerializer
+
     def get_queryset(self):
         queryset = Shop.objects.filter(is_active=True)
+
+        # ?lat=..&lng=..&radius=.. (km): shops within radius, nearest first
+        if self.is_nearby_query():
+            params = NearbyShopQuerySerializer(data=self.request.query_params)
+            params.is_valid(raise_exception=True)
+            return geo.nearby(
+                queryset,
+                params.validated_data['lat'],
+                params.validated_data['lng'],
+                params.validated_data['radius'],
+            )
+
         location = self.request.query_params.get('location', None)
         
         if location:
@@ -160,54 +301,86 @@ class ShopListView(generics.ListAPIView):
         
         return queryset
 
-class ShopDetailView(generics.RetrieveAPIView):
+class ShopDetailView(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, generics.RetrieveAPIView):
     queryset = Shop.objects.filter(is_active=True)
     serializer_class = ShopSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('shop',)
 
-class ShopProductsView(generics.ListAPIView):
+class ShopProductsView(ReplicaReadMixin, QueryPlanMixin, FastListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogPagination
     
     def get_queryset(self):
         shop_id = self.kwargs.get('pk')
         return Product.objects.filter(shop_id=shop_id, is_active=True)
 
-# Cart Views (Simplified - you might want to use sessions or a separate cart model)
+# Cart Views
+def _cart_response(items, status_code=status.HTTP_200_OK):
+    return Response(CartSerializer(render_cart(items)).data, status=status_code)
+
 class CartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # This is a simplified cart implementation
-        # In a real app, you'd have a Cart model
-        return Response({'message': 'Cart functionality to be implemented'})
+        return _cart_response(get_cart_store().get(request.user.pk))
     
     def post(self, request):
-        return Response({'message': 'Cart functionality to be implemented'})
+        # Replace the whole cart
+        serializer = CartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = {}
+        for line in serializer.validated_data['items']:
+            items[line['product_id']] = items.get(line['product_id'], 0) + line['quantity']
+        try:
+            check_stock(items)
+            get_cart_store().save(request.user.pk, items)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return _cart_response(items)
 
 class CartAddItemView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        return Response({'message': 'Add to cart functionality to be implemented'})
+        serializer = CartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            items = get_cart_store().add(
+                request.user.pk, serializer.validated_data['product_id'], serializer.validated_data['quantity']
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return _cart_response(items, status.HTTP_201_CREATED)
 
 class CartRemoveItemView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def delete(self, request, pk):
-        return Response({'message': 'Remove from cart functionality to be implemented'})
+        items = get_cart_store().remove(request.user.pk, pk)
+        return _cart_response(items)
 
 class CartUpdateItemView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def put(self, request, pk):
-        return Response({'message': 'Update cart functionality to be implemented'})
+        serializer = CartItemQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            items = get_cart_store().set_quantity(request.user.pk, pk, serializer.validated_data['quantity'])
+        except KeyError:
+            return Response({'error': 'Product is not in the cart'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return _cart_response(items)
 
 class CartClearView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def delete(self, request):
-        return Response({'message': 'Clear cart functionality to be implemented'})
+        items = get_cart_store().clear(request.user.pk)
+        return _cart_response(items)
 
 # API Health Check
 @api_view(['GET'])
@@ -218,3 +391,24 @@ def api_health_check(request):
         'message': 'LocalBazar API is running',
         'version': '1.0.0'
     })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def api_metrics(request):
+    # Figures are per process; ?reset=true starts a new window.
+    data = metrics.snapshot()
+    if request.query_params.get('reset') == 'true':
+        metrics.reset()
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def database_health_check(request):
+    databases = database_stats(check=True)
+    healthy = all(db['status'] == 'healthy' for db in databases.values())
+    return Response(
+        {'status': 'healthy' if healthy else 'unhealthy', 'databases': databases},
+        status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
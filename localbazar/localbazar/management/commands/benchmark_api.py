@@ -0,0 +1,460 @@
+"""
+Django management command to load test the REST API.
+
+Drives the catalog, search, facet, order and cart endpoints with ``--concurrency``
+clients, one scenario at a time, and reports throughput, latency
+percentiles (p50/p95/p99) and SQL queries per request for each scenario and
+each endpoint in it. Run ``seed_benchmark_data`` first: scenarios sample
+its products, shops and categories, and log in as its customers.
+
+By default requests go through Django's test client in this process, with
+throttling lifted, so no server is needed. With ``--base-url`` they go over
+HTTP (one keep-alive connection per client) to a server running on this
+box against the same database, e.g. gunicorn or uvicorn. Raise the
+``THROTTLE_*_RATE`` settings of that server first, or its 429s count as
+errors. Query counts are read from the ``Server-Timing`` header, so they
+are only reported when the server has ``SERVER_TIMING`` on.
+
+Results can be written as JSON and compared with a saved baseline: the
+command fails when a scenario's p95 latency, throughput or queries per
+request regressed by more than ``--max-regression`` percent, or when its
+error rate is above ``--max-error-rate`` percent.
+"""
+
+import http.client
+import json
+import math
+import random
+import re
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from customer.models import Category, Customer, Order, Product, Shop
+from localbazar.management.commands.seed_benchmark_data import BENCHMARK_EMAIL_DOMAIN
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Dataset:
+    """What the scenarios pick from, sampled once per run."""
+
+    def __init__(self, rng, sample_size, clients):
+        product_ids = list(Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+        if not product_ids:
+            raise CommandError('No products to benchmark with; run seed_benchmark_data first')
+        sample = rng.sample(product_ids, min(sample_size, len(product_ids)))
+        rows = Product.objects.filter(pk__in=sample).order_by('pk').values_list('pk', 'name', 'stock_quantity')
+
+        self.product_ids = []
+        # Enough stock that orders and carts are not rejected mid-run.
+        self.in_stock_ids = []
+        words = set()
+        for product_id, name, stock in rows:
+            self.product_ids.append(product_id)
+            if stock >= 20:
+                self.in_stock_ids.append(product_id)
+            words.update(word.lower() for word in re.findall(r'[^\W\d_]{3,}', name))
+        self.shop_ids = list(Shop.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+        self.categories = list(Category.objects.order_by('path').values_list('slug', flat=True))
+        self.search_terms = sorted(words)
+
+        customers = list(
+            Customer.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}', is_active=True).order_by('pk')[:clients]
+        )
+        # Minted directly: logging in would hash a password per client and hit the auth throttle.
+        self.tokens = [str(RefreshToken.for_user(customer).access_token) for customer in customers]
+
+    def counts(self):
+        return {
+            'products': Product.objects.count(),
+            'shops': Shop.objects.count(),
+            'categories': Category.objects.count(),
+            'customers': Customer.objects.count(),
+            'orders': Order.objects.count(),
+        }
+
+
+def misspell(rng, term):
+    """Swap two adjacent letters, as a user typing fast would."""
+    if len(term) < 4:
+        return term
+    index = rng.randrange(1, len(term) - 2)
+    return term[:index] + term[index + 1] + term[index] + term[index + 2:]
+
+
+# Each scenario returns (endpoint, method, path, JSON body) for a client's
+# next request. ``state`` is the client's own: its cart, for example.
+
+def catalog_request(rng, data, state):
+    roll = rng.random()
+    if roll < 0.3:
+        return 'GET api/products/', 'GET', '/api/products/', None
+    if roll < 0.6:
+        return 'GET api/products/<int:pk>/', 'GET', f'/api/products/{rng.choice(data.product_ids)}/', None
+    if roll < 0.75 and data.shop_ids:
+        path = f'/api/shops/{rng.choice(data.shop_ids)}/products/'
+        return 'GET api/shops/<int:pk>/products/', 'GET', path, None
+    if roll < 0.85 and data.categories:
+        path = f'/api/products/category/{rng.choice(data.categories)}/'
+        return 'GET api/products/category/<slug:slug>/', 'GET', path, None
+    if roll < 0.92:
+        return 'GET api/categories/', 'GET', '/api/categories/', None
+    return 'GET api/shops/', 'GET', '/api/shops/', None
+
+
+def search_request(rng, data, state):
+    terms = rng.sample(data.search_terms, min(len(data.search_terms), rng.choice([1, 1, 2])))
+    if rng.random() < 0.2:
+        terms[0] = misspell(rng, terms[0])
+    return 'GET api/products/search/', 'GET', '/api/products/search/?' + urlencode({'q': ' '.join(terms)}), None
+
+
+def facet_request(rng, data, state):
+    params = {'sort_by': rng.choice(['created_at', 'price', 'name', 'rating'])}
+    if data.categories and rng.random() < 0.6:
+        params['category'] = rng.choice(data.categories)
+    if rng.random() < 0.4:
+        low = rng.choice([0, 100, 500, 1000])
+        params.update(min_price=low, max_price=low * 4 + 100)
+    if rng.random() < 0.3:
+        params['in_stock'] = 'true'
+    if rng.random() < 0.2:
+        params['query'] = rng.choice(data.search_terms)
+    return 'GET api/products/facets/', 'GET', '/api/products/facets/?' + urlencode(params), None
+
+
+def order_request(rng, data, state):
+    if rng.random() < 0.75:
+        return 'GET api/orders/', 'GET', '/api/orders/', None
+    items = [
+        {'product_id': product_id, 'quantity': 1}
+        for product_id in rng.sample(data.in_stock_ids, min(len(data.in_stock_ids), rng.randint(1, 3)))
+    ]
+    return 'POST api/orders/', 'POST', '/api/orders/', {'items': items, 'payment_method': 'cash'}
+
+
+def cart_request(rng, data, state):
+    cart = state.setdefault('cart', set())
+    roll = rng.random()
+    if len(cart) >= 20 or (cart and roll < 0.1):
+        cart.clear()
+        return 'DELETE api/cart/clear/', 'DELETE', '/api/cart/clear/', None
+    if cart and roll < 0.25:
+        product_id = rng.choice(sorted(cart))
+        path = f'/api/cart/update/{product_id}/'
+        return 'PUT api/cart/update/<int:pk>/', 'PUT', path, {'quantity': rng.randint(1, 3)}
+    if roll < 0.55:
+        return 'GET api/cart/', 'GET', '/api/cart/', None
+    product_id = rng.choice(data.in_stock_ids)
+    cart.add(product_id)
+    return 'POST api/cart/add/', 'POST', '/api/cart/add/', {'product_id': product_id, 'quantity': 1}
+
+
+SCENARIOS = {
+    'catalog': (catalog_request, False),
+    'search': (search_request, False),
+    'facets': (facet_request, False),
+    'orders': (order_request, True),
+    'cart': (cart_request, True),
+}
+
+
+class ClientTransport:
+    """Requests through the Django test client, in this process."""
+
+    def __init__(self, host):
+        self.client = Client(HTTP_HOST=host, raise_request_exception=False)
+
+    def request(self, method, path, body, headers):
+        response = self.client.generic(
+            method, path, json.dumps(body) if body is not None else '',
+            content_type='application/json', headers=headers,
+        )
+        return response.status_code, response.get('Server-Timing', '')
+
+    def close(self):
+        # Each client thread has its own connection.
+        connection.close()
+
+
+class HTTPTransport:
+    """Requests over one keep-alive HTTP connection to a running server."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+
+    def request(self, method, path, body, headers):
+        headers = dict(headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnects on the next request; 0 counts as an error.
+            self.connection.close()
+            return 0, ''
+        return response.status, response.getheader('Server-Timing', '')
+
+    def close(self):
+        self.connection.close()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Figures for ``samples`` of (endpoint, latency ms, status, queries) taken over ``elapsed`` seconds."""
+    latencies = sorted(sample[1] for sample in samples)
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[2])] = statuses.get(str(sample[2]), 0) + 1
+    errors = sum(1 for sample in samples if not 200 <= sample[2] < 400)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    count = len(samples)
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / count * 100, 2) if count else 0.0,
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / count, 2) if count else 0.0,
+            'p50': round(percentile(latencies, 0.5), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Load test the catalog, search, order and cart endpoints with concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS),
+            help='Scenario to run (repeatable, default: all)',
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=15.0, help='Seconds to run each scenario')
+        parser.add_argument(
+            '--requests', type=int,
+            help='Requests per scenario instead of --duration (split across clients)',
+        )
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per client before each scenario')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the request mix')
+        parser.add_argument('--sample-size', type=int, default=5000, help='Products to sample requests from')
+        parser.add_argument('--base-url', help='Load test a running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare with a JSON file written by --output')
+        parser.add_argument(
+            '--max-regression', type=float, default=20.0,
+            help='Fail when p95 latency, throughput or queries/request are this many percent worse than the baseline',
+        )
+        parser.add_argument(
+            '--max-error-rate', type=float, default=1.0,
+            help='Fail when more than this percentage of a scenario\'s requests fail',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        names = options['scenario'] or list(SCENARIOS)
+        rng = random.Random(options['seed'])
+        data = Dataset(rng, options['sample_size'], options['concurrency'])
+        if any(SCENARIOS[name][1] for name in names) and not data.tokens:
+            raise CommandError('No benchmark customers to log in as; run seed_benchmark_data first')
+        if not data.in_stock_ids and {'orders', 'cart'} & set(names):
+            raise CommandError('No sampled product has stock to order; seed more products')
+        if not data.search_terms and {'search', 'facets'} & set(names):
+            raise CommandError('No product names to build search terms from')
+
+        mode = 'http' if options['base_url'] else 'in-process'
+        results = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'mode': mode,
+                'base_url': options['base_url'],
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+                'concurrency': options['concurrency'],
+                'duration': None if options['requests'] else options['duration'],
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'dataset': data.counts(),
+            },
+            'scenarios': {},
+        }
+        self.stdout.write(
+            f"🚦 {mode} against {options['base_url'] or connection.vendor}, "
+            f"{options['concurrency']} clients, dataset {results['meta']['dataset']}"
+        )
+        if settings.DEBUG and not options['base_url']:
+            self.stdout.write(self.style.WARNING('   DEBUG is on: every query is logged, so figures are pessimistic'))
+
+        for name in names:
+            results['scenarios'][name] = self.run_scenario(name, data, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        failures = [
+            name for name, result in results['scenarios'].items()
+            if result['error_rate'] > options['max_error_rate']
+        ]
+        if options['baseline']:
+            failures.extend(self.compare(results, options['baseline'], options['max_regression']))
+        if failures:
+            raise CommandError(f'Benchmark failed for: {", ".join(sorted(set(failures)))}')
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
+
+    def transport(self, options):
+        if options['base_url']:
+            return HTTPTransport(options['base_url'])
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+        return ClientTransport(hosts[0] if hosts else 'localhost')
+
+    def run_scenario(self, name, data, options):
+        make_request, authenticated = SCENARIOS[name]
+        concurrency = options['concurrency']
+        self.stdout.write(self.style.HTTP_INFO(f'\n{name}:'))
+
+        samples = [[] for _ in range(concurrency)]
+        failures = []
+        window = {}
+
+        def start_clock():
+            window['started'] = time.perf_counter()
+            window['deadline'] = window['started'] + options['duration']
+
+        # Every client finishes its warmup before the clock starts.
+        barrier = threading.Barrier(concurrency, action=start_clock)
+
+        def client(index):
+            rng = random.Random(f"{options['seed']}:{name}:{index}")
+            headers = {}
+            if authenticated:
+                headers['Authorization'] = f'Bearer {data.tokens[index % len(data.tokens)]}'
+            state = {}
+            transport = self.transport(options)
+            try:
+                for _ in range(options['warmup']):
+                    _, method, path, body = make_request(rng, data, state)
+                    transport.request(method, path, body, headers)
+                barrier.wait()
+                count = None
+                if options['requests']:
+                    count = options['requests'] // concurrency + (index < options['requests'] % concurrency)
+                while len(samples[index]) < count if count is not None else time.perf_counter() < window['deadline']:
+                    endpoint, method, path, body = make_request(rng, data, state)
+                    started = time.perf_counter()
+                    status, server_timing = transport.request(method, path, body, headers)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    match = SERVER_TIMING_QUERIES.search(server_timing)
+                    samples[index].append((endpoint, elapsed_ms, status, int(match.group(1)) if match else None))
+            except BaseException as e:
+                # Release the other clients from the barrier instead of hanging.
+                failures.append(e)
+                barrier.abort()
+            finally:
+                transport.close()
+
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': [], 'DEFAULT_THROTTLE_RATES': {}}
+        instrumentation = {**getattr(settings, 'INSTRUMENTATION', {}), 'ENABLED': True, 'SERVER_TIMING': True}
+        with override_settings(REST_FRAMEWORK=rest_framework, INSTRUMENTATION=instrumentation):
+            threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        errors = [e for e in failures if not isinstance(e, threading.BrokenBarrierError)]
+        if errors or failures:
+            raise CommandError(f'{name} client failed: {(errors or failures)[0]!r}')
+        elapsed = time.perf_counter() - window['started']
+
+        all_samples = [sample for client_samples in samples for sample in client_samples]
+        result = summarize(all_samples, elapsed)
+        by_endpoint = {}
+        for sample in all_samples:
+            by_endpoint.setdefault(sample[0], []).append(sample)
+        result['endpoints'] = {
+            endpoint: summarize(endpoint_samples, elapsed) for endpoint, endpoint_samples in sorted(by_endpoint.items())
+        }
+
+        self.write_line(name, result, bold=True)
+        for endpoint, endpoint_result in result['endpoints'].items():
+            self.write_line(f'  {endpoint}', endpoint_result)
+        return result
+
+    def write_line(self, label, result, bold=False):
+        latency = result['latency_ms']
+        queries = result['queries_per_request']
+        line = (
+            f"   {label:<46} {result['requests']:>7} req {result['throughput_rps']:>8.1f}/s  "
+            f"p50 {latency['p50']:>7.1f}  p95 {latency['p95']:>7.1f}  p99 {latency['p99']:>7.1f} ms  "
+            f"{'-' if queries is None else f'{queries:g}':>5} q/req  {result['error_rate']:g}% errors"
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(line) if bold else line)
+
+    def compare(self, results, baseline_path, max_regression):
+        """Report changes against the baseline; returns the scenarios that regressed."""
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        self.stdout.write(self.style.HTTP_INFO(f'\nCompared with {baseline_path}:'))
+        for key in ('mode', 'database', 'concurrency'):
+            if baseline['meta'].get(key) != results['meta'][key]:
+                self.stdout.write(self.style.WARNING(
+                    f"   {key} differs: {baseline['meta'].get(key)} -> {results['meta'][key]}; figures may not compare"
+                ))
+        # The orders scenario adds orders, so counts drift a little between runs.
+        for table, count in results['meta']['dataset'].items():
+            old = baseline['meta'].get('dataset', {}).get(table)
+            if old is None or abs(count - old) > 0.1 * max(old, 1):
+                self.stdout.write(self.style.WARNING(
+                    f'   {table} differs: {old} -> {count} rows; figures may not compare'
+                ))
+
+        regressions = []
+        for name, result in results['scenarios'].items():
+            before = baseline['scenarios'].get(name)
+            if before is None:
+                continue
+            # (label, before, after, True if higher is worse)
+            checks = [
+                ('p95', before['latency_ms']['p95'], result['latency_ms']['p95'], True),
+                ('throughput', before['throughput_rps'], result['throughput_rps'], False),
+                ('queries/request', before['queries_per_request'], result['queries_per_request'], True),
+            ]
+            for label, old, new, higher_is_worse in checks:
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                line = f'   {name} {label}: {old:g} -> {new:g} ({change:+.1f}%)'
+                if (change if higher_is_worse else -change) > max_regression:
+                    regressions.append(name)
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(self.style.SUCCESS(line))
+        return regressions
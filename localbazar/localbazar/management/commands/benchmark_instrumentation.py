@@ -0,0 +1,104 @@
+"""
+Django management command to measure the overhead of InstrumentationMiddleware.
+
+End-to-end A/B timings of a whole request are noisier than the overhead
+being measured, so the middleware's own costs are timed in isolation:
+
+* its fixed per-request work (context, histogram, Server-Timing header),
+  around a view that does nothing,
+* the SQL execute wrapper, per query,
+* the serialize/render phase timers, per phase.
+
+These are then expressed as a share of the median latency of a real
+endpoint (``--path``) with its query and phase counts, as seen through the
+full middleware stack. Throttling is lifted for the run.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import resolve
+
+from utils import metrics
+
+
+def per_call(func, count, repeat=5):
+    """Best-of-``repeat`` seconds per call of ``func``."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(count):
+            func()
+        timings.append((time.perf_counter() - started) / count)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request overhead of the instrumentation middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/products/?_=benchmark', help='Request path')
+        parser.add_argument('--requests', type=int, default=300, help='Requests to time the endpoint with')
+        parser.add_argument('--max-overhead', type=float, default=1.0, help='Fail above this many percent')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+        host = hosts[0] if hosts else 'localhost'
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': [], 'DEFAULT_THROTTLE_RATES': {}}
+
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            client = Client(HTTP_HOST=host)
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            metrics.reset()
+            latency = per_call(lambda: client.get(path), options['requests'], repeat=3)
+            route = metrics.snapshot()['routes'][metrics.route_name(response.wsgi_request)]
+            queries = route['sql']['queries_per_request']
+            # Cached responses, for example, skip serializing and rendering.
+            phases = len(route['phases_ms_per_request'])
+
+        # Fixed cost: the middleware around a view that does nothing.
+        request = RequestFactory().get(path, HTTP_HOST=host)
+        request.resolver_match = resolve(request.path)
+        bare = per_call(lambda: HttpResponse(), 20000)
+        middleware = metrics.InstrumentationMiddleware(lambda request: HttpResponse())
+        with override_settings(INSTRUMENTATION={**metrics.get_config(), 'PROFILE_SAMPLE_RATE': 0}):
+            fixed = per_call(lambda: middleware(request), 20000) - bare
+
+        # Per query: the execute wrapper with a request in progress.
+        metrics.install_sql_wrapper(connection=connection)
+
+        def query():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        plain = per_call(query, 5000)
+        token = metrics._current.set(metrics.RequestStats())
+        try:
+            wrapped = per_call(query, 5000)
+
+            def timed_phase():
+                with metrics.phase('serialize'):
+                    pass
+            per_phase = per_call(timed_phase, 20000)
+        finally:
+            metrics._current.reset(token)
+        per_query = max(0.0, wrapped - plain)
+
+        overhead = fixed + per_phase * phases + per_query * queries
+        share = overhead / latency * 100
+        self.stdout.write(
+            f'📊 {path}: {latency * 1e6:.1f} µs/request, {queries:g} queries and {phases} timed phases/request'
+        )
+        self.stdout.write(f'   Middleware fixed cost:  {fixed * 1e6:6.2f} µs/request')
+        self.stdout.write(f'   Phase timer:            {per_phase * 1e6:6.2f} µs/phase')
+        self.stdout.write(f'   SQL wrapper:            {per_query * 1e6:6.2f} µs/query')
+        self.stdout.write(f'   Total overhead:         {overhead * 1e6:6.2f} µs/request ({share:.2f}%)')
+        if share > options['max_overhead']:
+            raise CommandError(f"Overhead {share:.2f}% is above {options['max_overhead']}%")
+        self.stdout.write(self.style.SUCCESS(f"✓ Overhead within {options['max_overhead']}%"))
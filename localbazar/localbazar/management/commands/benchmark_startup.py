@@ -0,0 +1,126 @@
+"""
+Django management command to benchmark cold-start time.
+
+Each scenario runs in fresh interpreters (``manage.py check``, importing the
+WSGI application, importing the ASGI application). Wall time is measured
+over several runs; one extra run with ``python -X importtime`` lists the
+slowest imports. Results can be saved as JSON and compared with a saved
+baseline to catch startup regressions.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SCENARIOS = {
+    'check': [os.path.join(settings.BASE_DIR, 'manage.py'), 'check'],
+    'wsgi': ['-c', 'from localbazar.wsgi import application'],
+    'asgi': ['-c', 'from localbazar.asgi import application'],
+}
+
+
+def parse_importtime(stderr, top):
+    """Return the ``top`` slowest imports as ``(cumulative_ms, module)``."""
+    imports = []
+    total_ms = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative) / 1000, module.strip()))
+        # Nested imports are indented and already counted in their parent.
+        if not module.startswith('  '):
+            total_ms += int(cumulative) / 1000
+    return sorted(imports, reverse=True)[:top], len(imports), total_ms
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start time of manage.py check, WSGI boot and ASGI boot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per scenario')
+        parser.add_argument('--top', type=int, default=10, help='Slowest imports to list per scenario')
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS),
+            help='Scenario to run (repeatable, default: all)',
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare with a JSON file written by --output')
+        parser.add_argument(
+            '--max-regression', type=float, default=20.0,
+            help='Fail when a median is this many percent slower than the baseline',
+        )
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'localbazar.settings')}
+        results = {}
+        for name in options['scenario'] or sorted(SCENARIOS):
+            results[name] = self.measure(name, SCENARIOS[name], env, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['max_regression'])
+
+    def run(self, argv, env, importtime=False):
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + argv
+        started = time.perf_counter()
+        process = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if process.returncode != 0:
+            raise CommandError(f'{" ".join(argv)} failed:\n{process.stderr[-2000:]}')
+        return elapsed, process.stderr
+
+    def measure(self, name, argv, env, options):
+        self.stdout.write(self.style.HTTP_INFO(f'\n{name}: {" ".join(argv)}'))
+        # Warm the OS file cache and .pyc files so runs are comparable.
+        self.run(argv, env)
+        timings = [self.run(argv, env)[0] * 1000 for _ in range(options['runs'])]
+        _, stderr = self.run(argv, env, importtime=True)
+        slowest, module_count, import_ms = parse_importtime(stderr, options['top'])
+
+        result = {
+            'median_ms': round(statistics.median(timings), 1),
+            'min_ms': round(min(timings), 1),
+            'max_ms': round(max(timings), 1),
+            'modules': module_count,
+            'import_ms': round(import_ms, 1),
+            'slowest_imports': [{'module': module, 'cumulative_ms': round(ms, 1)} for ms, module in slowest],
+        }
+        self.stdout.write(
+            f"   Wall time: median {result['median_ms']} ms "
+            f"(min {result['min_ms']}, max {result['max_ms']}) over {options['runs']} runs"
+        )
+        self.stdout.write(f"   Imports: {module_count} modules, {result['import_ms']} ms")
+        for entry in result['slowest_imports']:
+            self.stdout.write(f"   {entry['cumulative_ms']:>8.1f} ms  {entry['module']}")
+        return result
+
+    def compare(self, results, baseline_path, max_regression):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        self.stdout.write(self.style.HTTP_INFO(f'\nCompared with {baseline_path}:'))
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before, after = baseline[name]['median_ms'], result['median_ms']
+            change = (after - before) / before * 100 if before else 0
+            line = f'   {name}: {before} ms -> {after} ms ({change:+.1f}%)'
+            if change > max_regression:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        if regressions:
+            raise CommandError(f'Startup regressed by more than {max_regression}%: {", ".join(regressions)}')
@@ -0,0 +1,96 @@
+"""
+Django management command to load test the async Supabase client.
+
+By default it runs against the in-memory fake transport, so batching,
+concurrency limits and retries can be measured without a live project.
+"""
+
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.supabase_client import AsyncRestClient, SupabaseError, get_config
+from utils.supabase_fake import FakeTransport
+
+
+class Command(BaseCommand):
+    help = 'Load test the async Supabase client (bulk inserts and batched reads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=50, help='Concurrent workers')
+        parser.add_argument('--iterations', type=int, default=10, help='Insert + read rounds per worker')
+        parser.add_argument('--rows', type=int, default=200, help='Rows inserted per round')
+        parser.add_argument('--latency', type=float, default=0.01, help='Fake per-request latency in seconds')
+        parser.add_argument('--failure-rate', type=float, default=0.05, help='Fake share of requests answered with 503')
+        parser.add_argument('--table', default='load_test_rows', help='Table to write to')
+        parser.add_argument('--live', action='store_true', help='Use the configured Supabase project instead of the fake')
+
+    def handle(self, *args, **options):
+        config = get_config()
+        if options['live']:
+            if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+                raise CommandError('SUPABASE_URL and SUPABASE_KEY must be set for --live')
+            url, key = settings.SUPABASE_URL, settings.SUPABASE_KEY
+            config['TRANSPORT'] = None
+        else:
+            url, key = 'http://supabase.local', 'fake-key'
+            config['TRANSPORT'] = 'utils.supabase_fake.FakeTransport'
+            FakeTransport.reset(latency=options['latency'], failure_rate=options['failure_rate'])
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f"Load testing Supabase client ({'live' if options['live'] else 'fake'}): "
+            f"{options['tasks']} workers x {options['iterations']} rounds x {options['rows']} rows"
+        ))
+        latencies, errors, stats, elapsed = asyncio.run(self.run(url, key, config, options))
+
+        rounds = len(latencies)
+        self.stdout.write(f'   Rounds: {rounds} ok, {errors} failed in {elapsed:.2f}s')
+        if latencies:
+            latencies.sort()
+            p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+            self.stdout.write(
+                f'   Round latency: p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms'
+            )
+            self.stdout.write(f"   Throughput: {rounds * options['rows'] / elapsed:.0f} rows/s written and read")
+        self.stdout.write(
+            f"   Requests: {stats['requests']}, retries: {stats['retries']}, failures: {stats['failures']}"
+        )
+        if errors:
+            raise CommandError(f'{errors} rounds failed')
+        self.stdout.write(self.style.SUCCESS('Supabase client load test completed!'))
+
+    async def run(self, url, key, config, options):
+        client = AsyncRestClient(url, key, config)
+        run_id = uuid.uuid4().hex[:8]
+        latencies = []
+        errors = 0
+
+        async def worker(worker_id):
+            nonlocal errors
+            for iteration in range(options['iterations']):
+                keys = [f'{run_id}-{worker_id}-{iteration}-{n}' for n in range(options['rows'])]
+                started = time.perf_counter()
+                try:
+                    await client.insert(
+                        options['table'], [{'key': k, 'value': n} for n, k in enumerate(keys)],
+                        upsert=True, on_conflict='key', returning=False,
+                    )
+                    rows = await client.select_in(options['table'], 'key', keys, columns='key,value')
+                    if len(rows) != len(keys):
+                        raise SupabaseError(f'Read back {len(rows)} of {len(keys)} rows')
+                except SupabaseError as e:
+                    errors += 1
+                    self.stderr.write(f'   ✗ Worker {worker_id}: {e}')
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker(n) for n in range(options['tasks'])))
+        finally:
+            await client.aclose()
+        return latencies, errors, client.stats, time.perf_counter() - started
@@ -0,0 +1,288 @@
+"""
+Django management command to seed a synthetic dataset for load testing.
+
+Creates a category tree, shops, customers, products and a history of
+orders with ``bulk_create`` in batches (one transaction per batch), then
+builds what the model signals would have built row by row: search
+documents, category paths and counts, the order index, status history and
+the seller sales rollups. The data is generated
+from ``--seed``, so two runs with the same options produce the same dataset
+and benchmark results stay comparable.
+
+Everything seeded is marked (``BENCHMARK_MARKER`` descriptions, customers
+at ``BENCHMARK_EMAIL_DOMAIN``) so ``--flush`` can remove it again. The
+customers share the password ``--password``; ``benchmark_api`` logs in as
+them.
+"""
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from customer import geo
+from customer.categories import rebuild as rebuild_category_tree, unique_slugs
+from customer.checkout import index_orders
+from customer.models import Category, Customer, Order, OrderStatusHistory, Product, Shop
+from customer.search import index_products
+from seller.rollups import rebuild_rollups
+from utils import response_cache
+
+BENCHMARK_MARKER = 'Synthetic benchmark data'
+BENCHMARK_EMAIL_DOMAIN = 'benchmark.localbazar.invalid'
+
+# Top-level departments and the categories under them.
+DEPARTMENTS = {
+    'Groceries': [
+        'Vegetables', 'Fruits', 'Dairy', 'Bakery', 'Spices', 'Grains and Pulses', 'Snacks', 'Beverages',
+        'Tea', 'Coffee', 'Honey', 'Pickles', 'Sweets', 'Meat and Fish',
+    ],
+    'Crafts and Home': ['Handicrafts', 'Textiles', 'Pottery', 'Home Decor', 'Kitchenware', 'Toys', 'Stationery'],
+    'Fashion': ['Jewelry', 'Footwear', 'Clothing'],
+    'Health and Beauty': ['Personal Care', 'Herbal Remedies'],
+    'Garden': ['Flowers', 'Plants'],
+    'Tools and Electronics': ['Hardware', 'Electronics'],
+}
+CATEGORIES = [(name, department) for department, names in DEPARTMENTS.items() for name in names]
+ADJECTIVES = [
+    'Fresh', 'Organic', 'Handmade', 'Local', 'Premium', 'Classic', 'Spicy', 'Sweet', 'Roasted',
+    'Wild', 'Golden', 'Green', 'Red', 'Rustic', 'Woven', 'Painted', 'Carved', 'Hand-dyed',
+    'Small-batch', 'Traditional', 'Mountain', 'Valley', 'Village', 'Heritage', 'Everyday',
+]
+NOUNS = [
+    'Tomatoes', 'Potatoes', 'Spinach', 'Mangoes', 'Apples', 'Bananas', 'Yogurt', 'Cheese', 'Butter',
+    'Bread', 'Cookies', 'Turmeric', 'Cumin', 'Chili Powder', 'Lentils', 'Rice', 'Millet', 'Chips',
+    'Juice', 'Black Tea', 'Green Tea', 'Coffee Beans', 'Honey', 'Mango Pickle', 'Laddu', 'Shawl',
+    'Scarf', 'Blanket', 'Vase', 'Bowl', 'Mug', 'Necklace', 'Earrings', 'Lamp', 'Cushion Cover',
+    'Spoon Set', 'Wooden Toy', 'Notebook', 'Soap', 'Hair Oil', 'Sandals', 'Kurta', 'Marigolds',
+    'Tulsi Plant', 'Hammer', 'Flashlight',
+]
+SIZES = ['', '', '250g', '500g', '1kg', 'Pack of 2', 'Pack of 6', 'Large', 'Small']
+CITIES = [
+    ('Kathmandu', 27.7172, 85.3240), ('Pokhara', 28.2096, 83.9856), ('Lalitpur', 27.6644, 85.3188),
+    ('Delhi', 28.6139, 77.2090), ('Mumbai', 19.0760, 72.8777), ('Bengaluru', 12.9716, 77.5946),
+    ('Chennai', 13.0827, 80.2707), ('Dhaka', 23.8103, 90.4125),
+]
+# Share of orders per status; each status is reached through the state machine.
+ORDER_STATUSES = [('pending', 15), ('confirmed', 15), ('shipped', 15), ('delivered', 45), ('cancelled', 10)]
+STATUS_PATHS = {
+    'pending': ['pending'],
+    'confirmed': ['pending', 'confirmed'],
+    'shipped': ['pending', 'confirmed', 'shipped'],
+    'delivered': ['pending', 'confirmed', 'shipped', 'delivered'],
+    'cancelled': ['pending', 'cancelled'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Seed a reproducible synthetic dataset (shops, products, customers, orders) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=30, help='Categories to create under the departments')
+        parser.add_argument('--shops', type=int, default=500, help='Shops to create')
+        parser.add_argument('--products', type=int, default=200000, help='Products to create')
+        parser.add_argument('--customers', type=int, default=2000, help='Customers to create')
+        parser.add_argument('--orders', type=int, default=20000, help='Orders to create')
+        parser.add_argument('--days', type=int, default=90, help='Spread orders over this many past days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--password', default='benchmark-password', help='Password of the seeded customers')
+        parser.add_argument('--flush', action='store_true', help='Remove previously seeded data first')
+        parser.add_argument('--flush-only', action='store_true', help='Remove previously seeded data and stop')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to seed benchmark data with DEBUG off; pass --force if this is intended')
+        if options['flush'] or options['flush_only']:
+            self.flush(options['batch_size'])
+            if options['flush_only']:
+                return
+        if Customer.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').exists():
+            raise CommandError('Benchmark data is already seeded; pass --flush to replace it')
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        categories = self.seed_categories(options['categories'])
+        shops = self.seed_shops(rng, options['shops'])
+        customers = self.seed_customers(options['customers'], options['password'], options['batch_size'])
+        products = self.seed_products(rng, options['products'], shops, categories, options['batch_size'])
+        self.seed_orders(rng, options['orders'], options['days'], customers, products, options['batch_size'])
+
+        self.stdout.write('📈 Rebuilding category counts and sales rollups...')
+        rebuild_category_tree()
+        rebuild_rollups(shop_ids=shops)
+        self.invalidate_caches()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Benchmark data seeded in {time.perf_counter() - started:.1f}s (seed {options["seed"]})'
+        ))
+
+    def timed(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f'   {label}: {count} in {elapsed:.1f}s ({rate:.0f} rows/s)')
+
+    def flush(self, batch_size):
+        self.stdout.write('🧹 Removing previously seeded benchmark data...')
+        querysets = [
+            # Orders go with their customers.
+            Customer.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}'),
+            # Leaves first: parents are protected. Products lose their category
+            # in one UPDATE here instead of adjusting its counts one by one later.
+            Category.objects.filter(description=BENCHMARK_MARKER, children__isnull=True),
+            Product.objects.filter(shop__description=BENCHMARK_MARKER),
+            Shop.objects.filter(description=BENCHMARK_MARKER),
+        ]
+        for queryset in querysets:
+            deleted = 0
+            while True:
+                ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                with transaction.atomic():
+                    queryset.model.objects.filter(pk__in=ids).delete()
+                deleted += len(ids)
+            self.stdout.write(f'   {queryset.model._meta.verbose_name_plural}: {deleted} removed')
+        self.invalidate_caches()
+
+    def invalidate_caches(self):
+        # Bulk writes send no model signals, so cached catalog responses are stale.
+        for namespace in ('product', 'shop', 'category'):
+            response_cache.invalidate(namespace)
+
+    def seed_categories(self, count):
+        """Create ``count`` categories under their departments. Returns their ids."""
+        started = time.perf_counter()
+        leaves = []
+        for n in range(count):
+            name, department = CATEGORIES[n % len(CATEGORIES)]
+            leaves.append((f'{name} {n // len(CATEGORIES) + 1}' if n >= len(CATEGORIES) else name, department))
+        departments = sorted({department for _, department in leaves})
+
+        # Categories that already exist with the same name are used as they are.
+        ids = {}
+        for names, parents in [(departments, {}), ([name for name, _ in leaves], dict(leaves))]:
+            slugs = unique_slugs(names)
+            Category.objects.bulk_create([
+                Category(
+                    name=name, slug=slugs[name], parent_id=ids.get(parents.get(name)), description=BENCHMARK_MARKER,
+                )
+                for name in names
+            ], ignore_conflicts=True)
+            ids.update(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        self.timed('Categories', len(departments) + len(leaves), started)
+        return [ids[name] for name, _ in leaves]
+
+    def seed_shops(self, rng, count):
+        started = time.perf_counter()
+        shops = []
+        for n in range(count):
+            city, latitude, longitude = rng.choice(CITIES)
+            latitude += rng.uniform(-0.1, 0.1)
+            longitude += rng.uniform(-0.1, 0.1)
+            shops.append(Shop(
+                name=f'{rng.choice(ADJECTIVES)} {city} Market {n + 1}',
+                description=BENCHMARK_MARKER,
+                location=city,
+                latitude=latitude,
+                longitude=longitude,
+                # bulk_create skips Shop.save(), which derives the geohash.
+                geohash=geo.encode(latitude, longitude),
+            ))
+        with transaction.atomic():
+            ids = [shop.pk for shop in Shop.objects.bulk_create(shops)]
+        self.timed('Shops', len(ids), started)
+        return ids
+
+    def seed_customers(self, count, password, batch_size):
+        started = time.perf_counter()
+        # One hash for everyone; hashing per customer would dominate the run.
+        password = make_password(password)
+        ids = []
+        for start in range(0, count, batch_size):
+            customers = [
+                Customer(
+                    username=f'bench-{n}', email=f'bench-{n}@{BENCHMARK_EMAIL_DOMAIN}',
+                    password=password, first_name='Benchmark', last_name=f'Customer {n}',
+                )
+                for n in range(start, min(start + batch_size, count))
+            ]
+            with transaction.atomic():
+                ids.extend(customer.pk for customer in Customer.objects.bulk_create(customers))
+        self.timed('Customers', len(ids), started)
+        return ids
+
+    def seed_products(self, rng, count, shops, categories, batch_size):
+        """Create products and their search documents. Returns [(id, shop_id, price)]."""
+        started = time.perf_counter()
+        products = []
+        for start in range(0, count, batch_size):
+            batch = []
+            for n in range(start, min(start + batch_size, count)):
+                name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(SIZES)}'.strip()
+                batch.append(Product(
+                    name=name,
+                    description=f'{name} from a local seller. {BENCHMARK_MARKER}.',
+                    sku=f'BENCH-{n:07d}',
+                    price=Decimal(rng.randint(50, 500000)) / 100,
+                    category_id=rng.choice(categories) if categories and rng.random() < 0.95 else None,
+                    shop_id=rng.choice(shops),
+                    stock_quantity=rng.choice([0, 2, 5]) if rng.random() < 0.05 else rng.randint(20, 1000),
+                    is_active=rng.random() < 0.97,
+                ))
+            with transaction.atomic():
+                created = Product.objects.bulk_create(batch)
+                # bulk_create sends no post_save, so index here.
+                index_products([product.pk for product in created])
+            products.extend((product.pk, product.shop_id, product.price) for product in created)
+            self.stdout.write(f'   Products: {len(products)}/{count}...')
+        self.timed('Products (with search documents)', len(products), started)
+        return products
+
+    def seed_orders(self, rng, count, days, customers, products, batch_size):
+        started = time.perf_counter()
+        if not customers or not products:
+            return
+        product_shops = {product_id: shop_id for product_id, shop_id, _ in products}
+        statuses, weights = zip(*ORDER_STATUSES)
+        now = timezone.now()
+        created = 0
+        for start in range(0, count, batch_size):
+            orders = []
+            for _ in range(start, min(start + batch_size, count)):
+                lines = {}
+                for product_id, _, price in rng.sample(products, rng.randint(1, 4)):
+                    lines[product_id] = {'product_id': product_id, 'quantity': rng.randint(1, 3), 'price': str(price)}
+                items = [lines[product_id] for product_id in sorted(lines)]
+                orders.append(Order(
+                    customer_id=rng.choice(customers),
+                    items=items,
+                    total_amount=sum(Decimal(line['price']) * line['quantity'] for line in items),
+                    status=rng.choices(statuses, weights)[0],
+                    shipping_address='1 Benchmark Street',
+                    payment_method=rng.choice(['cash', 'card', 'wallet']),
+                ))
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                # created_at is auto_now_add, which bulk_create overrides; backdate afterwards.
+                for order in orders:
+                    order.created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+                Order.objects.bulk_update(orders, ['created_at'], batch_size=1000)
+                index_orders(orders, product_shops)
+                OrderStatusHistory.objects.bulk_create([
+                    OrderStatusHistory(
+                        order=order, from_status=STATUS_PATHS[order.status][step - 1] if step else None,
+                        to_status=status,
+                    )
+                    for order in orders
+                    for step, status in enumerate(STATUS_PATHS[order.status])
+                ], batch_size=1000)
+            created += len(orders)
+            self.stdout.write(f'   Orders: {created}/{count}...')
+        self.timed('Orders (with order index and history)', created, started)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -47,11 +48,16 @@ INSTALLED_APPS = [
     'django_filters',
     'customer',
     'seller',
+    # Project-level management commands (test_supabase, load_test_supabase)
+    'localbazar',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'utils.metrics.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Before sessions/auth so shed requests cost no database work.
+    'utils.load_shedding.LoadSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,43 +89,111 @@ WSGI_APPLICATION = 'localbazar.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Connection handling (DB_POOL_MODE):
+#   'pool'       - psycopg 3 connection pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+#                  connections per process, checked before each checkout
+#   'persistent' - one connection per worker thread, kept for DB_CONN_MAX_AGE
+#                  seconds and health-checked at the start of each request
+#   'none'       - a new connection per request
+DB_POOL_MODE = config('DB_POOL_MODE', default='persistent')
+
+
+def database_settings(prefix):
+    options = {'sslmode': 'require'}
+    conn_max_age = 0
+    if DB_POOL_MODE == 'pool':
+        options['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            # Seconds a request may wait for a free connection.
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+        }
+    elif DB_POOL_MODE == 'persistent':
+        conn_max_age = config('DB_CONN_MAX_AGE', default=60, cast=int)
+    return {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('DB_NAME', default='postgres'),
-        'USER': config('DB_USER', default='postgres'),
-        'PASSWORD': config('DB_PASSWORD', default=''),
-        'HOST': config('DB_HOST', default='localhost'),
-        'PORT': config('DB_PORT', default='5432', cast=int),
-        'OPTIONS': {
-            'sslmode': 'require',
-        },
+        'NAME': config(f'{prefix}_NAME', default=config('DB_NAME', default='postgres')),
+        'USER': config(f'{prefix}_USER', default=config('DB_USER', default='postgres')),
+        'PASSWORD': config(f'{prefix}_PASSWORD', default=config('DB_PASSWORD', default='')),
+        'HOST': config(f'{prefix}_HOST', default=config('DB_HOST', default='localhost')),
+        'PORT': config(f'{prefix}_PORT', default=config('DB_PORT', default='5432'), cast=int),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        # Required behind a transaction-mode pooler such as Supabase's on port 6543.
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool),
+        'OPTIONS': options,
     }
+
+
+DATABASES = {
+    'default': database_settings('DB'),
 }
 
+# Optional read replica for the public catalog endpoints, see utils.database.
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **database_settings('DB_REPLICA'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['utils.database.ReplicaRouter']
+
+AUTH_USER_MODEL = 'customer.Customer'
+
+# Product search backend: 'auto' picks Postgres full-text search on
+# PostgreSQL and the pure-Python fallback everywhere else.
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='auto')
+
 # Supabase Configuration
 SUPABASE_URL = config('SUPABASE_URL', default='')
 SUPABASE_KEY = config('SUPABASE_KEY', default='')
 SUPABASE_SERVICE_ROLE_KEY = config('SUPABASE_SERVICE_ROLE_KEY', default='')
 
-# Initialize Supabase client (optional - for direct Supabase operations)
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        from supabase import create_client, Client
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except ImportError:
-        supabase = None
+# Async Supabase REST client, see utils.supabase_client. Set
+# SUPABASE_TRANSPORT=utils.supabase_fake.FakeTransport to run against an
+# in-memory fake.
+SUPABASE_CLIENT = {
+    'TIMEOUT': config('SUPABASE_TIMEOUT', default=10, cast=float),
+    'MAX_CONNECTIONS': config('SUPABASE_MAX_CONNECTIONS', default=20, cast=int),
+    'MAX_CONCURRENCY': config('SUPABASE_MAX_CONCURRENCY', default=10, cast=int),
+    'BATCH_SIZE': config('SUPABASE_BATCH_SIZE', default=500, cast=int),
+    'MAX_RETRIES': config('SUPABASE_MAX_RETRIES', default=3, cast=int),
+    'TRANSPORT': config('SUPABASE_TRANSPORT', default='') or None,
+}
+
+# Supabase clients are created on first use by utils.supabase_client, not
+# here: importing supabase/httpx and building a client would slow down every
+# process start.
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Bearer tokens first; sessions only for the admin and browsable API.
+        'utils.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'utils.throttling.TokenBucketThrottle',
+    ],
+    # Token buckets: burst of N, refilled at N per period (utils.throttling).
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': config('THROTTLE_ANON_RATE', default='300/min'),
+        'user': config('THROTTLE_USER_RATE', default='1200/min'),
+        'auth': config('THROTTLE_AUTH_RATE', default='10/min'),
+        'search': config('THROTTLE_SEARCH_RATE', default='60/min'),
+    },
+    # Trusted reverse proxies in front of the app. Clients are told apart by
+    # REMOTE_ADDR, or by the address this many hops from the end of
+    # X-Forwarded-For; 0 ignores the header, which clients can forge.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
@@ -129,6 +203,94 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Caches
+# The 'catalog' cache is the shared tier of the response cache; point it at
+# Redis in production, e.g. CATALOG_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and CATALOG_CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': config('CATALOG_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CATALOG_CACHE_LOCATION', default='localbazar-catalog'),
+    },
+    # Live carts. Must be shared (Redis) when running more than one process.
+    'carts': {
+        'BACKEND': config('CARTS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CARTS_CACHE_LOCATION', default='localbazar-carts'),
+        'TIMEOUT': None,
+    },
+}
+
+# Cart store (customer.cart): cache first, persisted write-behind every
+# FLUSH_INTERVAL seconds (0 writes through on every change).
+CARTS = {
+    'CACHE_ALIAS': 'carts',
+    'TIMEOUT': 60 * 60 * 24 * 7,
+    'FLUSH_INTERVAL': config('CARTS_FLUSH_INTERVAL', default=5, cast=int),
+    'MAX_ITEMS': 100,
+}
+
+# Response cache for anonymous catalog endpoints (utils.response_cache)
+RESPONSE_CACHE = {
+    'ALIAS': 'catalog',
+    'TIMEOUT': config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int),
+    'LOCAL_MAX_ENTRIES': 1024,
+}
+
+# Seller bulk product imports (seller.importer)
+PRODUCT_IMPORT = {
+    'BATCH_SIZE': config('PRODUCT_IMPORT_BATCH_SIZE', default=1000, cast=int),
+    'WORKERS': config('PRODUCT_IMPORT_WORKERS', default=2, cast=int),
+    'MAX_REPORTED_ERRORS': 1000,
+}
+
+# Resized WebP/JPEG renditions of catalog images, see customer.images.
+IMAGE_RENDITIONS = {
+    'QUALITY': config('IMAGE_RENDITION_QUALITY', default=80, cast=int),
+    'WORKERS': config('IMAGE_RENDITION_WORKERS', default=2, cast=int),
+}
+
+# Per-token user cache for JWT authentication (utils.authentication)
+AUTH_CACHE = {
+    'TIMEOUT': config('AUTH_CACHE_TIMEOUT', default=60, cast=int),
+    'MAX_ENTRIES': 10000,
+}
+
+# Rate limit buckets (utils.throttling): 'memory' per process, or 'cache'
+# to share them through CACHE_ALIAS (Redis in production).
+RATE_LIMITS = {
+    'STORE': config('RATE_LIMIT_STORE', default='memory'),
+    'CACHE_ALIAS': 'default',
+}
+
+# Load shedding (utils.load_shedding): 503 + Retry-After when saturated.
+LOAD_SHEDDING = {
+    'ENABLED': config('LOAD_SHEDDING_ENABLED', default=True, cast=bool),
+    'MAX_IN_FLIGHT': config('LOAD_SHEDDING_MAX_IN_FLIGHT', default=64, cast=int),
+    'MAX_POOL_WAITING': config('LOAD_SHEDDING_MAX_POOL_WAITING', default=8, cast=int),
+    'MAX_POOL_WAIT_MS': config('LOAD_SHEDDING_MAX_POOL_WAIT_MS', default=200, cast=int),
+}
+
+# Per-route latency/SQL/serialization metrics (utils.metrics), served by
+# api/metrics/. Sampled profiles of requests slower than the threshold.
+INSTRUMENTATION = {
+    'ENABLED': config('INSTRUMENTATION_ENABLED', default=True, cast=bool),
+    'SERVER_TIMING': config('SERVER_TIMING', default=DEBUG, cast=bool),
+    'PROFILE_SAMPLE_RATE': config('PROFILE_SAMPLE_RATE', default=0.0, cast=float),
+    'PROFILE_THRESHOLD_MS': config('PROFILE_THRESHOLD_MS', default=500, cast=int),
+    'PROFILE_DIR': config('PROFILE_DIR', default=None),
+}
+
+# Facet counts on products/facets/ (customer.facets). Price buckets are
+# upper bounds; counts are cached per filter set for TIMEOUT seconds.
+PRODUCT_FACETS = {
+    'PRICE_BUCKETS': (100, 500, 1000, 5000),
+    'MAX_SHOPS': config('PRODUCT_FACETS_MAX_SHOPS', default=20, cast=int),
+    'TIMEOUT': config('PRODUCT_FACETS_TIMEOUT', default=300, cast=int),
+}
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -23,8 +23,8 @@ from django.views.generic import TemplateView
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', TemplateView.as_view(template_name='landingpage.html'), name='landing_page'),
-    # path('api/', include('customer.urls')),
-    # path('api/', include('seller.urls')),
+    path('api/', include('customer.urls')),
+    path('api/seller/', include('seller.urls')),
 ]
 
 # Serve static and media files during development
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SellerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seller'
+
+    def ready(self):
+        from customer.signals import shop_order_status_changed
+        from .rollups import on_shop_order_status_changed
+
+        shop_order_status_changed.connect(on_shop_order_status_changed, dispatch_uid='seller-sales-rollups')
@@ -0,0 +1,367 @@
+"""
+Streaming bulk product import for sellers.
+
+Uploads are read row by row (``csv`` over a text wrapper, ``openpyxl`` in
+read-only mode for XLSX), validated and upserted in batches of
+``PRODUCT_IMPORT['BATCH_SIZE']`` with ``bulk_create(update_conflicts=True)``
+keyed on ``(shop, sku)``. Imports run on a small background thread pool so
+the upload request returns immediately; progress is written to the
+``ProductImport`` row after every batch.
+
+The pool lives in the web worker process, so an import queued or running
+when that worker restarts is left ``queued``/``running``. The
+``recover_product_imports`` command (run it from cron) runs imports left
+queued and fails interrupted ones so the seller can upload again.
+"""
+
+import csv
+import io
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from customer import categories, search
+from customer.models import Category, Product
+from utils import response_cache
+from .models import ProductImport
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+    'WORKERS': 2,
+    'MAX_REPORTED_ERRORS': 1000,
+}
+
+COLUMNS = (
+    'sku', 'name', 'description', 'price', 'stock_quantity',
+    'reorder_threshold', 'category', 'is_active',
+)
+REQUIRED_COLUMNS = ('name', 'price')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+# Largest value a PositiveIntegerField holds on every database backend.
+MAX_COUNT = 2147483647
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PRODUCT_IMPORT', {})}
+
+
+def iter_csv_rows(file):
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    yield from reader
+
+
+def iter_xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('XLSX imports need the openpyxl package')
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename):
+    """Yield ``(row_number, {column: value})`` without loading the whole file."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = iter_csv_rows(file)
+    elif extension in ('.xlsx', '.xlsm'):
+        rows = iter_xlsx_rows(file)
+    else:
+        raise ValueError(f'Unsupported file type "{extension}", upload a .csv or .xlsx file')
+
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('The file is empty')
+    header = [column.strip().lower() for column in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f'Missing required columns: {", ".join(missing)}')
+
+    for row_number, values in enumerate(rows, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        yield row_number, {
+            column: values[index].strip() if index < len(values) else ''
+            for index, column in enumerate(header)
+            if column in COLUMNS
+        }
+
+
+def parse_count(value):
+    """A whole number between 0 and ``MAX_COUNT``; raises ValueError with the row message otherwise."""
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    # "1.0" is fine, "1.9", "NaN" and "Infinity" are not.
+    if number is None or not number.is_finite() or number != number.to_integral_value() or number < 0:
+        raise ValueError('A valid non-negative integer is required.')
+    if number > MAX_COUNT:
+        raise ValueError(f'Ensure this value is less than or equal to {MAX_COUNT}.')
+    return int(number)
+
+
+def validate_row(row):
+    """Return ``(cleaned, errors)`` for one parsed row."""
+    cleaned = {}
+    errors = {}
+
+    name = row.get('name', '')
+    if not name:
+        errors['name'] = 'This field is required.'
+    elif len(name) > 255:
+        errors['name'] = 'Ensure this field has no more than 255 characters.'
+    cleaned['name'] = name
+
+    try:
+        price = Decimal(row.get('price', ''))
+        if price < 0 or price >= Decimal('100000000'):
+            raise InvalidOperation
+        cleaned['price'] = price.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        errors['price'] = 'A valid non-negative number is required.'
+
+    try:
+        cleaned['stock_quantity'] = parse_count(row.get('stock_quantity', '') or '0')
+    except ValueError as e:
+        errors['stock_quantity'] = str(e)
+
+    threshold = row.get('reorder_threshold', '')
+    if threshold:
+        try:
+            cleaned['reorder_threshold'] = parse_count(threshold)
+        except ValueError as e:
+            errors['reorder_threshold'] = str(e)
+
+    sku = row.get('sku', '')
+    if len(sku) > 64:
+        errors['sku'] = 'Ensure this field has no more than 64 characters.'
+    cleaned['sku'] = sku or None
+
+    active = row.get('is_active', '').lower()
+    if active and active not in TRUE_VALUES | FALSE_VALUES:
+        errors['is_active'] = 'Expected true or false.'
+    cleaned['is_active'] = active not in FALSE_VALUES
+
+    category = row.get('category', '')
+    if len(category) > 100:
+        errors['category'] = 'Ensure this field has no more than 100 characters.'
+    cleaned['category'] = category
+    cleaned['description'] = row.get('description', '')
+    return cleaned, errors
+
+
+class CategoryResolver:
+    """
+    Per-import cache of category name -> id, matching names case-insensitively;
+    creates missing categories in bulk.
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    def _load(self, lowered):
+        rows = Category.objects.annotate(lower_name=Lower('name')).filter(
+            lower_name__in=lowered
+        ).order_by('pk').values_list('id', 'lower_name')
+        for category_id, name in rows:
+            self._ids.setdefault(name, category_id)
+
+    def resolve(self, names):
+        # The first spelling seen is the one a new category gets.
+        missing = {}
+        for name in names:
+            if name and name.lower() not in self._ids:
+                missing.setdefault(name.lower(), name)
+        if missing:
+            self._load(list(missing))
+            to_create = [name for lowered, name in missing.items() if lowered not in self._ids]
+            if to_create:
+                slugs = categories.unique_slugs(to_create)
+                Category.objects.bulk_create(
+                    [Category(name=name, slug=slugs[name]) for name in to_create], ignore_conflicts=True
+                )
+                categories.place_new_roots()
+                self._load([name.lower() for name in to_create])
+
+    def get(self, name):
+        return self._ids.get(name.lower()) if name else None
+
+
+class ProductImporter:
+    def __init__(self, product_import):
+        config = get_config()
+        self.product_import = product_import
+        self.shop_id = product_import.shop_id
+        self.batch_size = config['BATCH_SIZE']
+        self.max_errors = config['MAX_REPORTED_ERRORS']
+        self.categories = CategoryResolver()
+        self.stats = {'processed_rows': 0, 'created_count': 0, 'updated_count': 0, 'error_count': 0}
+        self.errors = []
+
+    def run(self):
+        # Claimed with a conditional UPDATE so a recovery run and a worker
+        # never process the same import twice.
+        claimed = ProductImport.objects.filter(pk=self.product_import.pk, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+        if not claimed:
+            return
+        try:
+            with self.product_import.file.open('rb') as file:
+                batch = []
+                for row_number, row in iter_rows(file, self.product_import.file.name):
+                    batch.append((row_number, row))
+                    if len(batch) >= self.batch_size:
+                        self.process_batch(batch)
+                        batch = []
+                if batch:
+                    self.process_batch(batch)
+        except Exception as e:
+            logger.exception(f"Product import {self.product_import.pk} failed")
+            self.save_progress(status='failed', message=str(e), finished_at=timezone.now())
+            return
+        self.save_progress(status='completed', finished_at=timezone.now())
+
+    def process_batch(self, batch):
+        valid = []
+        for row_number, row in batch:
+            cleaned, errors = validate_row(row)
+            if errors:
+                self.stats['error_count'] += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({'row': row_number, 'errors': errors})
+            else:
+                valid.append(cleaned)
+
+        self.categories.resolve([row['category'] for row in valid])
+
+        # Last row wins when a SKU repeats inside a batch; ON CONFLICT cannot
+        # update the same row twice in one statement.
+        with_sku = {}
+        without_sku = []
+        for row in valid:
+            product = Product(
+                shop_id=self.shop_id,
+                sku=row['sku'],
+                name=row['name'],
+                description=row['description'],
+                price=row['price'],
+                stock_quantity=row['stock_quantity'],
+                category_id=self.categories.get(row['category']),
+                is_active=row['is_active'],
+            )
+            if 'reorder_threshold' in row:
+                product.reorder_threshold = row['reorder_threshold']
+            if row['sku']:
+                with_sku[row['sku']] = product
+            else:
+                without_sku.append(product)
+
+        update_fields = ['name', 'description', 'price', 'stock_quantity', 'category', 'is_active', 'updated_at']
+        if any('reorder_threshold' in row for _, row in batch):
+            # Only overwrite thresholds when the file has the column.
+            update_fields.append('reorder_threshold')
+
+        with transaction.atomic():
+            existing = {
+                sku: (category_id, is_active)
+                for sku, category_id, is_active in Product.objects.filter(
+                    shop_id=self.shop_id, sku__in=list(with_sku)
+                ).values_list('sku', 'category_id', 'is_active')
+            }
+            if with_sku:
+                Product.objects.bulk_create(
+                    list(with_sku.values()),
+                    update_conflicts=True,
+                    unique_fields=['shop', 'sku'],
+                    update_fields=update_fields,
+                )
+            created = Product.objects.bulk_create(without_sku)
+
+            # bulk_create sends no signals; keep the category counts in step.
+            deltas = defaultdict(int)
+            for product in [*with_sku.values(), *without_sku]:
+                listing = (product.category_id, product.is_active)
+                for category_id, delta in categories.listing_changes(existing.get(product.sku), listing).items():
+                    deltas[category_id] += delta
+            categories.adjust_counts(deltas)
+
+        product_ids = list(
+            Product.objects.filter(shop_id=self.shop_id, sku__in=list(with_sku)).values_list('id', flat=True)
+        )
+        product_ids += [product.pk for product in created if product.pk]
+        search.index_products(product_ids)
+        transaction.on_commit(lambda: response_cache.invalidate('product'))
+
+        self.stats['processed_rows'] += len(batch)
+        self.stats['updated_count'] += len(existing)
+        self.stats['created_count'] += len(with_sku) - len(existing) + len(without_sku)
+        self.save_progress()
+
+    def save_progress(self, **extra):
+        ProductImport.objects.filter(pk=self.product_import.pk).update(
+            errors=self.errors, **self.stats, **extra
+        )
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_config()['WORKERS'], thread_name_prefix='product-import'
+        )
+    return _executor
+
+
+def run_import(import_id):
+    try:
+        product_import = ProductImport.objects.get(pk=import_id)
+        ProductImporter(product_import).run()
+    finally:
+        close_old_connections()
+
+
+def enqueue_import(product_import):
+    """Run the import in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(run_import, product_import.pk))
+
+
+INTERRUPTED_MESSAGE = 'The import was interrupted by a server restart; please upload the file again.'
+
+
+def recover_imports(older_than):
+    """
+    Recover imports orphaned by a worker restart: fail those started before
+    ``older_than`` and still running, and run those queued before it here.
+    Returns ``(failed, rerun)`` counts.
+    """
+    # Rows without a SKU cannot be upserted, so re-running a half-done
+    # import could duplicate them; the seller re-uploads instead.
+    failed = ProductImport.objects.filter(status='running', started_at__lt=older_than).update(
+        status='failed', message=INTERRUPTED_MESSAGE, finished_at=timezone.now()
+    )
+    queued = list(
+        ProductImport.objects.filter(status='queued', created_at__lt=older_than)
+        .order_by('created_at').values_list('pk', flat=True)
+    )
+    for import_id in queued:
+        run_import(import_id)
+    return failed, len(queued)
@@ -0,0 +1,35 @@
+"""
+Django management command to recover bulk product imports orphaned by a
+worker restart.
+
+Imports run on a thread pool inside the web worker (see seller.importer), so
+a restart leaves them ``queued`` or ``running`` forever. Run this from cron:
+imports still queued after ``--minutes`` are run here, and those still
+running after it are marked failed so the seller can upload again.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from seller.importer import recover_imports
+
+
+class Command(BaseCommand):
+    help = 'Run product imports left queued and fail those interrupted by a restart'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes', type=int, default=30,
+            help='Age after which a queued or running import counts as orphaned',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        failed, rerun = recover_imports(timezone.now() - timedelta(minutes=options['minutes']))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {rerun} queued imports run and {failed} interrupted imports failed in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0006_shop_owner_product_sku'),
+        ('seller', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopSalesSummary',
+            fields=[
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_summary', serialize=False, to='customer.shop')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('customers', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShopCustomerDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='customer.shop')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('shop', 'date', 'customer'), name='customer_day_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopCustomerSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+                ('first_order_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_sales', to=settings.AUTH_USER_MODEL)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_sales', to='customer.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', '-revenue'], name='customer_sales_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'customer'), name='customer_sales_shop_customer_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.IntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='customer.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sales', to='customer.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', '-revenue'], name='product_sales_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'product'), name='product_sales_shop_product_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('customers', models.IntegerField(default=0)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily', to='customer.shop')),
+            ],
+            options={
+                'ordering': ['shop', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'date'), name='sales_daily_shop_date_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopSalesHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_hourly', to='customer.shop')),
+            ],
+            options={
+                'ordering': ['shop', 'hour'],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'hour'), name='sales_hourly_shop_hour_unique')],
+            },
+        ),
+    ]
@@ -1,3 +1,156 @@
+from django.conf import settings
 from django.db import models
 
 # Create your models here.
+
+
+class ProductImport(models.Model):
+    """A seller's bulk catalog upload and its progress."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='product_imports')
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='product_imports'
+    )
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # [{'row': n, 'errors': {field: message}}], capped at MAX_REPORTED_ERRORS.
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.pk} for {self.shop_id} ({self.status})"
+
+
+# Sales rollups, maintained incrementally by seller.rollups from order
+# status changes. Analytics endpoints read only these tables.
+
+class ShopSalesSummary(models.Model):
+    shop = models.OneToOneField(
+        'customer.Shop', on_delete=models.CASCADE, primary_key=True, related_name='sales_summary'
+    )
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    customers = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sales summary for shop #{self.shop_id}"
+
+
+class ShopSalesDaily(models.Model):
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='sales_daily')
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    customers = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['shop', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'date'], name='sales_daily_shop_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"Shop #{self.shop_id} sales on {self.date}"
+
+
+class ShopSalesHourly(models.Model):
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='sales_hourly')
+    hour = models.DateTimeField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['shop', 'hour']
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'hour'], name='sales_hourly_shop_hour_unique'),
+        ]
+
+    def __str__(self):
+        return f"Shop #{self.shop_id} sales at {self.hour}"
+
+
+class ShopProductSales(models.Model):
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='product_sales')
+    product = models.ForeignKey('customer.Product', on_delete=models.CASCADE, related_name='sales')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'product'], name='product_sales_shop_product_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', '-revenue'], name='product_sales_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"Product #{self.product_id} sales"
+
+
+class ShopCustomerSales(models.Model):
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='customer_sales')
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='shop_sales')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(default=0)
+    first_order_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'customer'], name='customer_sales_shop_customer_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['shop', '-revenue'], name='customer_sales_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"Customer #{self.customer_id} at shop #{self.shop_id}"
+
+
+class ShopCustomerDay(models.Model):
+    """Marks that a customer ordered from a shop on a day; feeds ShopSalesDaily.customers."""
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='+')
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'date', 'customer'], name='customer_day_unique'),
+        ]
+
+
+class SalesDelta(models.Model):
+    """
+    A shop's part of an order entering (``sign`` 1) or leaving (-1) the
+    sales rollups. Status changes only insert these; ``seller.rollups``
+    folds them into the rollup rows after the change commits.
+    """
+    shop = models.ForeignKey('customer.Shop', on_delete=models.CASCADE, related_name='+')
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    order_created_at = models.DateTimeField()
+    sign = models.SmallIntegerField()
+    # [[product_id, quantity, revenue], ...] with revenue as a decimal string.
+    lines = models.JSONField()
+
+    def __str__(self):
+        return f"Sales delta {self.sign:+d} for shop #{self.shop_id}"
@@ -0,0 +1,344 @@
+"""
+Incremental sales rollups for seller analytics.
+
+Every status change that moves a shop's part of an order into or out of
+the counted states inserts a ``SalesDelta`` row in the status change's
+transaction; checkouts never write the shared rollup rows, so they do not
+queue on each other's locks. Once the transaction commits, a single
+background worker folds the pending deltas into the summary, daily,
+hourly, per-product and per-customer rows, one UPDATE per row per batch
+however many orders hit it. Deltas left behind by a restarted worker are
+folded by the next commit or by the ``fold_sales_rollups`` management
+command. ``rebuild_rollups`` recomputes everything from the orders table
+(see the ``rebuild_sales_rollups`` management command).
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from customer.models import Order, Product, ShopOrder
+from .models import (
+    SalesDelta, ShopCustomerDay, ShopCustomerSales, ShopProductSales,
+    ShopSalesDaily, ShopSalesHourly, ShopSalesSummary,
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_MODELS = (
+    ShopSalesSummary, ShopSalesDaily, ShopSalesHourly,
+    ShopProductSales, ShopCustomerSales, ShopCustomerDay,
+)
+BATCH_SIZE = 1000
+
+
+def is_counted(status):
+    """Orders count towards sales from placement until they are cancelled."""
+    return status is not None and status != 'cancelled'
+
+
+def _buckets(created_at):
+    local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+    return local.date(), local.replace(minute=0, second=0, microsecond=0)
+
+
+def _lines_by_shop(items, product_shops):
+    """Group order lines as ``{shop_id: [(product_id, quantity, revenue), ...]}``."""
+    by_shop = defaultdict(list)
+    for item in items:
+        product_id = int(item['product_id'])
+        shop_id = product_shops.get(product_id)
+        if shop_id is None:
+            continue
+        quantity = int(item['quantity'])
+        by_shop[shop_id].append((product_id, quantity, Decimal(str(item['price'])) * quantity))
+    return by_shop
+
+
+def _increment(model, keys, defaults=None, **deltas):
+    """Add ``deltas`` to the row matching ``keys``, creating it if needed. Returns True if created."""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+        return True
+    except IntegrityError:
+        # Created concurrently; fall back to the update.
+        model.objects.filter(**keys).update(**changes)
+        return False
+
+
+def _insert_once(model, **keys):
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys)
+        return True
+    except IntegrityError:
+        return False
+
+
+def queue_order(order, sign, shop_ids=None):
+    """
+    Queue adding (sign=1) or removing (sign=-1) an order's lines, only those
+    of ``shop_ids`` if given, and fold them in once the transaction commits.
+    """
+    product_ids = [int(item['product_id']) for item in order.items]
+    products = Product.objects.filter(pk__in=product_ids)
+    if shop_ids is not None:
+        products = products.filter(shop_id__in=shop_ids)
+    product_shops = dict(products.values_list('id', 'shop_id'))
+    SalesDelta.objects.bulk_create([
+        SalesDelta(
+            shop_id=shop_id, customer_id=order.customer_id, order_created_at=order.created_at, sign=sign,
+            lines=[[product_id, quantity, str(revenue)] for product_id, quantity, revenue in lines],
+        )
+        for shop_id, lines in _lines_by_shop(order.items, product_shops).items()
+    ])
+    transaction.on_commit(schedule_fold)
+
+
+def on_shop_order_status_changed(sender, shop_order, order, old_status, new_status, **kwargs):
+    was_counted, now_counted = is_counted(old_status), is_counted(new_status)
+    if now_counted and not was_counted:
+        queue_order(order, 1, shop_ids=[shop_order.shop_id])
+    elif was_counted and not now_counted:
+        queue_order(order, -1, shop_ids=[shop_order.shop_id])
+
+
+def _fold_batch(batch_size):
+    with transaction.atomic():
+        # skip_locked lets folds in other processes take the next batch.
+        deltas = list(
+            SalesDelta.objects.order_by('pk').select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not deltas:
+            return 0
+
+        summary = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0, 'units': 0})
+        daily = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0, 'units': 0})
+        hourly = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0, 'units': 0})
+        product_sales = defaultdict(lambda: {'revenue': Decimal('0'), 'units': 0, 'orders': 0})
+        customer_sales = {}
+        customer_days = set()
+        for delta in deltas:
+            sign = delta.sign
+            day, hour = _buckets(delta.order_created_at)
+            revenue = sum(Decimal(line[2]) for line in delta.lines) * sign
+            units = sum(line[1] for line in delta.lines) * sign
+            for bucket in (summary[delta.shop_id], daily[(delta.shop_id, day)], hourly[(delta.shop_id, hour)]):
+                bucket['revenue'] += revenue
+                bucket['orders'] += sign
+                bucket['units'] += units
+            for product_id, quantity, line_revenue in delta.lines:
+                row = product_sales[(delta.shop_id, product_id)]
+                row['revenue'] += Decimal(line_revenue) * sign
+                row['units'] += quantity * sign
+                row['orders'] += sign
+            customer = customer_sales.setdefault(
+                (delta.shop_id, delta.customer_id),
+                {'revenue': Decimal('0'), 'orders': 0, 'first_order_at': delta.order_created_at},
+            )
+            customer['revenue'] += revenue
+            customer['orders'] += sign
+            customer['first_order_at'] = min(customer['first_order_at'], delta.order_created_at)
+            if sign > 0:
+                customer_days.add((delta.shop_id, day, delta.customer_id))
+
+        # Distinct customer counts are not decremented on cancel; a rebuild
+        # recounts them from the remaining orders.
+        new_customers = defaultdict(int)
+        for (shop_id, customer_id), values in sorted(customer_sales.items()):
+            first_order_at = values.pop('first_order_at')
+            created = _increment(
+                ShopCustomerSales, {'shop_id': shop_id, 'customer_id': customer_id},
+                defaults={'first_order_at': first_order_at}, **values,
+            )
+            if created and values['orders'] > 0:
+                new_customers[shop_id] += 1
+        new_daily_customers = defaultdict(int)
+        for shop_id, day, customer_id in sorted(customer_days):
+            if _insert_once(ShopCustomerDay, shop_id=shop_id, customer_id=customer_id, date=day):
+                new_daily_customers[(shop_id, day)] += 1
+
+        # In key order, so concurrent folds lock rows in the same order.
+        for shop_id, values in sorted(summary.items()):
+            _increment(ShopSalesSummary, {'shop_id': shop_id}, customers=new_customers[shop_id], **values)
+        for (shop_id, day), values in sorted(daily.items()):
+            _increment(
+                ShopSalesDaily, {'shop_id': shop_id, 'date': day},
+                customers=new_daily_customers[(shop_id, day)], **values,
+            )
+        for (shop_id, hour), values in sorted(hourly.items()):
+            _increment(ShopSalesHourly, {'shop_id': shop_id, 'hour': hour}, **values)
+        for (shop_id, product_id), values in sorted(product_sales.items()):
+            _increment(ShopProductSales, {'shop_id': shop_id, 'product_id': product_id}, **values)
+
+        SalesDelta.objects.filter(pk__in=[delta.pk for delta in deltas]).delete()
+    return len(deltas)
+
+
+def fold_deltas(batch_size=BATCH_SIZE):
+    """Fold every pending ``SalesDelta`` into the rollups. Returns the number folded."""
+    folded = 0
+    while True:
+        count = _fold_batch(batch_size)
+        folded += count
+        if count < batch_size:
+            return folded
+
+
+_executor = None
+_fold_lock = threading.Lock()
+_fold_scheduled = False
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # One worker: folds in a process never contend with each other.
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sales-rollups')
+    return _executor
+
+
+def _run_fold():
+    global _fold_scheduled
+    with _fold_lock:
+        # Cleared first, so deltas committed during the fold schedule another.
+        _fold_scheduled = False
+    try:
+        fold_deltas()
+    except Exception:
+        logger.exception('Failed to fold sales deltas into the rollups')
+    finally:
+        close_old_connections()
+
+
+def schedule_fold():
+    """Fold pending deltas in the background, once however many commits ask for it."""
+    global _fold_scheduled
+    if not connection.features.has_select_for_update:
+        # Without row locks (SQLite) every write takes the whole database,
+        # so a second writer thread only turns lock waits into errors.
+        fold_deltas()
+        return
+    with _fold_lock:
+        if _fold_scheduled:
+            return
+        _fold_scheduled = True
+    _get_executor().submit(_run_fold)
+
+
+def rebuild_rollups(shop_ids=None, stdout=None):
+    """
+    Recompute all rollups from the orders table.
+
+    ``shop_ids`` limits the rebuild to those shops. Returns the number of
+    orders scanned.
+    """
+    # Deltas queued so far describe status changes the scan below will see.
+    last_delta = SalesDelta.objects.aggregate(last=Max('pk'))['last'] or 0
+    products = Product.objects.all()
+    if shop_ids is not None:
+        products = products.filter(shop_id__in=shop_ids)
+    product_shops = dict(products.values_list('id', 'shop_id'))
+
+    summary = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0, 'units': 0, 'customers': 0})
+    daily = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0, 'units': 0, 'customers': 0})
+    hourly = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0, 'units': 0})
+    product_sales = defaultdict(lambda: {'revenue': Decimal('0'), 'units': 0, 'orders': 0})
+    customer_sales = {}
+    customer_days = set()
+
+    # Shops that cancelled their part of an order still open for the others.
+    cancelled_parts = set(
+        ShopOrder.objects.filter(status='cancelled').exclude(order__status='cancelled')
+        .values_list('order_id', 'shop_id')
+    )
+    scanned = 0
+    orders = Order.objects.exclude(status='cancelled').order_by('pk').values_list(
+        'pk', 'customer_id', 'items', 'created_at'
+    )
+    for order_id, customer_id, items, created_at in orders.iterator(chunk_size=BATCH_SIZE):
+        scanned += 1
+        day, hour = _buckets(created_at)
+        for shop_id, lines in _lines_by_shop(items, product_shops).items():
+            if (order_id, shop_id) in cancelled_parts:
+                continue
+            revenue = sum(line[2] for line in lines)
+            units = sum(line[1] for line in lines)
+            for bucket in (summary[shop_id], daily[(shop_id, day)], hourly[(shop_id, hour)]):
+                bucket['revenue'] += revenue
+                bucket['orders'] += 1
+                bucket['units'] += units
+            for product_id, quantity, line_revenue in lines:
+                row = product_sales[(shop_id, product_id)]
+                row['revenue'] += line_revenue
+                row['units'] += quantity
+                row['orders'] += 1
+            customer = customer_sales.setdefault(
+                (shop_id, customer_id), {'revenue': Decimal('0'), 'orders': 0, 'first_order_at': created_at}
+            )
+            if customer['orders'] == 0:
+                summary[shop_id]['customers'] += 1
+            customer['revenue'] += revenue
+            customer['orders'] += 1
+            customer['first_order_at'] = min(customer['first_order_at'], created_at)
+            if (shop_id, day, customer_id) not in customer_days:
+                customer_days.add((shop_id, day, customer_id))
+                daily[(shop_id, day)]['customers'] += 1
+        if stdout is not None and scanned % (BATCH_SIZE * 10) == 0:
+            stdout.write(f'   Scanned {scanned} orders...')
+
+    with transaction.atomic():
+        deltas = SalesDelta.objects.filter(pk__lte=last_delta)
+        if shop_ids is not None:
+            deltas = deltas.filter(shop_id__in=shop_ids)
+        deltas.delete()
+        for model in ROLLUP_MODELS:
+            queryset = model.objects.all()
+            if shop_ids is not None:
+                queryset = queryset.filter(shop_id__in=shop_ids)
+            queryset.delete()
+
+        ShopSalesSummary.objects.bulk_create(
+            [ShopSalesSummary(shop_id=shop_id, **values) for shop_id, values in summary.items()],
+            batch_size=BATCH_SIZE,
+        )
+        ShopSalesDaily.objects.bulk_create(
+            [ShopSalesDaily(shop_id=shop_id, date=day, **values) for (shop_id, day), values in daily.items()],
+            batch_size=BATCH_SIZE,
+        )
+        ShopSalesHourly.objects.bulk_create(
+            [ShopSalesHourly(shop_id=shop_id, hour=hour, **values) for (shop_id, hour), values in hourly.items()],
+            batch_size=BATCH_SIZE,
+        )
+        ShopProductSales.objects.bulk_create(
+            [
+                ShopProductSales(shop_id=shop_id, product_id=product_id, **values)
+                for (shop_id, product_id), values in product_sales.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        ShopCustomerSales.objects.bulk_create(
+            [
+                ShopCustomerSales(shop_id=shop_id, customer_id=customer_id, **values)
+                for (shop_id, customer_id), values in customer_sales.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        ShopCustomerDay.objects.bulk_create(
+            [
+                ShopCustomerDay(shop_id=shop_id, date=day, customer_id=customer_id)
+                for shop_id, day, customer_id in customer_days
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return scanned
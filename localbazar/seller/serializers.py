@@ -0,0 +1,56 @@
+from django.core.validators import FileExtensionValidator
+from rest_framework import serializers
+from customer.models import Order, Product, ShopOrder
+from .models import ProductImport
+
+class ProductImportUploadSerializer(serializers.Serializer):
+    shop = serializers.IntegerField()
+    file = serializers.FileField(validators=[FileExtensionValidator(['csv', 'xlsx', 'xlsm'])])
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductImport
+        fields = [
+            'id', 'shop', 'status', 'processed_rows', 'created_count',
+            'updated_count', 'error_count', 'errors', 'message',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    shop = serializers.IntegerField(required=False)
+    granularity = serializers.ChoiceField(choices=['day', 'hour'], default='day')
+    days = serializers.IntegerField(min_value=1, max_value=365, default=30)
+    hours = serializers.IntegerField(min_value=1, max_value=168, default=24)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+class LowStockQuerySerializer(serializers.Serializer):
+    shop = serializers.IntegerField(required=False)
+
+class LowStockProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'sku', 'shop', 'stock_quantity', 'reorder_threshold', 'updated_at']
+        read_only_fields = fields
+
+class OrderStatusUpdateSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=[choice for choice, _ in Order.STATUS_CHOICES])
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+class OrderShipSerializer(serializers.Serializer):
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+class BulkOrderStatusSerializer(OrderStatusUpdateSerializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
+
+class SellerOrderQuerySerializer(serializers.Serializer):
+    shop = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=[choice for choice, _ in Order.STATUS_CHOICES], required=False)
+
+class SellerOrderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShopOrder
+        fields = ['id', 'order', 'shop', 'customer', 'status', 'units', 'subtotal', 'created_at']
+        read_only_fields = fields
@@ -1,3 +1,379 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APITestCase
+
+from customer.checkout import cancel_order, place_order
+from customer.models import Category, Customer, Order, OrderStatusHistory, Product, Shop, ShopOrder
+from utils.testing import assert_endpoint_queries
+
+from .importer import INTERRUPTED_MESSAGE, MAX_COUNT, ProductImporter, recover_imports
+from .models import ProductImport, SalesDelta, ShopProductSales, ShopSalesDaily, ShopSalesSummary
+from .rollups import fold_deltas, rebuild_rollups
+
+
+class SellerTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Customer.objects.create_user(username='seller', email='seller@example.com', password='pw')
+        cls.other_seller = Customer.objects.create_user(username='other', email='other@example.com', password='pw')
+        cls.buyer = Customer.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        cls.shop = Shop.objects.create(name='Green Grocer', owner=cls.seller)
+        cls.other_shop = Shop.objects.create(name='Corner Bakery', owner=cls.other_seller)
+        cls.apple = Product.objects.create(name='Apple', price='2.50', shop=cls.shop, stock_quantity=10)
+        cls.bread = Product.objects.create(name='Bread', price='4.00', shop=cls.other_shop, stock_quantity=10)
+
+    def setUp(self):
+        self.client.force_authenticate(self.seller)
+
+    def place(self, *lines):
+        return place_order(self.buyer, [{'product_id': p.pk, 'quantity': q} for p, q in lines])
+
+    def part_status(self, order, shop):
+        return ShopOrder.objects.get(order=order, shop=shop).status
+
+    def confirm(self, order):
+        return self.client.post(reverse('seller:order-status-update', args=[order.pk]), {'status': 'confirmed'})
+
+
+class OrderTransitionTests(SellerTestCase):
+    def test_status_update_moves_own_order(self):
+        order = self.place((self.apple, 2))
+        response = self.client.post(
+            reverse('seller:order-status-update', args=[order.pk]), {'status': 'confirmed', 'note': 'ok'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_status'], 'confirmed')
+        self.assertEqual([part['status'] for part in response.data['shop_orders']], ['confirmed'])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+        self.assertTrue(OrderStatusHistory.objects.filter(
+            order=order, shop=self.shop, from_status='pending', to_status='confirmed', note='ok'
+        ).exists())
+
+    def test_ship_confirmed_order(self):
+        order = self.place((self.apple, 1))
+        self.confirm(order)
+        response = self.client.post(reverse('seller:order-ship', args=[order.pk]), {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_status'], 'shipped')
+
+    def test_invalid_transition_is_a_conflict(self):
+        order = self.place((self.apple, 1))
+        response = self.client.post(reverse('seller:order-ship', args=[order.pk]), {})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(self.part_status(order, self.shop), 'pending')
+
+    def test_unknown_status_is_rejected(self):
+        order = self.place((self.apple, 1))
+        response = self.client.post(reverse('seller:order-status-update', args=[order.pk]), {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_sellers_order_is_not_found(self):
+        order = self.place((self.bread, 1))
+        response = self.client.post(reverse('seller:order-ship', args=[order.pk]), {})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.part_status(order, self.other_shop), 'pending')
+
+    def test_multi_shop_order_moves_each_part(self):
+        order = self.place((self.apple, 1), (self.bread, 1))
+        self.confirm(order)
+        response = self.client.post(reverse('seller:order-ship', args=[order.pk]), {})
+        self.assertEqual(response.status_code, 200)
+        # The order is only as far along as its least advanced part.
+        self.assertEqual(response.data['order_status'], 'pending')
+        self.assertEqual(self.part_status(order, self.shop), 'shipped')
+        self.assertEqual(self.part_status(order, self.other_shop), 'pending')
+
+        self.client.force_authenticate(self.other_seller)
+        response = self.confirm(order)
+        self.assertEqual(response.data['order_status'], 'confirmed')
+        response = self.client.post(reverse('seller:order-ship', args=[order.pk]), {})
+        self.assertEqual(response.data['order_status'], 'shipped')
+
+    def test_cancelling_a_part_releases_only_its_stock(self):
+        order = self.place((self.apple, 3), (self.bread, 2))
+        response = self.client.post(
+            reverse('seller:order-status-update', args=[order.pk]), {'status': 'cancelled'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_status'], 'pending')
+        self.apple.refresh_from_db()
+        self.bread.refresh_from_db()
+        self.assertEqual((self.apple.stock_quantity, self.bread.stock_quantity), (10, 8))
+
+        self.client.force_authenticate(self.other_seller)
+        response = self.client.post(
+            reverse('seller:order-status-update', args=[order.pk]), {'status': 'cancelled'}
+        )
+        self.assertEqual(response.data['order_status'], 'cancelled')
+        self.bread.refresh_from_db()
+        self.assertEqual(self.bread.stock_quantity, 10)
+
+    def test_bulk_status_reports_failures(self):
+        first = self.place((self.apple, 1))
+        second = self.place((self.apple, 1))
+        foreign = self.place((self.bread, 1))
+        self.client.post(reverse('seller:order-status-update', args=[second.pk]), {'status': 'cancelled'})
+
+        response = self.client.post(
+            reverse('seller:order-bulk-status'),
+            {'status': 'confirmed', 'order_ids': [first.pk, second.pk, foreign.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [first.pk])
+        failed = {item['id']: item['status'] for item in response.data['failed']}
+        self.assertEqual(failed, {second.pk: 'cancelled', foreign.pk: None})
+        self.assertEqual(Order.objects.get(pk=first.pk).status, 'confirmed')
+        self.assertEqual(self.part_status(foreign, self.other_shop), 'pending')
+
+    def test_requires_authentication(self):
+        order = self.place((self.apple, 1))
+        self.client.force_authenticate(None)
+        response = self.client.post(reverse('seller:order-ship', args=[order.pk]), {})
+        self.assertEqual(response.status_code, 401)
+
+
+class SellerListQueryCountTests(SellerTestCase):
+    """The seller's lists cost the same number of queries however many rows they hold."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rye = Product.objects.create(name='Rye', price='5.00', shop=cls.other_shop, stock_quantity=100)
+        for i in range(12):
+            product = Product.objects.create(
+                name=f'Pear {i}', price='1.00', shop=cls.shop, stock_quantity=3, reorder_threshold=5
+            )
+            place_order(cls.buyer, [{'product_id': product.pk, 'quantity': 1}, {'product_id': rye.pk, 'quantity': 1}])
+
+    def test_order_inbox(self):
+        response = assert_endpoint_queries(self.client, reverse('seller:seller-order-list'), 2)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual({row['shop'] for row in response.data['results']}, {self.shop.pk})
+
+    def test_low_stock(self):
+        response = assert_endpoint_queries(self.client, reverse('seller:low-stock-alert'), 2)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class LowStockAlertTests(SellerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.second_shop = Shop.objects.create(name='Night Market', owner=cls.seller)
+        cls.pear = Product.objects.create(name='Pear', price='1.00', shop=cls.shop, stock_quantity=1, reorder_threshold=5)
+        cls.plum = Product.objects.create(
+            name='Plum', price='1.00', shop=cls.second_shop, stock_quantity=0, reorder_threshold=5
+        )
+        Product.objects.create(name='Rye', price='5.00', shop=cls.other_shop, stock_quantity=0, reorder_threshold=5)
+
+    def alerts(self, **params):
+        return self.client.get(reverse('seller:low-stock-alert'), params)
+
+    def test_lists_own_products_below_threshold(self):
+        response = self.alerts()
+        self.assertEqual([row['id'] for row in response.data['results']], [self.plum.pk, self.pear.pk])
+
+    def test_filters_by_shop(self):
+        response = self.alerts(shop=self.shop.pk)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.pear.pk])
+
+    def test_invalid_shop_is_rejected(self):
+        response = self.alerts(shop='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('shop', response.data)
+
+
+class SalesRollupTests(SellerTestCase):
+    def rollups(self):
+        return {
+            'summary': sorted(ShopSalesSummary.objects.values_list('shop', 'revenue', 'orders', 'units', 'customers')),
+            'daily': sorted(ShopSalesDaily.objects.values_list('shop', 'date', 'revenue', 'orders', 'units', 'customers')),
+            'products': sorted(ShopProductSales.objects.values_list('shop', 'product', 'revenue', 'units', 'orders')),
+        }
+
+    def test_checkout_only_queues_deltas(self):
+        self.place((self.apple, 2), (self.bread, 1))
+        self.assertEqual(sorted(SalesDelta.objects.values_list('shop', 'sign')), [(self.shop.pk, 1), (self.other_shop.pk, 1)])
+        self.assertFalse(ShopSalesSummary.objects.exists())
+
+        self.assertEqual(fold_deltas(), 2)
+        self.assertFalse(SalesDelta.objects.exists())
+        summary = ShopSalesSummary.objects.get(shop=self.shop)
+        self.assertEqual((summary.revenue, summary.orders, summary.units, summary.customers), (Decimal('5.00'), 1, 2, 1))
+
+    def test_fold_matches_rebuild(self):
+        orders = [self.place((self.apple, 1 + i % 2), (self.bread, 1)) for i in range(5)]
+        self.confirm(orders[1])
+        # The seller's part of one order cancelled, the other shop's part still counted.
+        self.client.post(reverse('seller:order-status-update', args=[orders[2].pk]), {'status': 'cancelled'})
+        cancel_order(orders[3], self.buyer)
+        fold_deltas(batch_size=3)
+
+        folded = self.rollups()
+        self.assertEqual(folded['summary'][0][1:4], (Decimal('10.00'), 3, 4))
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), folded)
+
+    def test_rebuild_drops_reflected_deltas(self):
+        self.place((self.apple, 1))
+        rebuild_rollups()
+        self.assertFalse(SalesDelta.objects.exists())
+        self.assertEqual(fold_deltas(), 0)
+        self.assertEqual(ShopSalesSummary.objects.get(shop=self.shop).orders, 1)
+
+
+class ProductImportTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name, content, **fields):
+        if isinstance(content, str):
+            content = content.encode()
+        return ProductImport.objects.create(
+            shop=self.shop, uploaded_by=self.seller, file=SimpleUploadedFile(name, content), **fields
+        )
+
+    def run_import(self, product_import):
+        ProductImporter(product_import).run()
+        product_import.refresh_from_db()
+        return product_import
+
+    def products(self):
+        return {
+            product.sku or product.name: (product.name, product.price, product.stock_quantity, product.category_id)
+            for product in Product.objects.filter(shop=self.shop).exclude(pk=self.apple.pk)
+        }
+
+    def test_csv(self):
+        product_import = self.run_import(self.upload('catalog.csv', (
+            '\ufeffSKU,Name,Price,Stock_Quantity,Category,Unknown\n'
+            'P1,Pear,1.5,4,Fruit,x\n'
+            ',,,,,\n'
+            ',Plum,2,,fruit,x\n'
+        )))
+        self.assertEqual(
+            (product_import.status, product_import.processed_rows, product_import.created_count), ('completed', 2, 2)
+        )
+        fruit = Category.objects.get(name='Fruit')
+        self.assertEqual(self.products(), {
+            'P1': ('Pear', Decimal('1.50'), 4, fruit.pk),
+            'Plum': ('Plum', Decimal('2.00'), 0, fruit.pk),
+        })
+        fruit.refresh_from_db()
+        self.assertEqual(fruit.product_count, 2)
+
+    def test_xlsx(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['sku', 'name', 'price', 'stock_quantity', 'is_active'])
+        sheet.append(['X1', 'Kiwi', 3.25, 7, 'no'])
+        sheet.append([None, None, None, None, None])
+        sheet.append(['X2', 'Lime', 0.5, None, 'yes'])
+        content = io.BytesIO()
+        workbook.save(content)
+
+        product_import = self.run_import(self.upload('catalog.xlsx', content.getvalue()))
+        self.assertEqual((product_import.status, product_import.created_count), ('completed', 2))
+        self.assertEqual(self.products(), {
+            'X1': ('Kiwi', Decimal('3.25'), 7, None),
+            'X2': ('Lime', Decimal('0.50'), 0, None),
+        })
+        self.assertFalse(Product.objects.get(sku='X1').is_active)
+
+    @override_settings(PRODUCT_IMPORT={'BATCH_SIZE': 2})
+    def test_upserts_by_sku(self):
+        self.run_import(self.upload('first.csv', 'sku,name,price,stock_quantity,reorder_threshold\nP1,Pear,1,4,2\n'))
+        product_import = self.run_import(self.upload('second.csv', (
+            'sku,name,price,stock_quantity\n'
+            'P1,Pear,1.75,9\n'
+            'P2,Quince,3,1\n'
+            'P1,Pear (ripe),1.80,8\n'
+        )))
+        self.assertEqual((product_import.created_count, product_import.updated_count), (1, 2))
+        pear = Product.objects.get(shop=self.shop, sku='P1')
+        # Thresholds are left alone when the file has no such column.
+        self.assertEqual((pear.name, pear.price, pear.stock_quantity, pear.reorder_threshold),
+                         ('Pear (ripe)', Decimal('1.80'), 8, 2))
+        self.assertEqual(Product.objects.filter(shop=self.shop, sku__in=['P1', 'P2']).count(), 2)
+
+    def test_row_errors(self):
+        product_import = self.run_import(self.upload('catalog.csv', (
+            'sku,name,price,stock_quantity,reorder_threshold,is_active\n'
+            'A,Fig,1,1.9,,\n'
+            'B,Fig,1,Infinity,,\n'
+            'C,Fig,1,1e12,,\n'
+            'D,Fig,1,-1,,\n'
+            'E,Fig,NaN,1,1.5,maybe\n'
+            'F,,1,1,,\n'
+            'G,Date,1,2.0,3,\n'
+        )))
+        self.assertEqual(product_import.status, 'completed')
+        self.assertEqual((product_import.processed_rows, product_import.error_count), (7, 6))
+        whole = 'A valid non-negative integer is required.'
+        self.assertEqual(product_import.errors, [
+            {'row': 2, 'errors': {'stock_quantity': whole}},
+            {'row': 3, 'errors': {'stock_quantity': whole}},
+            {'row': 4, 'errors': {'stock_quantity': f'Ensure this value is less than or equal to {MAX_COUNT}.'}},
+            {'row': 5, 'errors': {'stock_quantity': whole}},
+            {'row': 6, 'errors': {
+                'price': 'A valid non-negative number is required.',
+                'reorder_threshold': whole,
+                'is_active': 'Expected true or false.',
+            }},
+            {'row': 7, 'errors': {'name': 'This field is required.'}},
+        ])
+        self.assertEqual(self.products(), {'G': ('Date', Decimal('1.00'), 2, None)})
+
+    def test_unreadable_file_fails_the_import(self):
+        with self.assertLogs('seller.importer', 'ERROR'):
+            product_import = self.run_import(self.upload('catalog.csv', 'sku,price\nP1,1\n'))
+        self.assertEqual((product_import.status, product_import.message), ('failed', 'Missing required columns: name'))
+
+    def test_upload_endpoint(self):
+        response = self.client.post(reverse('seller:product-bulk-upload'), {
+            'shop': self.shop.pk, 'file': SimpleUploadedFile('catalog.csv', b'name,price\nPear,1\n'),
+        })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        status_url = reverse('seller:product-import-status', args=[response.data['id']])
+        self.assertEqual(self.client.get(status_url).data['status'], 'queued')
+
+        response = self.client.post(reverse('seller:product-bulk-upload'), {
+            'shop': self.other_shop.pk, 'file': SimpleUploadedFile('catalog.csv', b'name,price\nPear,1\n'),
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_recovers_orphaned_imports(self):
+        cutoff = timezone.now() - timedelta(minutes=10)
+        long_ago = cutoff - timedelta(minutes=5)
+        interrupted = self.upload('a.csv', 'name,price\nPear,1\n', status='running', started_at=long_ago)
+        still_running = self.upload('b.csv', 'name,price\nPear,1\n', status='running', started_at=timezone.now())
+        left_queued = self.upload('c.csv', 'name,price\nQuince,1\n')
+        ProductImport.objects.filter(pk=left_queued.pk).update(created_at=long_ago)
+        just_queued = self.upload('d.csv', 'name,price\nRaisin,1\n')
+
+        self.assertEqual(recover_imports(cutoff), (1, 1))
+        statuses = dict(ProductImport.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[i.pk] for i in (interrupted, still_running, left_queued, just_queued)],
+            ['failed', 'running', 'completed', 'queued'],
+        )
+        self.assertEqual(ProductImport.objects.get(pk=interrupted.pk).message, INTERRUPTED_MESSAGE)
+        self.assertEqual(set(self.products()), {'Quince'})
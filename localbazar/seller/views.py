@@ -1,3 +1,278 @@
-from django.shortcuts import render
+from rest_framework import generics, status, permissions
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db.models import F, Sum
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import timedelta
+from customer.checkout import CheckoutError, transition_shop_orders
+from customer.models import Product, Shop, ShopOrder
+from utils.fast_serializers import FastListMixin
+from utils.pagination import KeysetPagination
+from .importer import enqueue_import
+from .models import (
+    ProductImport, ShopCustomerSales, ShopProductSales,
+    ShopSalesDaily, ShopSalesHourly, ShopSalesSummary,
+)
+from .serializers import (
+    AnalyticsQuerySerializer, BulkOrderStatusSerializer, LowStockProductSerializer, LowStockQuerySerializer,
+    OrderShipSerializer, OrderStatusUpdateSerializer,
+    ProductImportSerializer, ProductImportUploadSerializer,
+    SellerOrderQuerySerializer, SellerOrderSerializer
+)
 
-# Create your views here.
+# Product management views
+class ProductBulkUploadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+    
+    def post(self, request):
+        serializer = ProductImportUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        shop = get_object_or_404(Shop, pk=serializer.validated_data['shop'], owner=request.user)
+        
+        # The upload is streamed to storage by Django's upload handlers and
+        # processed in the background; poll the status URL for progress.
+        product_import = ProductImport.objects.create(
+            shop=shop,
+            uploaded_by=request.user,
+            file=serializer.validated_data['file'],
+        )
+        enqueue_import(product_import)
+        return Response(ProductImportSerializer(product_import).data, status=status.HTTP_202_ACCEPTED)
+
+class ProductImportStatusView(generics.RetrieveAPIView):
+    serializer_class = ProductImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return ProductImport.objects.filter(shop__owner=self.request.user)
+
+# Order views
+def seller_shop_ids(user):
+    return list(Shop.objects.filter(owner=user).order_by().values_list('id', flat=True))
+
+class SellerOrderListView(FastListMixin, generics.ListAPIView):
+    """
+    The seller's order inbox, newest first: one row per order and shop,
+    optionally filtered by ``?shop=`` and ``?status=``. Reads only the
+    ShopOrder index, so each shop is a single index range scan.
+    """
+    serializer_class = SellerOrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        params = SellerOrderQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        shops = Shop.objects.filter(owner=self.request.user)
+        if 'shop' in params.validated_data:
+            shops = shops.filter(pk=params.validated_data['shop'])
+        shop_ids = list(shops.order_by().values_list('id', flat=True))
+        queryset = ShopOrder.objects.filter(shop_id__in=shop_ids)
+        if 'status' in params.validated_data:
+            queryset = queryset.filter(status=params.validated_data['status'])
+        return queryset
+
+class OrderTransitionMixin:
+    """
+    Moves the seller's own part of an order (their ``ShopOrder`` rows); the
+    order's status follows from all of its shops' parts.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def transition(self, order_id, new_status, note):
+        result = transition_shop_orders(
+            [order_id], new_status, seller_shop_ids(self.request.user),
+            changed_by=self.request.user, note=note,
+        )
+        if result.transitioned:
+            return Response({
+                'order': order_id,
+                'order_status': result.transitioned[0].status,
+                'shop_orders': SellerOrderSerializer(result.shop_orders, many=True).data,
+            })
+        error = result.skipped[order_id]
+        if error is None:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'error': str(error), 'status': error.status}, status=status.HTTP_409_CONFLICT)
+
+class OrderStatusUpdateView(OrderTransitionMixin, APIView):
+    def post(self, request, pk):
+        serializer = OrderStatusUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.transition(pk, serializer.validated_data['status'], serializer.validated_data['note'])
+    
+    patch = post
+
+class OrderShipView(OrderTransitionMixin, APIView):
+    def post(self, request, pk):
+        serializer = OrderShipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.transition(pk, 'shipped', serializer.validated_data['note'])
+
+class OrderBulkStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = serializer.validated_data['order_ids']
+        try:
+            result = transition_shop_orders(
+                order_ids, serializer.validated_data['status'], seller_shop_ids(request.user),
+                changed_by=request.user, note=serializer.validated_data['note'],
+            )
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': serializer.validated_data['status'],
+            'updated': [order.pk for order in result.transitioned],
+            'failed': [
+                {'id': order_id, 'error': str(error) if error else 'Order not found',
+                 'status': error.status if error else None}
+                for order_id, error in sorted(result.skipped.items())
+            ],
+        })
+
+# Inventory views
+class LowStockAlertView(generics.ListAPIView):
+    serializer_class = LowStockProductSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        params = LowStockQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        # Matches the predicate of the partial index product_low_stock_idx.
+        queryset = Product.objects.filter(
+            shop__owner=self.request.user,
+            is_active=True,
+            stock_quantity__lte=F('reorder_threshold'),
+        )
+        if 'shop' in params.validated_data:
+            queryset = queryset.filter(shop_id=params.validated_data['shop'])
+        return queryset.order_by('stock_quantity', 'id')
+
+# Analytics views
+# These read only the rollup tables maintained by seller.rollups, so their
+# cost depends on the number of shops/days requested, not on order history.
+# The rollups trail status changes by one background fold.
+class SellerAnalyticsMixin:
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_params(self):
+        serializer = AnalyticsQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+    
+    def get_shop_ids(self, params):
+        shops = Shop.objects.filter(owner=self.request.user)
+        if 'shop' in params:
+            shops = shops.filter(pk=params['shop'])
+        return list(shops.values_list('id', flat=True))
+
+def _totals(queryset, *fields):
+    totals = queryset.aggregate(**{field: Sum(field) for field in fields})
+    return {field: totals[field] or 0 for field in fields}
+
+class SellerAnalyticsView(SellerAnalyticsMixin, APIView):
+    def get(self, request):
+        params = self.get_params()
+        shop_ids = self.get_shop_ids(params)
+        since = timezone.localdate() - timedelta(days=params['days'] - 1)
+        return Response({
+            'shops': len(shop_ids),
+            'total': _totals(
+                ShopSalesSummary.objects.filter(shop_id__in=shop_ids),
+                'revenue', 'orders', 'units', 'customers'
+            ),
+            'period': {
+                'days': params['days'],
+                **_totals(
+                    ShopSalesDaily.objects.filter(shop_id__in=shop_ids, date__gte=since),
+                    'revenue', 'orders', 'units'
+                ),
+            },
+        })
+
+class SalesAnalyticsView(SellerAnalyticsMixin, APIView):
+    def get(self, request):
+        params = self.get_params()
+        shop_ids = self.get_shop_ids(params)
+        if params['granularity'] == 'hour':
+            since = timezone.now() - timedelta(hours=params['hours'])
+            rows = ShopSalesHourly.objects.filter(shop_id__in=shop_ids, hour__gte=since).values('hour')
+            bucket = 'hour'
+        else:
+            since = timezone.localdate() - timedelta(days=params['days'] - 1)
+            rows = ShopSalesDaily.objects.filter(shop_id__in=shop_ids, date__gte=since).values('date')
+            bucket = 'date'
+        series = rows.annotate(
+            revenue_total=Sum('revenue'), orders_total=Sum('orders'), units_total=Sum('units')
+        ).order_by(bucket)
+        return Response({
+            'granularity': params['granularity'],
+            'series': [
+                {
+                    bucket: row[bucket],
+                    'revenue': row['revenue_total'],
+                    'orders': row['orders_total'],
+                    'units': row['units_total'],
+                }
+                for row in series
+            ],
+        })
+
+class ProductAnalyticsView(SellerAnalyticsMixin, APIView):
+    def get(self, request):
+        params = self.get_params()
+        top = ShopProductSales.objects.filter(
+            shop_id__in=self.get_shop_ids(params)
+        ).order_by('-revenue').values(
+            'product_id', 'product__name', 'revenue', 'units', 'orders'
+        )[:params['limit']]
+        return Response({
+            'top_products': [
+                {
+                    'product_id': row['product_id'],
+                    'name': row['product__name'],
+                    'revenue': row['revenue'],
+                    'units': row['units'],
+                    'orders': row['orders'],
+                }
+                for row in top
+            ],
+        })
+
+class CustomerAnalyticsView(SellerAnalyticsMixin, APIView):
+    def get(self, request):
+        params = self.get_params()
+        shop_ids = self.get_shop_ids(params)
+        since = timezone.localdate() - timedelta(days=params['days'] - 1)
+        daily = ShopSalesDaily.objects.filter(
+            shop_id__in=shop_ids, date__gte=since
+        ).values('date').annotate(customers_total=Sum('customers')).order_by('date')
+        top = ShopCustomerSales.objects.filter(
+            shop_id__in=shop_ids
+        ).order_by('-revenue').values(
+            'customer_id', 'customer__username', 'revenue', 'orders', 'first_order_at'
+        )[:params['limit']]
+        return Response({
+            'total_customers': _totals(
+                ShopSalesSummary.objects.filter(shop_id__in=shop_ids), 'customers'
+            )['customers'],
+            'daily_customers': [
+                {'date': row['date'], 'customers': row['customers_total']} for row in daily
+            ],
+            'top_customers': [
+                {
+                    'customer_id': row['customer_id'],
+                    'username': row['customer__username'],
+                    'revenue': row['revenue'],
+                    'orders': row['orders'],
+                    'first_order_at': row['first_order_at'],
+                }
+                for row in top
+            ],
+        })
@@ -0,0 +1,86 @@
+"""
+JWT authentication with a per-token user cache.
+
+``JWTAuthentication`` verifies the token signature and loads the user row
+on every request. ``CachedJWTAuthentication`` remembers the validated token
+and user for each raw token in an in-process LRU for ``AUTH_CACHE['TIMEOUT']``
+seconds (never past the token's expiry), so repeat requests with the same
+token skip both. Saving or deleting a user drops their cached entries in
+this process; other processes see the change within the timeout.
+
+Invalidation records the time instead of touching the LRU: an entry cached
+before its user's last invalidation is stale. A record outlives every entry
+it can affect after ``TIMEOUT`` seconds and is dropped then, so the records
+stay as few as the invalidations in one timeout window.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .response_cache import LRUCache
+
+DEFAULTS = {
+    'TIMEOUT': 60,
+    'MAX_ENTRIES': 10000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_CACHE', {})}
+
+
+_token_cache = LRUCache(get_config()['MAX_ENTRIES'])
+# user id -> monotonic time of their last invalidation, oldest first.
+_invalidated_at = OrderedDict()
+_invalidated_lock = threading.Lock()
+
+
+def invalidate_user(user_id):
+    now = time.monotonic()
+    horizon = now - get_config()['TIMEOUT']
+    with _invalidated_lock:
+        _invalidated_at.pop(user_id, None)
+        _invalidated_at[user_id] = now
+        while next(iter(_invalidated_at.values())) < horizon:
+            _invalidated_at.popitem(last=False)
+
+
+def _is_current(user_id, cached_at):
+    invalidated_at = _invalidated_at.get(user_id)
+    return invalidated_at is None or cached_at > invalidated_at
+
+
+def clear():
+    _token_cache.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        cached = _token_cache.get(raw_token)
+        if cached is not None:
+            user, validated_token, cached_at = cached
+            if _is_current(user.pk, cached_at):
+                # A copy, so views that modify request.user don't touch the cache.
+                return copy.copy(user), validated_token
+
+        validated_token = self.get_validated_token(raw_token)
+        # Taken before loading the user so a concurrent invalidation wins.
+        cached_at = time.monotonic()
+        user = self.get_user(validated_token)
+
+        timeout = min(get_config()['TIMEOUT'], validated_token['exp'] - time.time())
+        if timeout > 0:
+            _token_cache.set(raw_token, (user, validated_token, cached_at), timeout)
+        return copy.copy(user), validated_token
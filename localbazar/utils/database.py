@@ -0,0 +1,155 @@
+"""
+Database routing and connection metrics.
+
+``ReplicaRouter`` sends reads to the ``replica`` alias while
+``read_from_replica()`` is active and that alias is configured; everything
+else, including all writes, uses ``default``. Reads inside a transaction,
+and every read after a write in the same ``read_from_replica()`` block, stay
+on ``default`` so they see that write. ``ReplicaReadMixin`` enables
+it for the public catalog views. The replica may lag by a moment, so only
+endpoints that tolerate slightly stale data should use it.
+
+``database_stats()`` reports per-alias pool saturation and wait times (in
+``pool`` mode) plus the number of new connections opened by this process,
+which stays flat when persistent or pooled connections are being reused.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+REPLICA_ALIAS = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+# Set by a write while reading from the replica; pins the rest of the block to default.
+_wrote = ContextVar('wrote', default=False)
+
+_connects = Counter()
+_connects_lock = threading.Lock()
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(True)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _wrote.reset(wrote_token)
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or REPLICA_ALIAS not in settings.DATABASES:
+            return None
+        # The replica has not seen uncommitted or just committed writes.
+        if _wrote.get() or connections['default'].in_atomic_block:
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _use_replica.get():
+            _wrote.set(True)
+        # Explicit, so instances loaded from the replica are saved to default.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve a read-only view's queries from the replica when one is configured."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+def _count_connection(sender, connection, **kwargs):
+    with _connects_lock:
+        _connects[connection.alias] += 1
+
+
+connection_created.connect(_count_connection)
+
+
+def get_pool_mode(alias):
+    settings_dict = settings.DATABASES[alias]
+    if settings_dict.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    if settings_dict.get('CONN_MAX_AGE'):
+        return 'persistent'
+    return 'none'
+
+
+def pool_stats(alias):
+    """Saturation and wait-time figures for ``alias``'s pool, or None without one."""
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    # Django opens the pool on first use; until then it holds no connections.
+    size = 0 if pool.closed else stats.get('pool_size', 0)
+    available = 0 if pool.closed else stats.get('pool_available', 0)
+    maximum = stats.get('pool_max', 0)
+    queued = stats.get('requests_queued', 0)
+    return {
+        'open': not pool.closed,
+        'min_size': stats.get('pool_min', 0),
+        'max_size': maximum,
+        'size': size,
+        'in_use': size - available,
+        'available': available,
+        'saturation': round((size - available) / maximum, 3) if maximum else 0,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': stats.get('requests_num', 0),
+        'queued': queued,
+        'avg_wait_ms': round(stats.get('requests_wait_ms', 0) / queued, 2) if queued else 0,
+        'timeouts': stats.get('requests_errors', 0),
+        'bad_returns': stats.get('returns_bad', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def ping(alias):
+    """Run ``SELECT 1`` on ``alias`` and return the round trip in milliseconds."""
+    started = time.perf_counter()
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def database_stats(check=False):
+    stats = {}
+    for alias in settings.DATABASES:
+        entry = {
+            'vendor': connections[alias].vendor,
+            'mode': get_pool_mode(alias),
+            'connections_opened': _connects[alias],
+            'pool': pool_stats(alias),
+        }
+        if check:
+            try:
+                entry['ping_ms'] = ping(alias)
+                entry['status'] = 'healthy'
+            except Exception as e:
+                entry['status'] = 'unhealthy'
+                entry['error'] = str(e)
+        stats[alias] = entry
+    return stats
@@ -0,0 +1,213 @@
+"""
+Compiled, read-only serialization for hot list endpoints.
+
+DRF renders every object field by field through ``get_attribute`` and
+``to_representation``, which dominates CPU time on list pages once the
+queries are fixed. ``compile_serializer`` walks a ``ModelSerializer`` once
+and turns it into the ``values()`` lookups it needs plus a flat list of
+getters, so each row is rendered by a few dict lookups. Output is identical
+to the serializer's: type conversions that are not no-ops on database values
+(decimals, datetimes, files, custom fields) still go through the bound
+field's own ``to_representation``.
+
+Serializers the compiler cannot express (method fields, ``source='*'``,
+to-many relations, properties) raise ``Uncompilable``; ``FastListMixin``
+then falls back to the regular DRF path.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import metrics
+
+# Fields whose to_representation returns database values unchanged.
+IDENTITY_FIELDS = (
+    serializers.CharField, serializers.EmailField, serializers.SlugField, serializers.URLField,
+    serializers.IntegerField, serializers.BooleanField, serializers.FloatField,
+)
+
+
+class Uncompilable(Exception):
+    """The serializer uses a feature the compiled path does not support."""
+
+
+class CompiledSerializer:
+    def __init__(self, keys, render):
+        # values() lookups, in a stable order.
+        self.keys = keys
+        self.render = render
+
+    def __call__(self, row):
+        return self.render(row)
+
+
+def _file_converter(field, model_field):
+    request = field.context.get('request')
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+
+    storage = model_field.storage
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def _datetime_converter(field):
+    """DateTimeField.to_representation with the request's timezone resolved once."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field, model_field):
+    """Function turning a ``values()`` value into the field's representation, or None for identity."""
+    if type(field) in IDENTITY_FIELDS:
+        return None
+    if type(field) is serializers.ReadOnlyField:
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        # values() on a foreign key already yields the primary key.
+        return None
+    if isinstance(field, serializers.FileField) and model_field is not None:
+        return _file_converter(field, model_field)
+    if type(field) is serializers.DateTimeField:
+        return _datetime_converter(field)
+    if isinstance(field, serializers.RelatedField):
+        raise Uncompilable(f'Related field "{field.field_name}" needs model instances')
+    return field.to_representation
+
+
+def _getter(key, convert):
+    if convert is None:
+        return lambda row: row[key]
+
+    def get(row):
+        value = row[key]
+        return None if value is None else convert(value)
+    return get
+
+
+def _nested_getter(null_key, render):
+    # Rows come from one queryset, so a related object renders the same
+    # every time it appears (e.g. a shop on each of its products).
+    rendered = {}
+
+    def get(row):
+        pk = row[null_key]
+        if pk is None:
+            return None
+        data = rendered.get(pk)
+        if data is None:
+            data = rendered[pk] = render(row)
+        return dict(data)
+    return get
+
+
+def _compile(serializer, model, prefix, keys):
+    getters = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.ListSerializer)):
+            raise Uncompilable(f'Field "{name}" cannot be read from values()')
+
+        current = model
+        path = prefix
+        nested = isinstance(field, serializers.ModelSerializer)
+        last = len(field.source_attrs) - 1
+        for position, attr in enumerate(field.source_attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if prefix or position:
+                    raise Uncompilable(f'Field "{name}" reads a property')
+                # Assumed to be a queryset annotation (e.g. distance_km).
+                model_field = None
+            path += attr
+            if model_field is not None and (model_field.many_to_many or model_field.one_to_many):
+                raise Uncompilable(f'Field "{name}" is a to-many relation')
+            if model_field is not None and model_field.is_relation and (position < last or nested):
+                current = model_field.related_model
+                path += '__'
+                continue
+            break
+
+        if nested:
+            null_key = f'{path}{current._meta.pk.name}'
+            keys.append(null_key)
+            getters.append((name, _nested_getter(null_key, _compile(field, current, path, keys))))
+        else:
+            keys.append(path)
+            getters.append((name, _getter(path, _converter(field, model_field))))
+
+    def render(row):
+        return {name: get(row) for name, get in getters}
+    return render
+
+
+def compile_serializer(serializer):
+    """
+    Compile a bound ``ModelSerializer`` instance (its context is used for
+    request-dependent fields such as absolute file URLs).
+    """
+    keys = []
+    render = _compile(serializer, serializer.Meta.model, '', keys)
+    return CompiledSerializer(list(dict.fromkeys(keys)), render)
+
+
+_uncompilable = set()
+
+
+class FastListMixin:
+    """
+    Generic list view mixin that renders rows from ``values()`` through the
+    compiled serializer, falling back to DRF when it cannot be compiled.
+    """
+
+    def get_compiled_serializer(self):
+        serializer_class = self.get_serializer_class()
+        if serializer_class in _uncompilable:
+            return None
+        try:
+            return compile_serializer(serializer_class(context=self.get_serializer_context()))
+        except Uncompilable:
+            _uncompilable.add(serializer_class)
+            return None
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        keys = compiled.keys
+        paginator = self.paginator
+        if paginator is not None:
+            keys = keys + [key for key in getattr(paginator, 'row_fields', ()) if key not in keys]
+        queryset = self.filter_queryset(self.get_queryset()).values(*keys)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with metrics.phase('serialize'):
+                data = [compiled(row) for row in page]
+            return self.get_paginated_response(data)
+        rows = list(queryset)
+        with metrics.phase('serialize'):
+            data = [compiled(row) for row in rows]
+        return Response(data)
@@ -0,0 +1,144 @@
+"""
+Load shedding middleware.
+
+When the process is already saturated, queuing more work only makes every
+request slower and ties up database connections until clients time out.
+``LoadSheddingMiddleware`` rejects new requests up front with a 503 and a
+``Retry-After`` header while either
+
+* more than ``MAX_IN_FLIGHT`` requests are being handled by this process, or
+* a database connection pool has more than ``MAX_POOL_WAITING`` requests
+  waiting for a connection, or connections took more than
+  ``MAX_POOL_WAIT_MS`` on average to hand out since the previous sample.
+
+Pool figures are sampled at most every ``SAMPLE_INTERVAL`` seconds. Paths in
+``EXEMPT_PATHS`` (health checks, the admin) are never shed.
+"""
+
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from .database import pool_stats
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_IN_FLIGHT': 64,
+    'MAX_POOL_WAITING': 8,
+    'MAX_POOL_WAIT_MS': 200,
+    'SAMPLE_INTERVAL': 0.5,
+    'RETRY_AFTER': 2,
+    'EXEMPT_PATHS': ('/admin/', '/api/health/'),
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LOAD_SHEDDING', {})}
+
+
+class PoolMonitor:
+    """Tracks whether any connection pool is overloaded, from periodic samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sampled_at = 0.0
+        self._previous = {}
+        self.reason = None
+
+    def check(self, config):
+        """The reason the pools are overloaded, or None."""
+        now = time.monotonic()
+        if now - self._sampled_at < config['SAMPLE_INTERVAL'] or not self._lock.acquire(blocking=False):
+            return self.reason
+        try:
+            self._sampled_at = now
+            self.reason = self._sample(config)
+        finally:
+            self._lock.release()
+        return self.reason
+
+    def _sample(self, config):
+        reason = None
+        for alias in connections:
+            stats = pool_stats(alias)
+            if stats is None or not stats['open']:
+                continue
+            queued, wait_ms = stats['queued'], stats['avg_wait_ms'] * stats['queued']
+            previous_queued, previous_wait_ms = self._previous.get(alias, (queued, wait_ms))
+            self._previous[alias] = (queued, wait_ms)
+            if stats['waiting'] > config['MAX_POOL_WAITING']:
+                reason = f'{alias} pool has {stats["waiting"]} requests waiting'
+            elif queued > previous_queued:
+                recent_wait = (wait_ms - previous_wait_ms) / (queued - previous_queued)
+                if recent_wait > config['MAX_POOL_WAIT_MS']:
+                    reason = f'{alias} pool wait is {recent_wait:.0f} ms'
+        return reason
+
+
+class LoadSheddingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.pools = PoolMonitor()
+        self.in_flight = 0
+        self.shed = 0
+        self.last_reason = None
+        self._lock = threading.Lock()
+
+    def is_exempt(self, request):
+        config = get_config()
+        return not config['ENABLED'] or request.path.startswith(tuple(config['EXEMPT_PATHS']))
+
+    def admit(self):
+        """Count the request in, or return the 503 response rejecting it."""
+        config = get_config()
+        reason = self.pools.check(config)
+        with self._lock:
+            if reason is None and self.in_flight >= config['MAX_IN_FLIGHT']:
+                reason = f'{self.in_flight} requests in flight'
+            if reason is None:
+                self.in_flight += 1
+                return None
+            self.shed += 1
+            self.last_reason = reason
+
+        response = JsonResponse({'error': 'Service temporarily overloaded, retry shortly'}, status=503)
+        response['Retry-After'] = str(config['RETRY_AFTER'])
+        return response
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.is_exempt(request):
+            return self.get_response(request)
+        rejected = self.admit()
+        if rejected is not None:
+            return rejected
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    async def __acall__(self, request):
+        if self.is_exempt(request):
+            return await self.get_response(request)
+        rejected = self.admit()
+        if rejected is not None:
+            return rejected
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release()
@@ -0,0 +1,207 @@
+"""
+Pagination classes for LocalBazar list endpoints.
+
+``KeysetPagination`` pages on the ``(created_at, id)`` pair (or another
+``(field, id)`` ordering), so every page is a single index range scan no
+matter how deep the client scrolls, and it never runs ``COUNT(*)`` unless
+asked to.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count for a queryset.
+
+    On Postgres this reads the planner's row estimate instead of counting;
+    other databases fall back to an exact ``COUNT(*)``.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination keyed on ``(created_at, id)``, newest first.
+
+    ``ordering`` may be set to another ``(field, id)`` pair sorted in one
+    direction, e.g. ``('price', 'id')``; a composite index should back it.
+
+    Query parameters:
+        cursor     opaque position returned as ``next`` by the previous page
+        page_size  number of results (capped at ``max_page_size``)
+        count      ``exact`` or ``estimate`` to include a total; omitted by default
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # Largest bigint primary key; anything past it cannot come from a row.
+    max_cursor_pk = 2 ** 63 - 1
+    count_query_param = 'count'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    @property
+    def row_fields(self):
+        """Columns a values() queryset must include to be paginated."""
+        return (self.ordering[0].lstrip('-'), 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset, page_size = self.prepare(queryset, request)
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'exact':
+            self.count = queryset.count()
+        elif count_mode == 'estimate':
+            self.count = estimate_count(queryset)
+        return self.finish(list(page_queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async variant for views running on the ASGI event loop."""
+        page_queryset, page_size = self.prepare(queryset, request)
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'exact':
+            self.count = await queryset.acount()
+        elif count_mode == 'estimate':
+            self.count = await sync_to_async(estimate_count)(queryset)
+        return self.finish([obj async for obj in page_queryset], page_size)
+
+    def prepare(self, queryset, request):
+        """Return the (unevaluated) queryset for this page and the page size."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        page_size = self.get_page_size(request)
+
+        self.model = queryset.model
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            field = self.row_fields[0]
+            lookup = 'lt' if self.ordering[0].startswith('-') else 'gt'
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+            )
+        return queryset[:page_size + 1], page_size
+
+    def finish(self, results, page_size):
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def get_position(self, row):
+        if isinstance(row, dict):
+            # Rows from a values() queryset (see utils.fast_serializers).
+            return row[self.row_fields[0]], row['id']
+        return getattr(row, self.row_fields[0]), row.pk
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            value, pk = decoded.rsplit('|', 1)
+            field = self.model._meta.get_field(self.row_fields[0])
+            value = field.to_python(value)
+            pk = int(pk)
+            if value is None or not 0 < pk <= self.max_cursor_pk:
+                raise ValueError(value)
+            return value, pk
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise exceptions.ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def encode_cursor(self, position):
+        value, pk = position
+        value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        return base64.urlsafe_b64encode(f'{value}|{pk}'.encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CatalogPagination(KeysetPagination):
+    """
+    Keyset pagination that falls back to the old page-number API.
+
+    Clients opt into page numbers by sending ``?page=``. Querysets with an
+    explicit ordering (e.g. search results ordered by rank) also use page
+    numbers, since their order is not ``(created_at, id)``.
+    """
+    page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_number_paginator = None
+        if self.page_query_param in request.query_params or queryset.query.order_by:
+            self.page_number_paginator = PageNumberPagination()
+            return self.page_number_paginator.paginate_queryset(queryset, request, view=view)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.page_number_paginator = None
+        if self.page_query_param in request.query_params or queryset.query.order_by:
+            # Django's Paginator is synchronous; run the legacy mode in a thread.
+            self.page_number_paginator = PageNumberPagination()
+            return await sync_to_async(self.page_number_paginator.paginate_queryset)(
+                queryset, request, view=view
+            )
+        return await super().apaginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
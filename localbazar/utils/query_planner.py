@@ -0,0 +1,132 @@
+"""
+Query planning for DRF views.
+
+Derives ``select_related`` / ``prefetch_related`` / ``only`` sets from a
+serializer's declared fields so list endpoints load everything they render
+in a fixed number of queries, regardless of page size.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+@dataclass
+class QueryPlan:
+    select_related: Set[str] = field(default_factory=set)
+    prefetch_related: Dict[str, Optional['QueryPlan']] = field(default_factory=dict)
+    only: Set[str] = field(default_factory=set)
+    # False once a field needs columns we can't name (properties, '*' sources,
+    # method fields); only() is then skipped so nothing gets deferred.
+    restrict_columns: bool = True
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        for path, child_plan in sorted(self.prefetch_related.items()):
+            if child_plan is None:
+                queryset = queryset.prefetch_related(path)
+            else:
+                related_model = _resolve_model(queryset.model, path)
+                queryset = queryset.prefetch_related(
+                    Prefetch(path, queryset=child_plan.apply(related_model._default_manager.all()))
+                )
+        if self.restrict_columns and self.only:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+
+_plan_cache: Dict[tuple, QueryPlan] = {}
+
+
+def _resolve_model(model, path):
+    for name in path.split('__'):
+        model = model._meta.get_field(name).related_model
+    return model
+
+
+def _nested_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if isinstance(field, serializers.ModelSerializer):
+        return field
+    return None
+
+
+def _plan_serializer(serializer, model, plan, prefix=''):
+    for serializer_field in serializer.fields.values():
+        if serializer_field.write_only:
+            continue
+        if serializer_field.source == '*' or isinstance(serializer_field, serializers.SerializerMethodField):
+            plan.restrict_columns = False
+            continue
+
+        nested = _nested_serializer(serializer_field)
+        current_model = model
+        path = prefix
+        last = len(serializer_field.source_attrs) - 1
+        for position, attr in enumerate(serializer_field.source_attrs):
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # A property or method: its inputs are unknown.
+                plan.restrict_columns = False
+                break
+
+            path = f'{path}__{attr}' if path else attr
+            if not model_field.is_relation:
+                plan.only.add(path)
+                break
+
+            if model_field.many_to_many or model_field.one_to_many:
+                child_plan = None
+                if nested is not None:
+                    child_plan = QueryPlan()
+                    _plan_serializer(nested, model_field.related_model, child_plan)
+                    # Prefetch needs the join columns; keep the child unrestricted.
+                    child_plan.restrict_columns = False
+                plan.prefetch_related[path] = child_plan
+                break
+
+            if position == last and nested is None and model_field.concrete:
+                # Rendered as a primary key: the local column is enough.
+                plan.only.add(path)
+                break
+
+            plan.select_related.add(path)
+            if model_field.concrete:
+                plan.only.add(path)
+            current_model = model_field.related_model
+        else:
+            if nested is not None and path in plan.select_related:
+                _plan_serializer(nested, current_model, plan, prefix=path)
+
+
+def get_query_plan(serializer_class, model):
+    """Build (and cache) the query plan for rendering ``model`` with ``serializer_class``."""
+    key = (serializer_class, model)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = QueryPlan()
+        _plan_serializer(serializer_class(), model, plan)
+        _plan_cache[key] = plan
+    return plan
+
+
+def plan_queryset(queryset, serializer_class):
+    """Apply the serializer-derived query plan to ``queryset``."""
+    return get_query_plan(serializer_class, queryset.model).apply(queryset)
+
+
+class QueryPlanMixin:
+    """
+    Generic view mixin that applies the serializer's query plan after
+    filtering, so views keep overriding ``get_queryset`` as usual.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return plan_queryset(queryset, self.get_serializer_class())
@@ -0,0 +1,49 @@
+"""
+JSON renderer backed by orjson.
+
+Produces the same bytes as DRF's compact ``JSONRenderer`` for API payloads
+(UTF-8, no whitespace, U+2028/U+2029 escaped) several times faster. Types
+orjson does not handle the way DRF does (datetimes, decimals, lazy strings,
+querysets) are passed to DRF's encoder; anything orjson rejects outright,
+indented output and non-default JSON settings fall back to ``JSONRenderer``.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.phase('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Like JSONRenderer: keep the output safe to embed in JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
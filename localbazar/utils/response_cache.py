@@ -0,0 +1,224 @@
+"""
+Tiered response cache for anonymous read-only API endpoints.
+
+Lookups go through an in-process LRU first and then the shared Django cache
+configured by ``RESPONSE_CACHE['ALIAS']`` (locmem, file or Redis). Cache keys
+embed a generation number per data namespace (``product``, ``shop``,
+``category``); model signals bump the generation, which makes every entry
+that depended on it unreachable at once.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_MAX_ENTRIES': 1024,
+    'KEY_PREFIX': 'resp',
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+class LRUCache:
+    """A small thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local_cache = LRUCache(get_config()['LOCAL_MAX_ENTRIES'])
+
+
+def _shared_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def _generation_key(namespace):
+    return f"{get_config()['KEY_PREFIX']}:gen:{namespace}"
+
+
+def get_generations(namespaces):
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    values = _shared_cache().get_many(keys)
+    return [values.get(key, 0) for key in keys]
+
+
+def invalidate(namespace):
+    """Bump a namespace's generation, orphaning every response built from it."""
+    cache = _shared_cache()
+    key = _generation_key(namespace)
+    if cache.add(key, 1, timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); starting over is still a new generation.
+        cache.set(key, 1, timeout=None)
+
+
+def normalize_query(query_params):
+    """Stable representation of the query string: sorted keys and values."""
+    return '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params)
+        for value in sorted(query_params.getlist(key))
+    )
+
+
+def build_cache_key(view_name, request, kwargs, namespaces):
+    generations = get_generations(namespaces)
+    parts = [
+        view_name,
+        request.get_host(),
+        request.path,
+        normalize_query(request.GET),
+        request.META.get('HTTP_ACCEPT', ''),
+        repr(sorted(kwargs.items())),
+        ','.join(f'{ns}:{gen}' for ns, gen in zip(namespaces, generations)),
+    ]
+    digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+    return f"{get_config()['KEY_PREFIX']}:{view_name}:{digest}"
+
+
+def get_or_build(name, parts, namespaces, build, timeout=None):
+    """
+    Return ``build()``'s result, cached in the shared cache under ``parts``
+    and the current generations of ``namespaces`` like a response.
+    """
+    generations = get_generations(namespaces)
+    raw = '|'.join([*map(str, parts), *(f'{ns}:{gen}' for ns, gen in zip(namespaces, generations))])
+    key = f"{get_config()['KEY_PREFIX']}:{name}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+    cache = _shared_cache()
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout or get_config()['TIMEOUT'])
+    return value
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def _build_response(request, entry):
+    content, content_type, etag = entry
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['X-Cache'] = 'HIT'
+    patch_vary_headers(response, ['Accept', 'Authorization'])
+    return response
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.META.get('HTTP_AUTHORIZATION'):
+        return False
+    user = getattr(request, 'user', None)
+    return not (user is not None and user.is_authenticated)
+
+
+class CachedResponseMixin:
+    """
+    APIView mixin that caches rendered responses for anonymous GET requests.
+
+    ``cache_namespaces`` lists the data the response is built from; saving or
+    deleting any of those models invalidates the cached response.
+    """
+    cache_namespaces = ()
+    cache_timeout = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if not _is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        config = get_config()
+        timeout = self.cache_timeout or config['TIMEOUT']
+        key = build_cache_key(type(self).__name__, request, kwargs, self.cache_namespaces)
+
+        entry = _local_cache.get(key)
+        if entry is None:
+            entry = _shared_cache().get(key)
+            if entry is not None:
+                _local_cache.set(key, entry, timeout)
+        if entry is not None:
+            return self.serve_cached(request, entry, *args, **kwargs)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        response.render()
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        entry = (response.content, response['Content-Type'], etag)
+        _shared_cache().set(key, entry, timeout)
+        _local_cache.set(key, entry, timeout)
+
+        if _etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['X-Cache'] = 'MISS'
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+
+    def serve_cached(self, request, entry, *args, **kwargs):
+        """
+        Answer with a cached entry the way APIView.dispatch answers, so hits
+        are authenticated, permission checked and throttled like misses.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            self.initial(request, *args, **kwargs)
+            response = _build_response(request, entry)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
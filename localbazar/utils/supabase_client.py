@@ -1,31 +1,233 @@
 """
 Supabase client utility for LocalBazar project.
 This module provides a centralized way to interact with Supabase.
+
+``SupabaseClient`` manages both the synchronous supabase-py client and an
+async REST client (``get_async_client()``) for table reads and writes. The
+async client talks to PostgREST over a bounded httpx connection pool, caps
+in-flight requests, splits bulk reads and inserts into batches that run
+concurrently, and retries transient failures with exponential backoff.
+``SUPABASE_CLIENT['TRANSPORT']`` can point at a fake transport (see
+``utils.supabase_fake``) to exercise all of this without a live project.
+
+Nothing is created or even imported at module import time: supabase and
+httpx are loaded, and clients built, on first use.
 """
 
 from django.conf import settings
-from supabase import create_client, Client
-from typing import Optional
+from django.utils.module_loading import import_string
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+import asyncio
 import logging
+import random
+import threading
+import weakref
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+DEFAULTS = {
+    'TIMEOUT': 10.0,
+    'MAX_CONNECTIONS': 20,
+    'MAX_KEEPALIVE_CONNECTIONS': 10,
+    # Requests in flight per event loop; the rest wait for a slot.
+    'MAX_CONCURRENCY': 10,
+    'BATCH_SIZE': 500,
+    'MAX_RETRIES': 3,
+    'BACKOFF_BASE': 0.2,
+    'BACKOFF_MAX': 5.0,
+    # Dotted path to an httpx.AsyncBaseTransport class, e.g. the fake one.
+    'TRANSPORT': None,
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that guarantee the request was not processed, so even
+# non-idempotent requests can be retried.
+NOT_PROCESSED_STATUSES = {429, 503}
+
+
+def get_config() -> Dict[str, Any]:
+    return {**DEFAULTS, **getattr(settings, 'SUPABASE_CLIENT', {})}
+
+
+class SupabaseError(Exception):
+    """Raised when a Supabase REST request fails after all retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _quote(value: Any) -> str:
+    value = str(value)
+    if any(char in value for char in ',()"\\ '):
+        value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return value
+
+
+class AsyncRestClient:
+    """
+    Async PostgREST client bound to one event loop.
+
+    Use ``get_async_client()`` rather than creating instances directly.
+    """
+
+    def __init__(self, url: str, key: str, config: Dict[str, Any]):
+        import httpx
+
+        self.config = config
+        self.batch_size = config['BATCH_SIZE']
+        self.max_retries = config['MAX_RETRIES']
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._semaphore = asyncio.Semaphore(config['MAX_CONCURRENCY'])
+        transport = import_string(config['TRANSPORT'])() if config['TRANSPORT'] else None
+        self._http = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1/",
+            headers={'apikey': key, 'Authorization': f'Bearer {key}'},
+            timeout=config['TIMEOUT'],
+            limits=httpx.Limits(
+                max_connections=config['MAX_CONNECTIONS'],
+                max_keepalive_connections=config['MAX_KEEPALIVE_CONNECTIONS'],
+            ),
+            transport=transport,
+        )
+
+    @property
+    def transport(self):
+        return self._http._transport
+
+    def _backoff(self, attempt: int, response: Optional['httpx.Response'] = None) -> float:
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return min(float(response.headers['Retry-After']), self.config['BACKOFF_MAX'])
+        # Full jitter keeps retrying clients from synchronising.
+        ceiling = min(self.config['BACKOFF_MAX'], self.config['BACKOFF_BASE'] * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def request(self, method: str, path: str, idempotent: bool = True, **kwargs) -> 'httpx.Response':
+        """
+        Send a request, retrying transient failures.
+
+        Non-idempotent requests (plain inserts) are only retried when the
+        server cannot have processed them: connection failures, 429 and 503.
+        """
+        import httpx
+
+        attempt = 0
+        while True:
+            response = None
+            async with self._semaphore:
+                self.stats['requests'] += 1
+                try:
+                    response = await self._http.request(method, path, **kwargs)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    error = e
+                except httpx.TransportError as e:
+                    if not idempotent:
+                        self.stats['failures'] += 1
+                        raise SupabaseError(f'{method} {path} failed: {e}')
+                    error = e
+                else:
+                    if response.status_code < 400:
+                        return response
+                    retryable = RETRY_STATUSES if idempotent else NOT_PROCESSED_STATUSES
+                    if response.status_code not in retryable:
+                        self.stats['failures'] += 1
+                        raise SupabaseError(
+                            f'{method} {path} returned {response.status_code}: {response.text}',
+                            response.status_code,
+                        )
+                    error = None
+
+            if attempt >= self.max_retries:
+                self.stats['failures'] += 1
+                if response is not None:
+                    raise SupabaseError(
+                        f'{method} {path} returned {response.status_code} after {attempt + 1} attempts',
+                        response.status_code,
+                    )
+                raise SupabaseError(f'{method} {path} failed after {attempt + 1} attempts: {error}')
+            self.stats['retries'] += 1
+            await asyncio.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    async def select(self, table: str, columns: str = '*', filters: Optional[Dict[str, Any]] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows of ``table`` matching equality ``filters``."""
+        params = {'select': columns}
+        for column, value in (filters or {}).items():
+            params[column] = f'eq.{value}'
+        if limit is not None:
+            params['limit'] = limit
+        response = await self.request('GET', table, params=params)
+        return response.json()
+
+    async def select_in(self, table: str, column: str, values: Iterable[Any],
+                        columns: str = '*') -> List[Dict[str, Any]]:
+        """Rows whose ``column`` is in ``values``, fetched in concurrent batches."""
+        values = list(dict.fromkeys(values))
+        batches = [
+            self.request('GET', table, params={
+                'select': columns,
+                column: f"in.({','.join(_quote(value) for value in chunk)})",
+            })
+            for chunk in _chunks(values, self.batch_size)
+        ]
+        rows = []
+        for response in await asyncio.gather(*batches):
+            rows.extend(response.json())
+        return rows
+
+    async def insert(self, table: str, rows: List[Dict[str, Any]], upsert: bool = False,
+                     on_conflict: Optional[str] = None, returning: bool = True) -> List[Dict[str, Any]]:
+        """Insert (or upsert) ``rows`` in concurrent batches of ``BATCH_SIZE``."""
+        prefer = ['return=representation' if returning else 'return=minimal']
+        params = {}
+        if upsert:
+            prefer.append('resolution=merge-duplicates')
+            if on_conflict:
+                params['on_conflict'] = on_conflict
+        headers = {'Prefer': ','.join(prefer)}
+        batches = [
+            self.request('POST', table, idempotent=upsert, params=params, json=chunk, headers=headers)
+            for chunk in _chunks(list(rows), self.batch_size)
+        ]
+        inserted = []
+        for response in await asyncio.gather(*batches):
+            if returning:
+                inserted.extend(response.json())
+        return inserted
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
 class SupabaseClient:
     """
     Singleton class for Supabase client management.
     """
     _instance: Optional['SupabaseClient'] = None
-    _client: Optional[Client] = None
+    _client: Optional['Client'] = None
+    _initialized = False
+    _instance_lock = threading.Lock()
     
     def __new__(cls) -> 'SupabaseClient':
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._async_clients = weakref.WeakKeyDictionary()
+                    instance._lock = threading.Lock()
+                    cls._instance = instance
         return cls._instance
     
-    def __init__(self):
-        if self._client is None:
-            self._initialize_client()
-    
     def _initialize_client(self):
         """Initialize the Supabase client."""
         try:
@@ -33,6 +235,7 @@ class SupabaseClient:
                 logger.warning("Supabase URL or Key not configured")
                 return
             
+            from supabase import create_client
             self._client = create_client(
                 settings.SUPABASE_URL,
                 settings.SUPABASE_KEY
@@ -44,13 +247,40 @@ class SupabaseClient:
             self._client = None
     
     @property
-    def client(self) -> Optional[Client]:
-        """Get the Supabase client instance."""
+    def client(self) -> Optional['Client']:
+        """Get the Supabase client instance, creating it on first access."""
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    self._initialize_client()
+                    self._initialized = True
         return self._client
     
+    def async_client(self) -> Optional[AsyncRestClient]:
+        """
+        Get the async REST client for the running event loop.
+        
+        httpx pools are tied to the loop they were created on, so each loop
+        gets its own client; it is dropped when the loop goes away.
+        """
+        config = get_config()
+        if not config['TRANSPORT'] and (not settings.SUPABASE_URL or not settings.SUPABASE_KEY):
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncRestClient(
+                    settings.SUPABASE_URL or 'http://supabase.local',
+                    settings.SUPABASE_KEY,
+                    config,
+                )
+                self._async_clients[loop] = client
+        return client
+    
     def is_connected(self) -> bool:
         """Check if Supabase client is properly initialized."""
-        return self._client is not None
+        return self.client is not None
     
     def test_connection(self) -> bool:
         """Test the connection to Supabase."""
@@ -65,17 +295,23 @@ class SupabaseClient:
             logger.error(f"Supabase connection test failed: {e}")
             return False
 
-# Global instance
-supabase_client = SupabaseClient()
-
-def get_supabase_client() -> Optional[Client]:
+def get_supabase_client() -> Optional['Client']:
     """
     Get the Supabase client instance.
     
     Returns:
         Client: Supabase client instance or None if not configured
     """
-    return supabase_client.client
+    return SupabaseClient().client
+
+def get_async_client() -> Optional[AsyncRestClient]:
+    """
+    Get the async Supabase REST client. Must be called inside an event loop.
+    
+    Returns:
+        AsyncRestClient: client for the running loop or None if not configured
+    """
+    return SupabaseClient().async_client()
 
 def test_supabase_connection() -> bool:
     """
@@ -84,4 +320,4 @@ def test_supabase_connection() -> bool:
     Returns:
         bool: True if connection is successful, False otherwise
     """
-    return supabase_client.test_connection()
\ No newline at end of file
+    return SupabaseClient().test_connection()
@@ -0,0 +1,161 @@
+"""
+In-memory stand-in for Supabase's PostgREST API.
+
+``FakeTransport`` plugs into the async client's httpx pool (set
+``SUPABASE_CLIENT['TRANSPORT'] = 'utils.supabase_fake.FakeTransport'``) so
+batching, concurrency limits and retries can be exercised and load-tested
+locally. It understands the subset of PostgREST the client uses: ``select``,
+``limit``, ``eq.`` and ``in.()`` filters, inserts and merge-duplicate upserts.
+Latency and a failure rate can be injected to simulate a slow or flaky
+project.
+"""
+
+import asyncio
+import json
+import random
+import threading
+from collections import defaultdict
+
+import httpx
+
+RESERVED_PARAMS = {'select', 'limit', 'on_conflict', 'order', 'offset'}
+
+
+def _parse_in(value):
+    inner = value[len('in.('):-1]
+    values, current, quoted, escaped = [], '', False, False
+    for char in inner:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == '\\' and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            values.append(current)
+            current = ''
+        else:
+            current += char
+    if inner:
+        values.append(current)
+    return set(values)
+
+
+def _parse_filter(expected):
+    """``eq.x`` / ``in.(x,y)`` -> set of accepted string values."""
+    if expected.startswith('eq.'):
+        return {expected[len('eq.'):]}
+    if expected.startswith('in.('):
+        return _parse_in(expected)
+    raise ValueError(f'Unsupported filter "{expected}"')
+
+
+class FakeTransport(httpx.AsyncBaseTransport):
+    """
+    Fake PostgREST backend holding tables as lists of dicts.
+
+    State is shared by all instances of the class, like a real project
+    shared by every client; call ``reset()`` between runs.
+    """
+    tables = defaultdict(list)
+    # {table: {column: {str(value): [row, ...]}}}, built on first use.
+    indexes = defaultdict(dict)
+    latency = 0.0
+    failure_rate = 0.0
+    requests = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def reset(cls, latency=0.0, failure_rate=0.0):
+        with cls._lock:
+            cls.tables = defaultdict(list)
+            cls.indexes = defaultdict(dict)
+            cls.latency = latency
+            cls.failure_rate = failure_rate
+            cls.requests = 0
+
+    async def handle_async_request(self, request):
+        cls = type(self)
+        with cls._lock:
+            cls.requests += 1
+        if cls.latency:
+            await asyncio.sleep(cls.latency)
+        if cls.failure_rate and random.random() < cls.failure_rate:
+            return httpx.Response(503, json={'message': 'Service unavailable (fake)'})
+
+        table = request.url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = list(request.url.params.multi_items())
+        try:
+            if request.method == 'GET':
+                return self.select(table, params)
+            if request.method == 'POST':
+                return self.insert(table, params, request)
+        except ValueError as e:
+            return httpx.Response(400, json={'message': str(e)})
+        return httpx.Response(405, json={'message': f'{request.method} is not supported by the fake'})
+
+    def _index(self, table, column):
+        index = self.indexes[table].get(column)
+        if index is None:
+            index = defaultdict(list)
+            for row in self.tables[table]:
+                index[str(row.get(column))].append(row)
+            self.indexes[table][column] = index
+        return index
+
+    def _add(self, table, row):
+        self.tables[table].append(row)
+        for column, index in self.indexes[table].items():
+            index[str(row.get(column))].append(row)
+
+    def select(self, table, params):
+        options = dict(params)
+        filters = [
+            (column, _parse_filter(value)) for column, value in params if column not in RESERVED_PARAMS
+        ]
+        with self._lock:
+            if filters:
+                column, accepted = filters[0]
+                index = self._index(table, column)
+                candidates = [row for value in accepted for row in index.get(value, ())]
+            else:
+                candidates = self.tables[table]
+            rows = [
+                dict(row) for row in candidates
+                if all(str(row.get(column)) in accepted for column, accepted in filters)
+            ]
+        if 'limit' in options:
+            rows = rows[:int(options['limit'])]
+        columns = options.get('select', '*')
+        if columns != '*':
+            names = [name.strip() for name in columns.split(',')]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        return httpx.Response(200, json=rows)
+
+    def insert(self, table, params, request):
+        payload = json.loads(request.content or b'[]')
+        rows = payload if isinstance(payload, list) else [payload]
+        prefer = request.headers.get('Prefer', '')
+        conflict_column = dict(params).get('on_conflict', 'id')
+        upsert = 'resolution=merge-duplicates' in prefer
+
+        stored = []
+        with self._lock:
+            index = self._index(table, conflict_column) if upsert else None
+            for row in rows:
+                row = dict(row)
+                matches = index.get(str(row.get(conflict_column))) if upsert else None
+                if matches:
+                    # Secondary indexes are not updated; only the conflict
+                    # column's value is assumed to identify a row.
+                    matches[0].update(row)
+                    stored.append(dict(matches[0]))
+                    continue
+                row.setdefault('id', len(self.tables[table]) + 1)
+                self._add(table, row)
+                stored.append(dict(row))
+
+        if 'return=minimal' in prefer:
+            return httpx.Response(201)
+        return httpx.Response(201, json=stored)
@@ -0,0 +1,41 @@
+"""
+Test helpers for LocalBazar.
+"""
+
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=DEFAULT_DB_ALIAS):
+    """
+    Fail if the wrapped block runs more than ``max_queries`` SQL queries.
+
+    Usage:
+        with assert_max_queries(3):
+            client.get('/api/products/')
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        queries = '\n'.join(
+            f'{i}. {query["sql"]}' for i, query in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(
+            f'{executed} queries executed, expected at most {max_queries}:\n{queries}'
+        )
+
+
+def assert_endpoint_queries(client, url, max_queries, method='get', using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Request ``url`` with ``client`` and assert an upper bound on its query count.
+
+    Returns the response so callers can make further assertions.
+    """
+    with assert_max_queries(max_queries, using=using):
+        response = getattr(client, method)(url, **kwargs)
+    return response
@@ -0,0 +1,198 @@
+"""
+Token-bucket rate limiting for the API.
+
+Each client gets a bucket per scope holding up to ``num`` tokens of a DRF
+style rate (``'60/min'``), refilled continuously at ``num / period`` tokens
+per second: short bursts pass, sustained traffic is held to the rate.
+Authenticated requests are keyed by user, anonymous ones (and scopes in
+``RATE_LIMITS['IP_SCOPES']``, such as login) by client IP. The IP is read
+from X-Forwarded-For only behind ``REST_FRAMEWORK['NUM_PROXIES']`` trusted
+proxies; otherwise it is ``REMOTE_ADDR``, so clients cannot pick their own
+bucket by forging the header.
+
+Rates come from ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``: the view's
+``throttle_scope`` if it has one, else ``user`` or ``anon``. Buckets live in
+a pluggable store: ``memory`` (per process) or ``cache``, a Django cache
+alias shared by all processes. On Redis the cache store updates a bucket
+with one atomic Lua script; on other backends (e.g. locmem as a local
+stand-in) it serializes updates with a process lock.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    # 'memory' or 'cache'.
+    'STORE': 'memory',
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'ratelimit',
+    # Buckets kept by the memory store; idle ones are dropped first.
+    'MAX_KEYS': 100000,
+    # Scopes always keyed by IP, even for authenticated users.
+    'IP_SCOPES': ('auth',),
+}
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RATE_LIMITS', {})}
+
+
+def parse_rate(rate):
+    """``'60/min'`` -> (capacity, tokens per second)."""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+def _refill(tokens, updated_at, now, capacity, per_second):
+    """Consume one token. Returns (allowed, wait, tokens)."""
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * per_second)
+    if tokens >= 1:
+        return True, 0.0, tokens - 1
+    return False, (1 - tokens) / per_second, tokens
+
+
+class MemoryBucketStore:
+    """Buckets in this process only; limits apply per worker."""
+    blocking = False
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, per_second):
+        """Take a token from ``key``'s bucket. Returns (allowed, seconds to wait)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            allowed, wait, tokens = _refill(tokens, updated_at, now, capacity, per_second)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1] bucket; ARGV capacity, tokens per second. Uses the Redis clock so
+# app servers with skewed clocks share buckets correctly.
+REDIS_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class CacheBucketStore:
+    """Buckets in a Django cache shared by every process."""
+    blocking = True
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+        self._lock = threading.Lock()
+        self._script = None
+
+    def _redis_client(self, key):
+        client = getattr(self.cache, '_cache', None)
+        if not hasattr(client, 'get_client'):
+            return None
+        return client.get_client(key, write=True)
+
+    def consume(self, key, capacity, per_second):
+        """Take a token from ``key``'s bucket. Returns (allowed, seconds to wait)."""
+        cache_key = self.cache.make_and_validate_key(key)
+        client = self._redis_client(cache_key)
+        if client is not None:
+            if self._script is None:
+                self._script = client.register_script(REDIS_SCRIPT)
+            allowed, wait = self._script(keys=[cache_key], args=[capacity, per_second], client=client)
+            return bool(allowed), float(wait)
+
+        # Not atomic across processes; fine for locmem or a single worker.
+        timeout = int(capacity / per_second) + 1
+        with self._lock:
+            now = time.time()
+            tokens, updated_at = self.cache.get(key) or (capacity, now)
+            allowed, wait, tokens = _refill(tokens, updated_at, now, capacity, per_second)
+            self.cache.set(key, (tokens, now), timeout)
+        return allowed, wait
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        config = get_config()
+        if config['STORE'] == 'cache':
+            _store = CacheBucketStore(config['CACHE_ALIAS'])
+        else:
+            _store = MemoryBucketStore(config['MAX_KEYS'])
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'user' if request.user and request.user.is_authenticated else 'anon'
+
+    def get_key(self, request, view, scope):
+        user = request.user
+        if scope not in get_config()['IP_SCOPES'] and user and user.is_authenticated:
+            return f'user:{user.pk}'
+        if api_settings.NUM_PROXIES is None:
+            # DRF would trust any X-Forwarded-For the client sends.
+            return f"ip:{request.META.get('REMOTE_ADDR')}"
+        return f'ip:{self.get_ident(request)}'
+
+    def consume(self, scope, key):
+        """Take a token for ``key`` in ``scope``; True if the request may proceed."""
+        self.wait_seconds = None
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        allowed, wait = get_store().consume(
+            f"{get_config()['KEY_PREFIX']}:{scope}:{key}", capacity, per_second
+        )
+        if not allowed:
+            self.wait_seconds = wait
+        return allowed
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        return self.consume(scope, self.get_key(request, view, scope))
+
+    def wait(self):
+        return self.wait_seconds